@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""
+Claim Adjudication Engine
+Precomputes a coverage table per policy when it is created, so assessing
+a claim is a dict lookup plus arithmetic that tracks each member's
+accumulated deductible and out-of-pocket spending. The accumulators are
+written through to a storage collection when one is given, so they
+survive a restart.
+"""
+
+from datetime import datetime
+import math
+import threading
+import uuid
+
+import numpy as np
+
+# Coverage for services a policy does not list
+DEFAULT_COVERAGE_PERCENT = 80
+# Coverage for unknown services when no policy is given
+UNLISTED_SERVICE_PERCENT = 50
+# Services covered below this percentage need preauthorization
+PREAUTH_BELOW_PERCENT = 80
+DEFAULT_OUT_OF_POCKET_MAX = 6500
+
+# Plan-wide coverage used when no policy is given, and as the base every
+# policy's coverage_details are layered over
+STANDARD_COVERAGE = {
+    "preventive_care": 100,
+    "emergency": 80,
+    "specialist": 80,
+    "prescription": 80,
+    "dental": 0,
+    "vision": 50,
+}
+
+# Claim and query service names -> coverage keys
+SERVICE_ALIASES = {
+    "preventive": "preventive_care",
+    "wellness": "preventive_care",
+    "er": "emergency",
+    "rx": "prescription",
+    "pharmacy": "prescription",
+}
+
+
+def normalize_service(service):
+    """Coverage key for a service name ('Preventive' -> 'preventive_care')"""
+    service = str(service or "").strip().lower().replace(" ", "_")
+    return SERVICE_ALIASES.get(service, service)
+
+
+def claim_service(claim):
+    """Coverage key for a claim, from its service or claim_type field"""
+    return normalize_service(claim.get("service") or claim.get("claim_type"))
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+
+def validate_policy(policy):
+    """Problems that would stop a policy's coverage table being built (empty when it is valid)"""
+    errors = []
+    policy_number = policy.get("policy_number")
+    if policy_number is not None and not (isinstance(policy_number, str) and policy_number.strip()):
+        errors.append("policy_number must be a non-empty string")
+    coverage_details = policy.get("coverage_details")
+    if coverage_details is not None and not isinstance(coverage_details, dict):
+        errors.append("coverage_details must be an object of service -> percent")
+    else:
+        for service, percent in (coverage_details or {}).items():
+            if not _is_number(percent):
+                errors.append(f"coverage_details.{service} must be a number")
+    for field in ("deductible", "out_of_pocket_max", "premium"):
+        value = policy.get(field)
+        if value is not None and not _is_number(value):
+            errors.append(f"{field} must be a number")
+    return errors
+
+
+class CoverageTable:
+    """Everything needed to adjudicate claims against one policy"""
+
+    __slots__ = ("policy_id", "policy_number", "patient_id", "percentages", "default_percent",
+                 "deductible", "out_of_pocket_max", "preauth_services")
+
+    def __init__(self, policy_id, policy_number, patient_id, coverage_details, default_percent,
+                 deductible, out_of_pocket_max):
+        self.policy_id = policy_id
+        self.policy_number = policy_number
+        self.patient_id = patient_id
+        self.percentages = dict(STANDARD_COVERAGE)
+        for service, percent in (coverage_details or {}).items():
+            self.percentages[normalize_service(service)] = max(0.0, min(100.0, float(percent)))
+        self.default_percent = default_percent
+        self.deductible = float(deductible or 0)
+        self.out_of_pocket_max = float(out_of_pocket_max) if out_of_pocket_max is not None else float("inf")
+        self.preauth_services = frozenset(service for service, percent in self.percentages.items()
+                                          if percent < PREAUTH_BELOW_PERCENT)
+
+    @classmethod
+    def from_policy(cls, policy):
+        return cls(policy.get("policy_id"), policy.get("policy_number") or policy.get("policy_id"),
+                   policy.get("patient_id"),
+                   policy.get("coverage_details"), DEFAULT_COVERAGE_PERCENT,
+                   policy.get("deductible", 0), policy.get("out_of_pocket_max", DEFAULT_OUT_OF_POCKET_MAX))
+
+    def percent(self, service):
+        return self.percentages.get(service, self.default_percent)
+
+    def requires_preauth(self, service):
+        if service in self.percentages:
+            return service in self.preauth_services
+        return self.default_percent < PREAUTH_BELOW_PERCENT
+
+
+# Coverage answers when the caller names no policy
+STANDARD_TABLE = CoverageTable(None, None, None, None, UNLISTED_SERVICE_PERCENT, 0, None)
+
+
+def _running_totals(values, groups, order, first):
+    """Cumulative sum of values within each group, in original claim order"""
+    sorted_values = values[order]
+    totals = np.cumsum(sorted_values)
+    group_start_totals = (totals - sorted_values)[first]
+    within = totals - group_start_totals[np.cumsum(first) - 1]
+    result = np.empty_like(within)
+    result[order] = within
+    return result
+
+
+def accumulator_id(key):
+    """Storage record id for a (policy_number, patient_id) accumulator"""
+    policy_number, patient_id = key
+    return f"{policy_number}|{patient_id or ''}"
+
+
+class AdjudicationEngine:
+    """Coverage tables by policy number plus per-member accumulators
+
+    Accumulators are read and updated by this process only, so the service
+    must run as one worker; accumulator_store (a storage collection) keeps
+    them across restarts.
+    """
+
+    def __init__(self, load_policy=None, accumulator_store=None):
+        # policy_number -> CoverageTable
+        self.tables = {}
+        # policy_number -> policy_id
+        self.policy_ids = {}
+        # (policy_number, patient_id) -> (deductible met, out-of-pocket spent)
+        self.accumulators = {}
+        # Called with a policy_number the engine hasn't seen (e.g. stored before a restart)
+        self.load_policy = load_policy
+        self.accumulator_store = accumulator_store
+        self._lock = threading.Lock()
+
+    def register_policy(self, policy):
+        """Precompute and store the coverage table for a policy"""
+        table = CoverageTable.from_policy(policy)
+        with self._lock:
+            self.tables[table.policy_number] = table
+            self.policy_ids[table.policy_number] = table.policy_id
+        return table
+
+    def table_for(self, policy_number):
+        """Coverage table for a policy number, or None if there is no such policy"""
+        table = self.tables.get(policy_number)
+        if table is None and policy_number and self.load_policy is not None:
+            policy = self.load_policy(policy_number)
+            # Policies stored before they were validated are treated as missing
+            if policy is not None and not validate_policy(policy):
+                table = self.register_policy(policy)
+        return table
+
+    def accumulated(self, key):
+        """(deductible met, out-of-pocket spent) for a member, loading it from storage once"""
+        totals = self.accumulators.get(key)
+        if totals is None:
+            totals = (0.0, 0.0)
+            record = self.accumulator_store.get(accumulator_id(key)) if self.accumulator_store is not None else None
+            if record is not None:
+                totals = (float(record["deductible_met"]), float(record["out_of_pocket_spent"]))
+            self.accumulators[key] = totals
+        return totals
+
+    def policy_id(self, policy_number):
+        """policy_id for a policy number without scanning the policies"""
+        table = self.table_for(policy_number)
+        return table.policy_id if table else None
+
+    def coverage(self, service, policy_number=None, patient_id=None):
+        """Coverage facts for a service, under a policy when one is given
+
+        Returns None when policy_number names no known policy.
+        """
+        service = normalize_service(service)
+        table = self.table_for(policy_number) if policy_number else STANDARD_TABLE
+        if table is None:
+            return None
+        percent = table.percent(service)
+        result = {
+            "coverage_percentage": percent,
+            "requires_preauth": table.requires_preauth(service),
+            "deductible_applies": percent < 100
+        }
+        if table is not STANDARD_TABLE:
+            with self._lock:
+                met, spent = self.accumulated((table.policy_number, patient_id or table.patient_id))
+            result["policy_number"] = table.policy_number
+            result["deductible"] = table.deductible
+            result["deductible_remaining"] = round(max(0.0, table.deductible - met), 2)
+            result["out_of_pocket_remaining"] = round(max(0.0, table.out_of_pocket_max - spent), 2)
+        return result
+
+    def assess(self, claim, assessed_at=None):
+        """Assess one claim (see assess_batch)"""
+        return self.assess_batch([claim], assessed_at)[0]
+
+    def assess_batch(self, claims, assessed_at=None):
+        """Assess valid claim dicts in order, updating member accumulators
+
+        Amounts are computed as arrays; running totals per member make the
+        result identical to assessing the claims one at a time.
+        """
+        assessed_at = assessed_at or datetime.now().isoformat()
+        count = len(claims)
+        if not count:
+            return []
+
+        services = [claim_service(claim) for claim in claims]
+        tables = [self.table_for(claim.get("policy_number")) for claim in claims]
+        found = np.array([table is not None for table in tables])
+        amounts = np.array([float(claim.get("total_amount", 0)) for claim in claims])
+        percents = np.array([table.percent(service) if table else 0.0
+                             for table, service in zip(tables, services)])
+        member_keys = [(table.policy_number, claim.get("patient_id") or table.patient_id) if table else None
+                       for table, claim in zip(tables, claims)]
+
+        group_ids = {}
+        groups = np.array([group_ids.setdefault(key, len(group_ids)) for key in member_keys])
+        order = np.argsort(groups, kind="stable")
+        first = np.r_[True, groups[order][1:] != groups[order][:-1]]
+
+        with self._lock:
+            starting = [self.accumulated(key) if key else (0.0, 0.0) for key in group_ids]
+            deductibles = np.array([table.deductible if table else 0.0 for table in tables])
+            oop_max = np.array([table.out_of_pocket_max if table else 0.0 for table in tables])
+            deductible_left = np.maximum(0.0, deductibles - np.array([s[0] for s in starting])[groups])
+            oop_left = np.maximum(0.0, oop_max - np.array([s[1] for s in starting])[groups])
+
+            # Excluded (0%) services count toward neither the deductible nor the cap
+            covered_service = found & (percents > 0)
+
+            # Deductible: each claim takes what the member's earlier claims left
+            eligible = np.where(covered_service & (percents < 100), amounts, 0.0)
+            through = _running_totals(eligible, groups, order, first)
+            deductible_applied = (np.minimum(through, deductible_left)
+                                  - np.minimum(through - eligible, deductible_left))
+
+            covered = (amounts - deductible_applied) * percents / 100
+            responsibility = np.where(covered_service, amounts - covered, 0.0)
+
+            # Out-of-pocket maximum: the plan pays everything beyond it
+            spent = _running_totals(responsibility, groups, order, first)
+            capped = np.minimum(spent, oop_left) - np.minimum(spent - responsibility, oop_left)
+            covered = np.where(covered_service, covered + (responsibility - capped), 0.0)
+            responsibility = np.where(covered_service, capped, amounts)
+
+            changed = {}
+            for key, group in group_ids.items():
+                if key is None:
+                    continue
+                members = groups == group
+                met, paid = starting[group]
+                totals = (met + float(deductible_applied[members].sum()), paid + float(capped[members].sum()))
+                if totals != starting[group]:
+                    self.accumulators[key] = totals
+                    changed[accumulator_id(key)] = {
+                        "policy_number": key[0], "patient_id": key[1],
+                        "deductible_met": totals[0], "out_of_pocket_spent": totals[1]
+                    }
+            # Written in one transaction, before any result is returned
+            if changed and self.accumulator_store is not None:
+                self.accumulator_store.update(changed)
+
+        results = []
+        for i, claim in enumerate(claims):
+            table = tables[i]
+            assessment = {
+                "assessment_id": f"ASS-{uuid.uuid4().hex[:8].upper()}",
+                "claim_id": claim.get("claim_id"),
+                "policy_number": claim.get("policy_number"),
+                "service": services[i],
+                "total_amount": float(amounts[i]),
+                "coverage_percentage": float(percents[i]),
+                "deductible_applied": round(float(deductible_applied[i]), 2),
+                "covered_amount": round(float(covered[i]), 2),
+                "patient_responsibility": round(float(responsibility[i]), 2),
+                # Claims absorbed by the deductible are still payable under the policy
+                "status": "approved" if table and percents[i] > 0 and amounts[i] > 0 else "denied",
+                "assessed_at": assessed_at
+            }
+            if table is None:
+                assessment["reason"] = "Policy not found"
+            elif table.requires_preauth(services[i]):
+                assessment["requires_preauth"] = True
+            results.append(assessment)
+        return results
@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+"""
+Rate Limiting and Admission Control
+Per-client token buckets kept in a pluggable store (process memory by
+default, or a SQLite table shared by every worker), and an admission
+controller that sheds load with fast 429/503 responses once in-flight
+requests, proxy queue time or recent p99 latency pass their limits.
+"""
+
+from collections import OrderedDict, deque
+import math
+import os
+import sqlite3
+import threading
+import time
+
+from metrics import REGISTRY
+
+# "memory" keeps buckets per process, "sqlite" shares them across workers
+RATE_LIMIT_BACKEND = os.environ.get('RATE_LIMIT_BACKEND', 'memory').lower()
+RATE_LIMIT_PATH = os.environ.get('RATE_LIMIT_PATH', os.environ.get('STORAGE_PATH', 'healthguard.db'))
+# Clients tracked by the in-memory store; the least recently seen are forgotten first
+RATE_LIMIT_MAX_CLIENTS = int(os.environ.get('RATE_LIMIT_MAX_CLIENTS', 100000))
+# Takes between sweeps of idle (already full) buckets from the SQLite table
+SQLITE_PRUNE_EVERY = 1000
+
+ADMISSION_REJECTIONS = REGISTRY.counter(
+    'admission_rejections_total', 'Requests turned away before reaching a handler', ('service', 'reason'))
+
+
+class MemoryBucketStore:
+    """Token buckets in a thread-safe LRU dict, private to this process"""
+
+    def __init__(self, max_clients=RATE_LIMIT_MAX_CLIENTS, clock=time.monotonic):
+        self.max_clients = max_clients
+        self._clock = clock
+        # key -> (tokens, updated)
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, rate, burst, cost=1.0):
+        """Spend cost tokens from key's bucket; return 0.0, or the seconds until they'd be there"""
+        with self._lock:
+            now = self._clock()
+            tokens, updated = self._buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            wait = 0.0
+            if tokens >= cost:
+                tokens -= cost
+            else:
+                wait = (cost - tokens) / rate
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            # A forgotten client starts again with a full bucket, so only idle ones should go
+            while len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+            return wait
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class SQLiteBucketStore:
+    """Token buckets in a SQLite table, so every worker process shares one limit"""
+
+    def __init__(self, path=RATE_LIMIT_PATH, table='rate_limit_buckets', clock=time.time):
+        self.path = path
+        self._clock = clock
+        self._local = threading.local()
+        self._select_sql = f"SELECT tokens, updated FROM {table} WHERE key = ?"
+        self._upsert_sql = (f"INSERT INTO {table} (key, tokens, updated) VALUES (?, ?, ?) "
+                            f"ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated")
+        self._prune_sql = f"DELETE FROM {table} WHERE updated < ?"
+        self._count_sql = f"SELECT COUNT(*) FROM {table}"
+        self._takes = 0
+        self._connection().execute(
+            f"CREATE TABLE IF NOT EXISTS {table} (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)")
+
+    def _connection(self):
+        """One connection per worker thread, reopened after a fork"""
+        local = self._local
+        if getattr(local, 'connection', None) is None or local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, isolation_level=None, cached_statements=64)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute("PRAGMA busy_timeout=5000")
+            local.connection = connection
+            local.pid = os.getpid()
+        return local.connection
+
+    def take(self, key, rate, burst, cost=1.0):
+        """Spend cost tokens from key's bucket; return 0.0, or the seconds until they'd be there"""
+        connection = self._connection()
+        # IMMEDIATE takes the write lock up front so two workers can't both spend the same tokens
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            now = self._clock()
+            row = connection.execute(self._select_sql, (key,)).fetchone()
+            tokens, updated = row if row else (burst, now)
+            tokens = min(burst, tokens + max(0.0, now - updated) * rate)
+            wait = 0.0
+            if tokens >= cost:
+                tokens -= cost
+            else:
+                wait = (cost - tokens) / rate
+            connection.execute(self._upsert_sql, (key, tokens, now))
+            self._takes += 1
+            if self._takes % SQLITE_PRUNE_EVERY == 0:
+                # Buckets idle long enough to have refilled are the same as no bucket
+                connection.execute(self._prune_sql, (now - burst / rate,))
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        return wait
+
+    def __len__(self):
+        return self._connection().execute(self._count_sql).fetchone()[0]
+
+
+def open_bucket_store(backend=None, path=None):
+    """Token bucket store on the configured backend"""
+    backend = (backend or RATE_LIMIT_BACKEND).lower()
+    if backend == 'memory':
+        return MemoryBucketStore()
+    if backend == 'sqlite':
+        return SQLiteBucketStore(path or RATE_LIMIT_PATH)
+    raise ValueError(f"RATE_LIMIT_BACKEND must be 'memory' or 'sqlite', got {backend!r}")
+
+
+class RateLimiter:
+    """Per-client token bucket: rate requests per second, bursts of up to burst"""
+
+    def __init__(self, rate, burst=None, store=None):
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1.0, rate)
+        self.store = store if store is not None else MemoryBucketStore()
+        self.allowed = 0
+        self.limited = 0
+
+    @property
+    def enabled(self):
+        return self.rate > 0
+
+    def check(self, client, cost=1.0):
+        """0.0 if the client may proceed, else the seconds it should wait"""
+        if not self.enabled:
+            return 0.0
+        # A request costing more than a full bucket could never pass
+        wait = self.store.take(client, self.rate, self.burst, min(cost, self.burst))
+        if wait:
+            self.limited += 1
+        else:
+            self.allowed += 1
+        return wait
+
+    def stats(self):
+        """Counters for the health endpoint"""
+        return {
+            "enabled": self.enabled,
+            "rate_per_second": self.rate,
+            "burst": self.burst,
+            "store": type(self.store).__name__,
+            "clients": len(self.store),
+            "allowed": self.allowed,
+            "limited": self.limited
+        }
+
+
+class AdmissionController:
+    """Concurrency limit that tightens while recent p99 latency is over target
+
+    Requests are admitted while fewer than max_in_flight are running. Once
+    the p99 of the last window seconds passes p99_limit, only a quarter as
+    many are, so queued work drains and fresh latency samples show when it
+    has recovered. A request that already waited longer than max_queue_wait
+    in front of the app (per X-Request-Start, from the proxy or the gunicorn
+    worker) is dropped, since its client has likely given up. Latency
+    samples include that wait.
+    """
+
+    def __init__(self, max_in_flight=64, p99_limit=1.0, max_queue_wait=0.5, window=10.0,
+                 min_samples=20, retry_after=1, clock=time.monotonic):
+        self.max_in_flight = max_in_flight
+        self.p99_limit = p99_limit
+        self.max_queue_wait = max_queue_wait
+        self.window = window
+        self.min_samples = min_samples
+        self.retry_after = retry_after
+        self._clock = clock
+        # (finished_at, seconds) of recently completed requests
+        self._samples = deque(maxlen=4096)
+        self._p99 = 0.0
+        self._p99_at = float('-inf')
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.admitted = 0
+        self.rejected = {}
+
+    def _reject(self, reason):
+        self.rejected[reason] = self.rejected.get(reason, 0) + 1
+        return reason
+
+    def _recent_p99(self, now):
+        """p99 of the samples in the window, recomputed at most every 100 ms"""
+        if now - self._p99_at >= 0.1:
+            while self._samples and self._samples[0][0] < now - self.window:
+                self._samples.popleft()
+            if len(self._samples) >= self.min_samples:
+                latencies = sorted(seconds for _, seconds in self._samples)
+                self._p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+            else:
+                self._p99 = 0.0
+            self._p99_at = now
+        return self._p99
+
+    def limit(self, now=None):
+        """Requests allowed in flight right now"""
+        now = self._clock() if now is None else now
+        if self.p99_limit and self._recent_p99(now) > self.p99_limit:
+            return max(1, self.max_in_flight // 4)
+        return self.max_in_flight
+
+    def admit(self, queue_wait=None):
+        """None if admitted (call release() when done), else the rejection reason"""
+        if self.max_queue_wait and queue_wait is not None and queue_wait > self.max_queue_wait:
+            with self._lock:
+                return self._reject("queue_wait")
+        with self._lock:
+            now = self._clock()
+            if self.max_in_flight and self.in_flight >= self.limit(now):
+                return self._reject("latency" if self._p99 > self.p99_limit else "concurrency")
+            self.in_flight += 1
+            self.admitted += 1
+            return None
+
+    def release(self, seconds):
+        """Mark an admitted request finished after seconds"""
+        with self._lock:
+            self.in_flight -= 1
+            self._samples.append((self._clock(), seconds))
+
+    def stats(self):
+        """Counters for the health endpoint"""
+        with self._lock:
+            now = self._clock()
+            return {
+                "in_flight": self.in_flight,
+                "max_in_flight": self.max_in_flight,
+                "current_limit": self.limit(now),
+                "p99_ms": round(self._recent_p99(now) * 1000, 1),
+                "p99_limit_ms": round(self.p99_limit * 1000, 1),
+                "max_queue_wait_ms": round(self.max_queue_wait * 1000, 1),
+                "admitted": self.admitted,
+                "rejected": dict(self.rejected)
+            }
+
+
+def request_queue_wait(header, now=None):
+    """Seconds since X-Request-Start ("t=<epoch>" in s, ms or µs), or None"""
+    if not header:
+        return None
+    try:
+        started = float(header.strip().removeprefix('t='))
+    except ValueError:
+        return None
+    # nginx sends seconds with a fraction, Heroku-style routers milli- or microseconds
+    if started > 1e14:
+        started /= 1e6
+    elif started > 1e11:
+        started /= 1e3
+    return max(0.0, (time.time() if now is None else now) - started)
+
+
+def client_address(request, proxy_hops=0):
+    """Client IP, taken from X-Forwarded-For when the app runs behind proxy_hops proxies"""
+    if proxy_hops:
+        forwarded = [part.strip() for part in request.headers.get('X-Forwarded-For', '').split(',') if part.strip()]
+        # The rightmost entries were added by our own proxies; anything left of them is client-supplied
+        if len(forwarded) >= proxy_hops:
+            return forwarded[-proxy_hops]
+    return request.remote_addr or 'unknown'
+
+
+def install_admission_control(app, service, endpoints, limiter, controller, proxy_hops=0,
+                              cost=lambda request: 1):
+    """Rate limit and admission-control the given Flask endpoints"""
+    from flask import g, jsonify, request
+
+    endpoints = set(endpoints)
+    REGISTRY.gauge(f'{service}_requests_in_flight', 'Admitted requests currently running',
+                   lambda: controller.in_flight)
+
+    def rejected(status, reason, message, retry_after):
+        ADMISSION_REJECTIONS.inc(service=service, reason=reason)
+        response = jsonify({"error": message, "reason": reason, "retry_after": retry_after})
+        response.status_code = status
+        response.headers['Retry-After'] = str(retry_after)
+        return response
+
+    @app.before_request
+    def admit_request():
+        if request.endpoint not in endpoints or request.method == 'OPTIONS':
+            return None
+        wait = limiter.check(client_address(request, proxy_hops), cost(request))
+        if wait:
+            return rejected(429, "rate_limit", "Rate limit exceeded, please retry later",
+                            max(1, math.ceil(wait)))
+        queue_wait = request_queue_wait(request.headers.get('X-Request-Start'))
+        reason = controller.admit(queue_wait)
+        if reason:
+            return rejected(503, reason, "Server is busy, please retry shortly", controller.retry_after)
+        # Timed from arrival, so time spent queued counts toward the p99
+        g.arrived_at = time.perf_counter() - (queue_wait or 0.0)
+        return None
+
+    @app.teardown_request
+    def release_request(exc):
+        # Streamed responses tear down once the stream has been sent
+        started = g.pop('arrived_at', None)
+        if started is not None:
+            controller.release(time.perf_counter() - started)
@@ -1,18 +1,85 @@
-from flask import Flask, request, jsonify
-from flask_cors import CORS
+#!/usr/bin/env python3
+"""
+HealthGuard AI - Single-Process Deployment
+Mounts the RAG, insurance and hospital apps under /rag, /insurance and
+/hospital in one process, for small deployments. They share one
+interpreter, metrics registry, log writer, JSON layer and record store,
+and the hospital's claim pipeline assesses claims by calling the
+insurance service directly instead of over HTTP.
+
+Usage:
+    HEALTHGUARD_SERVICE=all gunicorn -c gunicorn_config.py app:app
+    python launch_system.py --single-process
+"""
+
 import os
 
-app = Flask(__name__)
-CORS(app)
+from flask import Flask, jsonify
+from flask_cors import CORS
+from werkzeug.middleware.dispatcher import DispatcherMiddleware
+
+import enhanced_rag_server
+import hospital_server_8003
+import insurance_server_actual
+from claim_pipeline import LocalAssessor
+from fast_json import install_fast_json, request_timestamp
+from metrics import instrument_flask
+from storage import STORAGE_BACKEND
+
+PORT = int(os.environ.get('PORT', 8005))
 
-@app.route('/health')
+# Path prefix -> (service name, Flask app)
+MOUNTS = {
+    '/rag': ('rag', enhanced_rag_server.app),
+    '/insurance': ('insurance', insurance_server_actual.app),
+    '/hospital': ('hospital', hospital_server_8003.app),
+}
+
+# A process pool can't reach this process's insurance service, so it
+# keeps sending claims to INSURANCE_SERVER_URL (set it to .../insurance)
+if hospital_server_8003.CLAIM_PIPELINE.executor == 'thread':
+    hospital_server_8003.CLAIM_PIPELINE.assessor = LocalAssessor(insurance_server_actual.assess_and_store)
+
+root = Flask(__name__)
+instrument_flask(root, 'app')
+install_fast_json(root)
+CORS(root)
+
+@root.route('/health', methods=['GET'])
 def health():
-    return jsonify({"status": "healthy"})
+    """Liveness of the process; each service reports its own details at <prefix>/health"""
+    return jsonify({
+        "status": "healthy",
+        "mode": "single-process",
+        "pid": os.getpid(),
+        "storage": STORAGE_BACKEND,
+        "services": {name: f"{prefix}/health" for prefix, (name, _) in MOUNTS.items()},
+        "timestamp": request_timestamp()
+    })
 
-@app.route('/')
+@root.route('/', methods=['GET'])
 def index():
-    return "HealthGuard AI Running"
+    return jsonify({
+        "service": "HealthGuard AI",
+        "status": "operational",
+        "services": {name: prefix for prefix, (name, _) in MOUNTS.items()},
+        "endpoints": {
+            "health": "/health",
+            "metrics": "/metrics"
+        }
+    })
+
+app = DispatcherMiddleware(root, {prefix: service_app for prefix, (_, service_app) in MOUNTS.items()})
 
 if __name__ == '__main__':
-    port = int(os.environ.get('PORT', 8005))
-    app.run(host='0.0.0.0', port=port)
+    from werkzeug.serving import run_simple
+
+    print("="*60)
+    print("🏥 HEALTHGUARD AI - SINGLE PROCESS")
+    print("="*60)
+    for prefix, (name, _) in MOUNTS.items():
+        print(f"  {prefix:<11} {name}")
+    print(f"Development server on http://localhost:{PORT}; for production run")
+    print("  HEALTHGUARD_SERVICE=all gunicorn -c gunicorn_config.py app:app")
+    print("="*60)
+    run_simple('0.0.0.0', PORT, app, threaded=True)
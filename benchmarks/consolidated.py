@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Single-Process Deployment Benchmark
+Starts the services the way launch_system.py does, once as three gunicorn
+services with one worker each and once as app.py with every service in one
+process, and reports time to healthy, total memory (PSS of every master
+and worker), per-request latency for each service, and how long a claim
+takes from submission to its final status when the hospital assesses it
+over HTTP or in-process.
+
+Usage:
+    python -m benchmarks.consolidated
+    python -m benchmarks.consolidated --requests 1000 --claims 500
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+from benchmarks.hospital_load import Client, percentile
+from benchmarks.service_load import POLICY_COUNT, SERVICES, call
+from benchmarks.worker_memory import child_pids, memory_mb
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+GUNICORN = [sys.executable, "-m", "gunicorn", "-c", "gunicorn_config.py"]
+
+# Deployment -> service -> (gunicorn app, port, path prefix)
+DEPLOYMENTS = {
+    "split": {
+        "rag": ("enhanced_rag_server:app", 18105, ""),
+        "insurance": ("insurance_server_actual:app", 18104, ""),
+        "hospital": ("hospital_server_8003:app", 18103, ""),
+    },
+    "single": {
+        "all": ("app:app", 18100, ""),
+    },
+}
+# Where each service is reached in the single-process deployment
+SINGLE_PREFIXES = {"rag": "/rag", "insurance": "/insurance", "hospital": "/hospital"}
+
+
+def start(deployment, log_dir, storage_dir):
+    """Launch every gunicorn master of a deployment; returns {service: Popen}"""
+    processes = {}
+    services = DEPLOYMENTS[deployment]
+    for name, (target, port, _) in services.items():
+        env = dict(os.environ, HEALTHGUARD_SERVICE=name, PORT=str(port), WEB_CONCURRENCY="1",
+                   LOG_LEVEL=os.environ.get("LOG_LEVEL", "WARNING"), STORAGE_BACKEND="sqlite",
+                   STORAGE_PATH=os.path.join(storage_dir, f"{deployment}.db"))
+        if name in ("hospital", "all"):
+            # Assess each claim as soon as it arrives rather than waiting to batch it
+            env["HOSPITAL_CLAIM_BATCH_WAIT_MS"] = "0"
+        if name == "hospital":
+            env["INSURANCE_SERVER_URL"] = f"http://127.0.0.1:{services['insurance'][1]}"
+        log = open(os.path.join(log_dir, f"{deployment}-{name}.log"), "w")
+        processes[name] = subprocess.Popen(GUNICORN + [target], cwd=ROOT, env=env,
+                                           stdout=log, stderr=subprocess.STDOUT)
+    return processes
+
+
+def wait_healthy(deployment, processes, timeout=60.0):
+    deadline = time.time() + timeout
+    for name, (_, port, _) in DEPLOYMENTS[deployment].items():
+        while True:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1):
+                    if child_pids(processes[name].pid):
+                        break
+            except OSError:
+                pass
+            if processes[name].poll() is not None:
+                raise RuntimeError(f"{name} exited with code {processes[name].returncode}")
+            if time.time() > deadline:
+                raise RuntimeError(f"{name} did not become healthy on port {port}")
+            time.sleep(0.05)
+
+
+def stop(processes):
+    for process in processes.values():
+        process.terminate()
+    for process in processes.values():
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def total_pss_mb(processes):
+    pids = [pid for process in processes.values() for pid in [process.pid] + child_pids(process.pid)]
+    return round(sum(memory_mb(pid)["pss"] for pid in pids), 1)
+
+
+def endpoints(deployment):
+    """{service: (port, path prefix)}"""
+    if deployment == "single":
+        port = DEPLOYMENTS["single"]["all"][1]
+        return {name: (port, prefix) for name, prefix in SINGLE_PREFIXES.items()}
+    return {name: (port, prefix) for name, (_, port, prefix) in DEPLOYMENTS[deployment].items()}
+
+
+def timed(latencies, client, method, path, payload=None):
+    started = time.perf_counter()
+    result = call(client, method, path, payload)
+    latencies.append(time.perf_counter() - started)
+    return result
+
+
+def summarize(latencies):
+    latencies.sort()
+    return {
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2)
+    }
+
+
+def run(deployment, log_dir, storage_dir, requests, claims, rng):
+    started = time.perf_counter()
+    processes = start(deployment, log_dir, storage_dir)
+    try:
+        wait_healthy(deployment, processes)
+        startup = time.perf_counter() - started
+        idle_pss = total_pss_mb(processes)
+
+        targets = endpoints(deployment)
+        clients = {name: (Client("127.0.0.1", port, 30.0), prefix) for name, (port, prefix) in targets.items()}
+        rag, rag_prefix = clients["rag"]
+        insurance, insurance_prefix = clients["insurance"]
+        hospital, hospital_prefix = clients["hospital"]
+
+        policies = [f"POL-BENCH-{i:04d}" for i in range(POLICY_COUNT)]
+        for number in policies:
+            call(insurance, "POST", f"{insurance_prefix}/api/v1/policies", {"policy_number": number})
+        patient = call(hospital, "POST", f"{hospital_prefix}/api/v1/patients/register",
+                       {"first_name": "Bench", "last_name": "Mark"})["patient_id"]
+        record = call(hospital, "POST", f"{hospital_prefix}/api/v1/medical-records",
+                      {"patient_id": patient, "total_cost": 500})["record_id"]
+
+        latencies = {"rag": [], "insurance": [], "hospital": []}
+        for _ in range(requests):
+            timed(latencies["rag"], rag, "POST", f"{rag_prefix}/api/v1/rag/query",
+                  {"query": f"is {rng.choice(SERVICES)} covered"})
+            timed(latencies["insurance"], insurance, "POST", f"{insurance_prefix}/api/v1/claims/assess", {
+                "policy_number": rng.choice(policies), "service": rng.choice(SERVICES),
+                "total_amount": round(rng.uniform(50, 5000), 2)})
+            timed(latencies["hospital"], hospital, "GET", f"{hospital_prefix}/api/v1/patients/{patient}")
+
+        # One claim at a time, so the round trip is not hidden by batching
+        round_trips = []
+        for _ in range(claims):
+            submitted = time.perf_counter()
+            claim = call(hospital, "POST", f"{hospital_prefix}/api/v1/insurance-claims", {
+                "patient_id": patient, "policy_number": rng.choice(policies),
+                "claim_type": rng.choice(SERVICES), "total_amount": round(rng.uniform(50, 5000), 2),
+                "medical_record_ids": [record]})
+            status_path = claim["status_url"]
+            while call(hospital, "GET", status_path)["data"]["status"] in ("submitted", "processing"):
+                time.sleep(0.001)
+            round_trips.append(time.perf_counter() - submitted)
+        pipeline = call(hospital, "GET", f"{hospital_prefix}/api/v1/insurance-claims/pipeline")["data"]
+
+        for client, _ in clients.values():
+            client.close()
+        return {
+            "deployment": deployment,
+            "processes": sum(1 + len(child_pids(process.pid)) for process in processes.values()),
+            "startup_seconds": round(startup, 2),
+            "idle_pss_mb": idle_pss,
+            "loaded_pss_mb": total_pss_mb(processes),
+            **{f"{name}_request": summarize(values) for name, values in latencies.items()},
+            "claim_round_trip": summarize(round_trips),
+            "claim_pipeline_ms": pipeline["latency_ms"],
+            "claim_outcomes": pipeline["outcomes"]
+        }
+    finally:
+        stop(processes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare three services against one process")
+    parser.add_argument("--deployments", default="split,single", help="comma-separated: split, single")
+    parser.add_argument("--requests", type=int, default=500, help="sequential requests per service")
+    parser.add_argument("--claims", type=int, default=200, help="claims submitted one at a time")
+    parser.add_argument("--seed", type=int, default=25)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as scratch:
+        for deployment in (name.strip() for name in args.deployments.split(",") if name.strip()):
+            rng = random.Random(args.seed)
+            print(json.dumps(run(deployment, scratch, scratch, args.requests, args.claims, rng)), flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Hospital Server Load Test
+Drives a running hospital server with concurrent clients and reports
+requests/sec, latency percentiles and how many connections were opened.
+Start the server with `python hospital_server_8003.py` (gunicorn, as in
+production) or `python launch_system.py --services hospital`.
+
+Usage:
+    python -m benchmarks.hospital_load --clients 100 --requests 50
+    python -m benchmarks.hospital_load --port 8003 --slow-clients 1
+"""
+
+import argparse
+import http.client
+import json
+import socket
+import threading
+import time
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+class Client:
+    """One simulated client reusing its connection while the server allows it"""
+
+    def __init__(self, host, port, timeout):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.connection = None
+        self.reconnects = 0
+
+    def request(self, method, path, body=None):
+        if self.connection is None:
+            self.connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            self.reconnects += 1
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+        self.connection.request(method, path, body=body, headers=headers)
+        response = self.connection.getresponse()
+        payload = response.read()
+        if response.will_close:
+            self.connection.close()
+            self.connection = None
+        return response.status, payload
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+
+
+def run_client(host, port, requests, timeout, start_event, latencies, errors, connections):
+    """Register a patient, then alternate lookups and registrations"""
+    client = Client(host, port, timeout)
+    patient_id = None
+    start_event.wait()
+    for i in range(requests):
+        if patient_id is None or i % 4 == 0:
+            method, path = "POST", "/api/v1/patients/register"
+            body = json.dumps({"first_name": "Load", "last_name": f"Test{i}",
+                               "date_of_birth": "1990-01-01", "email": f"load{i}@example.com"})
+        elif i % 4 == 1:
+            method, path, body = "GET", "/health", None
+        else:
+            method, path, body = "GET", f"/api/v1/patients/{patient_id}", None
+
+        started = time.perf_counter()
+        try:
+            status, payload = client.request(method, path, body)
+            if status >= 400:
+                raise RuntimeError(f"HTTP {status}")
+            if method == "POST":
+                patient_id = json.loads(payload)["patient_id"]
+        except Exception as e:
+            errors.append(f"{method} {path}: {e}")
+            client.close()
+            client.connection = None
+            continue
+        latencies.append(time.perf_counter() - started)
+    client.close()
+    connections.append(client.reconnects)
+
+
+def hold_slow_client(host, port, stop_event):
+    """Open a connection and trickle a request that never completes"""
+    sock = socket.create_connection((host, port))
+    sock.sendall(b"POST /api/v1/patients/register HTTP/1.1\r\nHost: slow\r\n")
+    while not stop_event.wait(0.5):
+        try:
+            sock.sendall(b"X-Slow: 1\r\n")
+        except OSError:
+            break
+    sock.close()
+
+
+def run_load_test(host, port, clients, requests, timeout=30.0, slow_clients=0):
+    """Run the load test and return a stats dict"""
+    latencies = []
+    errors = []
+    connections = []
+    start_event = threading.Event()
+    stop_event = threading.Event()
+
+    slow_threads = [threading.Thread(target=hold_slow_client, args=(host, port, stop_event), daemon=True)
+                    for _ in range(slow_clients)]
+    for thread in slow_threads:
+        thread.start()
+    time.sleep(0.2 if slow_clients else 0)
+
+    threads = [threading.Thread(target=run_client,
+                                args=(host, port, requests, timeout, start_event, latencies, errors, connections))
+               for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    started = time.perf_counter()
+    start_event.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    stop_event.set()
+
+    latencies.sort()
+    return {
+        "clients": clients,
+        "slow_clients": slow_clients,
+        "requests": len(latencies),
+        "errors": len(errors),
+        # Equal to clients when every client kept its connection open
+        "connections": sum(connections),
+        "elapsed_seconds": round(elapsed, 3),
+        "requests_per_second": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "max_ms": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+        "sample_errors": errors[:5]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the hospital server")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=8003)
+    parser.add_argument("--clients", type=int, default=100, help="concurrent clients")
+    parser.add_argument("--requests", type=int, default=50, help="requests per client")
+    parser.add_argument("--timeout", type=float, default=30.0, help="per-request timeout in seconds")
+    parser.add_argument("--slow-clients", type=int, default=0,
+                        help="connections that trickle an unfinished request during the run")
+    args = parser.parse_args()
+
+    stats = run_load_test(args.host, args.port, args.clients, args.requests,
+                          timeout=args.timeout, slow_clients=args.slow_clients)
+    print(json.dumps(stats, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Compiled Index Startup Benchmark
+Writes a synthetic knowledge base as JSON and as a compiled index, then
+loads each in a fresh process and reports time to ready, memory after
+loading and after a query run, and per-query latency for both backends.
+
+Usage:
+    python -m benchmarks.index_startup --topics 100000
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.hospital_load import percentile
+from benchmarks.match_bench import make_knowledge, make_queries, make_vocabulary
+from benchmarks.worker_memory import memory_mb
+from compiled_index import compile_knowledge
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def measure(path, queries_path):
+    """Runs in the child process: load, query, report as one JSON line"""
+    from knowledge_base import KnowledgeBase
+
+    started = time.perf_counter()
+    knowledge_base = KnowledgeBase.open(path)
+    ready = time.perf_counter() - started
+    loaded = memory_mb(os.getpid())
+
+    with open(queries_path, encoding="utf-8") as f:
+        queries = json.load(f)
+    backends = {}
+    for backend in ("keyword", "vector"):
+        latencies = []
+        for query in queries:
+            started = time.perf_counter()
+            knowledge_base.top_matches(query, backend)
+            latencies.append(time.perf_counter() - started)
+        latencies.sort()
+        backends[backend] = {
+            "mean_us": round(sum(latencies) / len(latencies) * 1e6, 1),
+            "p99_us": round(percentile(latencies, 0.99) * 1e6, 1)
+        }
+    print(json.dumps({
+        "format": knowledge_base.format,
+        "ready_seconds": round(ready, 4),
+        "loaded": loaded,
+        "after_queries": memory_mb(os.getpid()),
+        "backends": backends
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare JSON and compiled index startup")
+    parser.add_argument("--topics", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--measure", nargs=2, metavar=("PATH", "QUERIES"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        measure(*args.measure)
+        return
+
+    rng = random.Random(args.seed)
+    vocabulary = make_vocabulary(rng)
+    knowledge = make_knowledge(args.topics, vocabulary, rng)
+    queries = make_queries(knowledge, vocabulary, rng, args.queries)
+
+    with tempfile.TemporaryDirectory() as directory:
+        json_path = os.path.join(directory, "knowledge_base.json")
+        index_path = os.path.join(directory, "knowledge_base.hgidx")
+        queries_path = os.path.join(directory, "queries.json")
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(knowledge, f)
+        with open(queries_path, "w", encoding="utf-8") as f:
+            json.dump(queries, f)
+        compiled = compile_knowledge(knowledge, index_path, source=json_path)
+        print(json.dumps({"topics": args.topics, "json_mb": round(os.path.getsize(json_path) / 1e6, 1),
+                          "index_mb": round(compiled["bytes"] / 1e6, 1),
+                          "compile_seconds": compiled["seconds"]}), flush=True)
+
+        # Same allocator setting the launcher gives the RAG service
+        env = dict(os.environ, MALLOC_TOP_PAD_=os.environ.get("MALLOC_TOP_PAD_", str(16 << 20)))
+        for path in (json_path, index_path):
+            output = subprocess.run([sys.executable, "-m", "benchmarks.index_startup", "--measure", path, queries_path],
+                                    cwd=ROOT, env=env, check=True, capture_output=True, text=True).stdout
+            print(output.strip(), flush=True)
+
+
+if __name__ == "__main__":
+    main()
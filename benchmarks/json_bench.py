@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+JSON Response Benchmark
+Encodes typical response payloads (a patient page, a RAG batch answer, a
+bulk claim assessment) the way the servers used to (Flask's default
+provider: sorted keys, ASCII escapes, indented under the debug server)
+and through fast_json, reporting encode time, body size and the gzip
+size and time a client sending Accept-Encoding would get.
+
+Usage:
+    python -m benchmarks.json_bench --records 500 --repeat 200
+"""
+
+import argparse
+import json
+import random
+import time
+import zlib
+
+from fast_json import GZIP_LEVEL, JSON_ENCODER, dumps
+
+
+def make_patient(index):
+    return {
+        "patient_id": f"PAT-{index:08X}",
+        "first_name": random.choice(["Ana", "José", "Li", "Olamide", "Sarah", "Mateo"]),
+        "last_name": random.choice(["García", "Smith", "Nguyen", "Okafor", "Müller"]),
+        "date_of_birth": f"19{random.randint(40, 99)}-{random.randint(1, 12):02d}-{random.randint(1, 28):02d}",
+        "gender": random.choice(["female", "male", "other"]),
+        "phone": f"555-{random.randint(0, 9999):04d}",
+        "email": f"member{index}@example.org",
+        "address": f"{random.randint(1, 999)} Main St",
+        "insurance_policy_number": f"POL-{random.randint(0, 99999):06d}",
+        "registration_date": "2026-10-18T09:30:00.000000",
+        "last_updated": "2026-10-18T09:30:00.000000"
+    }
+
+
+def make_answer(index):
+    return {
+        "query": f"what does my plan cover for visit {index}",
+        "response": "Your deductible is the amount you pay for covered services before your plan starts to pay. "
+                    "After you meet it, you pay coinsurance until the out-of-pocket maximum.",
+        "confidence": round(random.random(), 4),
+        "sources": ["Policy Document - Section 3.2"],
+        "topics": [{"topic": "deductible", "confidence": 0.95, "score": 1.0,
+                    "source": "Policy Document - Section 3.2"}]
+    }
+
+
+def make_assessment(index):
+    amount = round(random.uniform(50, 5000), 2)
+    return {
+        "index": index,
+        "assessment_id": f"ASSESS-{index:08d}",
+        "claim_id": f"CLM-{index:08d}",
+        "approved": amount < 4000,
+        "claim_amount": amount,
+        "covered_amount": round(amount * 0.8, 2),
+        "patient_responsibility": round(amount * 0.2, 2),
+        "coverage_percentage": 80,
+        "reason": "Covered under plan",
+        "timestamp": "2026-10-18T09:30:00.000000"
+    }
+
+
+def payloads(records):
+    return {
+        "patient_page": {"status": "success", "data": [make_patient(i) for i in range(records)],
+                         "count": records, "next_cursor": "MTAw"},
+        "rag_batch": {"count": records, "errors": 0, "backend": "keyword",
+                      "results": [make_answer(i) for i in range(records)]},
+        "claim_results": {"status": "success", "results": [make_assessment(i) for i in range(records)]}
+    }
+
+
+def encoders():
+    return {
+        # Flask's default provider with the debug server on
+        "flask_default_debug": lambda data: json.dumps(data, indent=2, sort_keys=True).encode("utf-8"),
+        # Flask's default provider with debug off
+        "flask_default": lambda data: json.dumps(data, separators=(",", ":"), sort_keys=True).encode("utf-8"),
+        f"fast_json ({JSON_ENCODER})": dumps
+    }
+
+
+def timed(operation, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = operation()
+    return result, (time.perf_counter() - started) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark JSON response encoding and compression")
+    parser.add_argument("--records", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    results = {}
+    for payload_name, payload in payloads(args.records).items():
+        results[payload_name] = {}
+        for encoder_name, encode in encoders().items():
+            body, encode_seconds = timed(lambda: encode(payload), args.repeat)
+            compressed, gzip_seconds = timed(lambda: zlib.compress(body, GZIP_LEVEL, wbits=31), args.repeat)
+            results[payload_name][encoder_name] = {
+                "encode_us": round(encode_seconds * 1e6, 1),
+                "bytes": len(body),
+                "gzip_us": round(gzip_seconds * 1e6, 1),
+                "gzip_bytes": len(compressed)
+            }
+    print(json.dumps({"records": args.records, "encoder": JSON_ENCODER, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+find_best_match Scaling Benchmark
+Builds synthetic knowledge bases of increasing size and measures index
+build time and per-query latency of find_best_match for each backend.
+
+Usage:
+    python -m benchmarks.match_bench
+    python -m benchmarks.match_bench --sizes 10,1000,100000 --queries 2000 --backends keyword
+"""
+
+import argparse
+import json
+import random
+import time
+
+from benchmarks.hospital_load import percentile
+from knowledge_base import KnowledgeBase
+
+# Words synthetic keywords are built from; large enough that topics rarely collide
+VOCABULARY_SIZE = 20000
+CATEGORIES = ("cost_sharing", "coverage", "claims", "network", "pharmacy", "benefits")
+
+
+def make_vocabulary(rng, size=VOCABULARY_SIZE):
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(letters) for _ in range(rng.randint(4, 9))))
+    return sorted(words)
+
+
+def make_knowledge(topic_count, vocabulary, rng):
+    """Synthetic topics with 3-6 keyword phrases of 1-3 words each"""
+    knowledge = {}
+    for i in range(topic_count):
+        keywords = [" ".join(rng.choice(vocabulary) for _ in range(rng.randint(1, 3)))
+                    for _ in range(rng.randint(3, 6))]
+        knowledge[f"topic_{i}"] = {
+            "keywords": keywords,
+            "response": f"Synthetic answer {i}: " + " ".join(rng.choice(vocabulary) for _ in range(30)),
+            "confidence": round(rng.uniform(0.8, 0.98), 2),
+            "category": rng.choice(CATEGORIES)
+        }
+    return knowledge
+
+
+def make_queries(knowledge, vocabulary, rng, count):
+    """Half the queries mention a known keyword, half are random words"""
+    topics = list(knowledge.values())
+    queries = []
+    for i in range(count):
+        words = [rng.choice(vocabulary) for _ in range(rng.randint(3, 8))]
+        if i % 2 == 0:
+            words.insert(rng.randrange(len(words) + 1), rng.choice(rng.choice(topics)["keywords"]))
+        queries.append("What about " + " ".join(words) + "?")
+    return queries
+
+
+def bench_size(topic_count, backends, query_count, rng, vocabulary, find_best_match):
+    knowledge = make_knowledge(topic_count, vocabulary, rng)
+    queries = make_queries(knowledge, vocabulary, rng, query_count)
+
+    started = time.perf_counter()
+    knowledge_base = KnowledgeBase(knowledge)
+    build_seconds = time.perf_counter() - started
+
+    results = {"topics": topic_count, "build_seconds": round(build_seconds, 3), "backends": {}}
+    for backend in backends:
+        latencies = []
+        matched = 0
+        for query in queries:
+            started = time.perf_counter()
+            result = find_best_match(query, backend, knowledge_base)
+            latencies.append(time.perf_counter() - started)
+            matched += result["matched"]
+        total = sum(latencies)
+        latencies.sort()
+        results["backends"][backend] = {
+            "queries": len(queries),
+            "matched": matched,
+            "queries_per_second": round(len(queries) / total, 1) if total else None,
+            "mean_us": round(total / len(queries) * 1e6, 1),
+            "p50_us": round(percentile(latencies, 0.50) * 1e6, 1),
+            "p99_us": round(percentile(latencies, 0.99) * 1e6, 1)
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure find_best_match at several knowledge base sizes")
+    parser.add_argument("--sizes", default="10,1000,100000", help="comma-separated topic counts")
+    parser.add_argument("--queries", type=int, default=1000, help="queries per size and backend")
+    parser.add_argument("--backends", default="keyword,vector", help="comma-separated backends")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    # Imported here so the server's startup work stays out of --help
+    from enhanced_rag_server import find_best_match
+
+    rng = random.Random(args.seed)
+    vocabulary = make_vocabulary(rng)
+    backends = [backend.strip() for backend in args.backends.split(",") if backend.strip()]
+    results = []
+    for size in (int(size) for size in args.sizes.split(",")):
+        results.append(bench_size(size, backends, args.queries, rng, vocabulary, find_best_match))
+        print(json.dumps(results[-1]), flush=True)
+
+
+if __name__ == "__main__":
+    main()
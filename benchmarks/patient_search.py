@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Patient Search Benchmark
+Indexes synthetic patients one at a time (as registration does) and
+reports index build rate, memory, and search latency for exact, prefix,
+misspelled and field lookups.
+
+Usage:
+    python -m benchmarks.patient_search --patients 1000000
+"""
+
+import argparse
+import json
+import os
+import random
+import time
+
+from benchmarks.hospital_load import percentile
+from benchmarks.worker_memory import memory_mb
+from patient_index import PatientIndex
+
+SYLLABLES = ("an", "ber", "ca", "da", "el", "fer", "ga", "han", "is", "jo", "ka", "lo", "ma", "ne", "or",
+             "pa", "ri", "sa", "ta", "ul", "vi", "wen", "ya", "zo", "son", "lin", "mar", "ton", "ez", "ski")
+
+
+def make_names(rng, count):
+    names = set()
+    while len(names) < count:
+        names.add("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))).title())
+    return sorted(names)
+
+
+def make_patient(index, rng, first_names, last_names):
+    first = rng.choice(first_names)
+    last = rng.choice(last_names)
+    return {
+        "patient_id": f"PAT-{index:08X}",
+        "first_name": first,
+        "last_name": last,
+        "date_of_birth": f"{rng.randint(1930, 2020)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        "email": f"{first}.{last}{index}@example.org".lower(),
+        "insurance_policy_number": f"POL-{rng.randint(0, 999999):06d}"
+    }
+
+
+def misspell(word, rng):
+    """One random typo: deletion, substitution, insertion or transposition"""
+    position = rng.randrange(len(word))
+    kind = rng.randrange(4)
+    if kind == 0 and len(word) > 4:
+        return word[:position] + word[position + 1:]
+    if kind == 1:
+        return word[:position] + rng.choice("aeioulnrst") + word[position + 1:]
+    if kind == 2:
+        return word[:position] + rng.choice("aeioulnrst") + word[position:]
+    if position < len(word) - 1:
+        return word[:position] + word[position + 1] + word[position] + word[position + 2:]
+    return word[:-1]
+
+
+def measure(index, queries):
+    latencies = []
+    found = 0
+    for text, filters in queries:
+        started = time.perf_counter()
+        ids, _ = index.search(text, filters, limit=20)
+        latencies.append(time.perf_counter() - started)
+        found += bool(ids)
+    latencies.sort()
+    return {
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3),
+        "p50_ms": round(percentile(latencies, 0.5) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "found": round(found / len(queries), 3)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the patient search index")
+    parser.add_argument("--patients", type=int, default=1000000)
+    parser.add_argument("--first-names", type=int, default=5000)
+    parser.add_argument("--last-names", type=int, default=50000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    first_names = make_names(rng, args.first_names)
+    last_names = make_names(rng, args.last_names)
+    before = memory_mb(os.getpid())
+
+    index = PatientIndex()
+    sample = []
+    started = time.perf_counter()
+    for i in range(args.patients):
+        patient = make_patient(i, rng, first_names, last_names)
+        index.add(patient)
+        if len(sample) < args.queries:
+            sample.append(patient)
+        elif rng.random() < args.queries / (i + 1):
+            sample[rng.randrange(args.queries)] = patient
+    build_seconds = time.perf_counter() - started
+    after = memory_mb(os.getpid())
+
+    workloads = {
+        "full_name": [(f"{p['first_name']} {p['last_name']}", None) for p in sample],
+        "last_name_prefix": [(p["last_name"][:3], None) for p in sample],
+        "first_prefix_last_name": [(f"{p['first_name'][:2]} {p['last_name']}", None) for p in sample],
+        "misspelled_full_name": [(f"{p['first_name']} {misspell(p['last_name'].lower(), rng)}", None)
+                                 for p in sample],
+        "date_of_birth": [("", {"date_of_birth": p["date_of_birth"]}) for p in sample],
+        "email": [("", {"email": p["email"]}) for p in sample],
+        "policy_and_name": [(p["last_name"], {"insurance_policy_number": p["insurance_policy_number"]})
+                            for p in sample],
+    }
+    print(json.dumps({
+        "patients": args.patients,
+        "build_seconds": round(build_seconds, 1),
+        "patients_per_second": round(args.patients / build_seconds),
+        "index_rss_mb": round(after["rss"] - before["rss"], 1),
+        "index": index.stats(),
+        "search": {name: measure(index, queries) for name, queries in workloads.items()}
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""
+HealthGuard Service Load Test
+Starts the RAG, insurance and hospital servers locally, replays a seeded
+mix of RAG questions, patient registrations and claims at a configurable
+concurrency, and reports throughput, latency percentiles and server RSS.
+
+Usage:
+    python -m benchmarks.service_load --clients 32 --requests 200
+    python -m benchmarks.service_load --mix rag=100 --seed 7
+    python -m benchmarks.service_load --no-start --rag-port 8005 --insurance-port 8004 --hospital-port 8003
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+
+from benchmarks.hospital_load import Client, percentile
+from benchmarks.worker_memory import child_pids
+from knowledge_base import load_knowledge_file
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SERVERS = {
+    "rag": [sys.executable, "enhanced_rag_server.py"],
+    "insurance": [sys.executable, "insurance_server_actual.py"],
+    # The hospital's development server closes every connection
+    "hospital": [sys.executable, "-m", "gunicorn", "-c", "gunicorn_config.py", "hospital_server_8003:app"],
+}
+DEFAULT_PORTS = {"rag": 18005, "insurance": 18004, "hospital": 18003}
+DEFAULT_MIX = "rag=60,register=10,lookup=10,claim=10,assess=10"
+
+PARAPHRASES = (
+    "Can you tell me about {}?",
+    "what's the deal with my {}",
+    "How does {} work on my plan?",
+    "I have a question regarding {}",
+    "{} - what do I need to know",
+)
+UNMATCHED_QUESTIONS = (
+    "What's the weather like in Denver tomorrow?",
+    "Can I change my mailing address online?",
+    "Who won the game last night?",
+    "How do I reset my password?",
+    "Is the cafeteria open on weekends?",
+    "Recommend a good book about history",
+    "What time does the pharmacy near me close",
+    "How far is the airport from downtown?",
+)
+SERVICES = ("preventive", "emergency", "specialist", "prescription", "vision", "dental")
+POLICY_COUNT = 50
+
+
+def build_queries(knowledge_path, rng, count=2000):
+    """Question mix seeded from the knowledge base: 50% keywords, 30% paraphrases, 20% unmatched"""
+    knowledge = load_knowledge_file(knowledge_path)
+    keywords = [keyword for topic in knowledge.values() for keyword in topic["keywords"]]
+    queries = []
+    for _ in range(count):
+        roll = rng.random()
+        if roll < 0.5:
+            queries.append(rng.choice(keywords))
+        elif roll < 0.8:
+            queries.append(rng.choice(PARAPHRASES).format(rng.choice(keywords)))
+        else:
+            queries.append(rng.choice(UNMATCHED_QUESTIONS))
+    return queries
+
+
+def parse_mix(text):
+    """'rag=60,register=10' -> [(operation, weight), ...]"""
+    mix = []
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in OPERATIONS:
+            raise ValueError(f"Unknown operation {name!r}; choose from {', '.join(OPERATIONS)}")
+        mix.append((name.strip(), float(weight or 1)))
+    return mix
+
+
+def rss_mb(pid):
+    """(current, peak) resident memory of a process in MB, from /proc (Linux only)"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            fields = dict(line.split(":", 1) for line in f if ":" in line)
+    except OSError:
+        return None, None
+    return (round(int(fields["VmRSS"].split()[0]) / 1024, 1),
+            round(int(fields["VmHWM"].split()[0]) / 1024, 1))
+
+
+def start_servers(ports, log_dir, knowledge_path=None):
+    """Launch each server with its port; returns {name: Popen}"""
+    processes = {}
+    for name, command in SERVERS.items():
+        env = dict(os.environ, PORT=str(ports[name]), LOG_LEVEL=os.environ.get("LOG_LEVEL", "WARNING"),
+                   HEALTHGUARD_SERVICE=name)
+        if knowledge_path:
+            env["KNOWLEDGE_BASE_PATH"] = os.path.abspath(knowledge_path)
+        log = open(os.path.join(log_dir, f"{name}.log"), "w")
+        processes[name] = subprocess.Popen(command, cwd=ROOT, env=env,
+                                           stdout=log, stderr=subprocess.STDOUT)
+    return processes
+
+
+def wait_healthy(host, ports, timeout=30.0):
+    deadline = time.time() + timeout
+    for name, port in ports.items():
+        while True:
+            try:
+                with urllib.request.urlopen(f"http://{host}:{port}/health", timeout=1) as response:
+                    if response.status == 200:
+                        break
+            except OSError:
+                pass
+            if time.time() > deadline:
+                raise RuntimeError(f"{name} server did not become healthy on port {port}")
+            time.sleep(0.2)
+
+
+def server_pid(process):
+    """The process serving requests: the worker under gunicorn, else the process itself"""
+    workers = child_pids(process.pid)
+    return workers[0] if workers else process.pid
+
+
+def stop_servers(processes):
+    for process in processes.values():
+        process.terminate()
+    for process in processes.values():
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def call(client, method, path, payload=None):
+    body = json.dumps(payload) if payload is not None else None
+    status, response = client.request(method, path, body)
+    if status >= 400:
+        raise RuntimeError(f"HTTP {status}")
+    return json.loads(response)
+
+
+def op_rag(session):
+    call(session.clients["rag"], "POST", "/api/v1/rag/query", {"query": session.rng.choice(session.queries)})
+
+
+def op_register(session):
+    i = session.rng.randrange(1_000_000)
+    result = call(session.clients["hospital"], "POST", "/api/v1/patients/register", {
+        "first_name": "Load", "last_name": f"Test{i}", "date_of_birth": "1985-06-15",
+        "email": f"load{i}@example.com", "insurance_policy_number": session.rng.choice(session.policies)
+    })
+    session.patient_ids.append(result["patient_id"])
+
+
+def op_lookup(session):
+    if not session.patient_ids:
+        return op_register(session)
+    call(session.clients["hospital"], "GET", f"/api/v1/patients/{session.rng.choice(session.patient_ids)}")
+
+
+def op_claim(session):
+    call(session.clients["hospital"], "POST", "/api/v1/insurance-claims", {
+        "patient_id": session.rng.choice(session.patient_ids) if session.patient_ids else "",
+        "policy_number": session.rng.choice(session.policies),
+        "total_amount": round(session.rng.uniform(50, 5000), 2),
+        "claim_type": session.rng.choice(SERVICES)
+    })
+
+
+def op_assess(session):
+    call(session.clients["insurance"], "POST", "/api/v1/claims/assess", {
+        "policy_number": session.rng.choice(session.policies),
+        "service": session.rng.choice(SERVICES),
+        "total_amount": round(session.rng.uniform(50, 5000), 2)
+    })
+
+
+OPERATIONS = {
+    "rag": op_rag,
+    "register": op_register,
+    "lookup": op_lookup,
+    "claim": op_claim,
+    "assess": op_assess,
+}
+
+
+class Session:
+    """Per-client state: its own connections, RNG and registered patients"""
+
+    def __init__(self, host, ports, timeout, seed, queries, policies):
+        self.clients = {name: Client(host, port, timeout) for name, port in ports.items()}
+        self.rng = random.Random(seed)
+        self.queries = queries
+        self.policies = policies
+        self.patient_ids = []
+
+    def close(self):
+        for client in self.clients.values():
+            client.close()
+
+
+def create_policies(host, port, rng):
+    """Create the policies claims are assessed against; returns their numbers"""
+    client = Client(host, port, 10.0)
+    numbers = []
+    for i in range(POLICY_COUNT):
+        number = f"BENCH-{i:04d}"
+        status, _ = client.request("POST", "/api/v1/policies", json.dumps({
+            "patient_id": f"PAT-BENCH{i:04d}", "policy_number": number,
+            "deductible": rng.choice([500, 1500, 3000])
+        }))
+        # 409: created by an earlier run against the same storage
+        if status >= 400 and status != 409:
+            raise RuntimeError(f"HTTP {status}")
+        numbers.append(number)
+    client.close()
+    return numbers
+
+
+def run_session(session, mix, requests, start_event, samples, errors):
+    names = [name for name, _ in mix]
+    weights = [weight for _, weight in mix]
+    start_event.wait()
+    for _ in range(requests):
+        name = session.rng.choices(names, weights)[0]
+        started = time.perf_counter()
+        try:
+            OPERATIONS[name](session)
+        except Exception as e:
+            errors.append(f"{name}: {e}")
+            for client in session.clients.values():
+                client.close()
+                client.connection = None
+            continue
+        samples.append((name, time.perf_counter() - started))
+    session.close()
+
+
+def summarize(latencies, elapsed):
+    latencies = sorted(latencies)
+    return {
+        "requests": len(latencies),
+        "requests_per_second": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "max_ms": round(latencies[-1] * 1000, 2) if latencies else 0.0
+    }
+
+
+def run_benchmark(host, ports, clients, requests, mix, seed, timeout=30.0, knowledge_path=None, pids=None):
+    """Run the workload against running servers and return a stats dict"""
+    rng = random.Random(seed)
+    knowledge_path = knowledge_path or os.path.join(ROOT, "knowledge_base.json")
+    queries = build_queries(knowledge_path, rng)
+    policies = create_policies(host, ports["insurance"], rng)
+    memory_before = {name: rss_mb(pid)[0] for name, pid in (pids or {}).items()}
+
+    samples = []
+    errors = []
+    start_event = threading.Event()
+    sessions = [Session(host, ports, timeout, seed * 1000 + i, queries, policies) for i in range(clients)]
+    threads = [threading.Thread(target=run_session, args=(session, mix, requests, start_event, samples, errors))
+               for session in sessions]
+    for thread in threads:
+        thread.start()
+    started = time.perf_counter()
+    start_event.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    by_operation = {}
+    for name, latency in samples:
+        by_operation.setdefault(name, []).append(latency)
+    memory = {}
+    for name, pid in (pids or {}).items():
+        current, peak = rss_mb(pid)
+        memory[name] = {"rss_before_mb": memory_before[name], "rss_after_mb": current, "peak_rss_mb": peak}
+
+    return {
+        "clients": clients,
+        "requests_per_client": requests,
+        "mix": dict(mix),
+        "seed": seed,
+        "elapsed_seconds": round(elapsed, 3),
+        "errors": len(errors),
+        "overall": summarize([latency for _, latency in samples], elapsed),
+        "operations": {name: summarize(latencies, elapsed) for name, latencies in sorted(by_operation.items())},
+        "memory": memory,
+        "sample_errors": errors[:5]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the RAG, insurance and hospital servers together")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--clients", type=int, default=32, help="concurrent clients")
+    parser.add_argument("--requests", type=int, default=200, help="requests per client")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"operation weights (default {DEFAULT_MIX})")
+    parser.add_argument("--seed", type=int, default=42, help="seed for the query mix and workload")
+    parser.add_argument("--timeout", type=float, default=30.0, help="per-request timeout in seconds")
+    parser.add_argument("--knowledge", help="knowledge base file the RAG questions are drawn from")
+    parser.add_argument("--no-start", action="store_true", help="use servers that are already running")
+    parser.add_argument("--log-dir", default=os.path.join(ROOT, "benchmarks", "logs"),
+                        help="where started servers write their output")
+    for name, port in DEFAULT_PORTS.items():
+        parser.add_argument(f"--{name}-port", type=int, default=port)
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    ports = {name: getattr(args, f"{name}_port") for name in SERVERS}
+    processes = {}
+    try:
+        if not args.no_start:
+            os.makedirs(args.log_dir, exist_ok=True)
+            processes = start_servers(ports, args.log_dir, args.knowledge)
+        wait_healthy(args.host, ports)
+        stats = run_benchmark(args.host, ports, args.clients, args.requests, mix, args.seed,
+                              timeout=args.timeout, knowledge_path=args.knowledge,
+                              pids={name: server_pid(process) for name, process in processes.items()})
+    finally:
+        stop_servers(processes)
+    print(json.dumps(stats, indent=2))
+
+
+if __name__ == "__main__":
+    main()
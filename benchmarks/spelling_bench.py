@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Query Spelling Correction Benchmark
+Asks the knowledge base about each topic's keywords, spelled right and
+with one typo, plus questions no topic covers, with spelling correction
+off and on. As in the server, only questions that fall back are
+corrected. Reports fallback rate, how often the asked-about topic was
+the best match, and per-query latency for each backend. Then measures
+the cost of correcting a word as the keyword vocabulary grows.
+
+Usage:
+    python -m benchmarks.spelling_bench
+    python -m benchmarks.spelling_bench --knowledge knowledge_base.json --sizes 10,1000,100000
+"""
+
+import argparse
+import json
+import os
+import random
+import time
+
+from benchmarks.hospital_load import percentile
+from benchmarks.match_bench import make_knowledge, make_vocabulary
+from benchmarks.patient_search import misspell
+from knowledge_base import KnowledgeBase
+from query_spelling import MIN_LENGTH, SpellingCorrector, words
+from response_cache import normalize_query
+
+TEMPLATES = (
+    "Does my plan cover {}?",
+    "How much do I pay for {}",
+    "what is the {} policy",
+    "Is {} included in my insurance?",
+)
+
+# Misspellings members actually send
+REPORTED_TYPOS = (
+    ("What is my deductable?", "deductible"),
+    ("Is my perscription covered", "prescription"),
+    ("Do you cover a chiropracter?", "alternative"),
+    ("how much is the ambulence", "emergency"),
+    ("is acupunture covered", "alternative"),
+    ("pregnacy coverage", "maternity"),
+    ("do i need a refferal for a specialist", "specialist"),
+    ("is telehealth covered for mental heath", "mental_health"),
+)
+
+# Questions no topic answers; correction should not make them match
+OFF_TOPIC = (
+    "How do I reset my password?",
+    "What time does the office open on Saturday?",
+    "Can I change the address on my account?",
+    "Where do I mail a paper form?",
+    "Who won the game last night?",
+    "How do I update my billing information?",
+    "Can I speak to a person about my letter?",
+    "What is the weather like today?",
+    "how do i pay my medical bills",
+    "can I dispute a denial",
+    "Why was my claim denied?",
+    "I want to appeal a decision",
+    "Where do I send my receipts?",
+    "How long does a refund take?",
+    "Can I pay my bill online?",
+    "Why did my premium payment bounce?",
+    "I lost my member card",
+    "How do I add my wife to my account?",
+    "My address changed last month",
+    "Can you resend the letter you mailed me?",
+    "Who do I call about a billing error?",
+    "How do I cancel my plan?",
+    "I was charged twice this month",
+    "Where can I find my claim number?",
+    "What does this statement mean?",
+    "Can I get a copy of my records?",
+    "Is the portal down today?",
+    "How do I file a complaint?",
+    "I need to update my phone number",
+    "When will my new card arrive?",
+    "Can I speak with a supervisor?",
+    "How do I change my password on the app?",
+)
+
+
+def make_corpus(knowledge, rng):
+    """{name: [(query, expected topic or None)]}"""
+    clean = []
+    misspelled = []
+    for topic_key, topic in knowledge.items():
+        for keyword in topic["keywords"]:
+            template = rng.choice(TEMPLATES)
+            clean.append((template.format(keyword), topic_key))
+            candidates = [word for word in words(keyword) if len(word) > MIN_LENGTH]
+            if candidates:
+                word = rng.choice(candidates)
+                typo = word
+                while typo == word:
+                    typo = misspell(word, rng)
+                misspelled.append((template.format(keyword.replace(word, typo, 1)), topic_key))
+    return {
+        "clean": clean,
+        "misspelled": misspelled,
+        "reported_typos": list(REPORTED_TYPOS),
+        "off_topic": [(query, None) for query in OFF_TOPIC],
+    }
+
+
+def measure(knowledge_base, queries, backend, correct):
+    latencies = []
+    fallbacks = 0
+    right_topic = 0
+    speller = knowledge_base.speller
+    for query, expected in queries:
+        started = time.perf_counter()
+        text = normalize_query(query)
+        matches = knowledge_base.top_matches(text, backend, top_k=3, min_score=0.5)
+        if correct and not matches:
+            # As the server does: correct only questions that fall back
+            matches = knowledge_base.top_matches(speller.correct(text), backend, top_k=3, min_score=0.5)
+        latencies.append(time.perf_counter() - started)
+        fallbacks += not matches
+        right_topic += bool(matches) and matches[0][0] == expected
+    latencies.sort()
+    return {
+        "fallback_rate": round(fallbacks / len(queries), 3),
+        # Off-topic queries have no right topic, so this is 0 for them
+        "right_topic_rate": round(right_topic / len(queries), 3),
+        "mean_us": round(sum(latencies) / len(latencies) * 1e6, 1),
+        "p99_us": round(percentile(latencies, 0.99) * 1e6, 1)
+    }
+
+
+def bench_vocabulary(topic_count, rng, vocabulary, samples):
+    """Build time and per-word correction latency for a synthetic knowledge base"""
+    knowledge = make_knowledge(topic_count, vocabulary, rng)
+    started = time.perf_counter()
+    speller = SpellingCorrector.from_knowledge(knowledge)
+    build_seconds = time.perf_counter() - started
+
+    terms = list(speller.index.counts)
+    typos = []
+    while len(typos) < samples:
+        word = rng.choice(terms)
+        typo = misspell(word, rng)
+        if typo not in speller.known:
+            typos.append((word, typo))
+    latencies = []
+    fixed = 0
+    for word, typo in typos:
+        started = time.perf_counter()
+        correction = speller.correct_word(typo)
+        latencies.append(time.perf_counter() - started)
+        fixed += correction == word
+    latencies.sort()
+    return {
+        "topics": topic_count,
+        "vocabulary": len(terms),
+        "build_seconds": round(build_seconds, 3),
+        "restored_rate": round(fixed / samples, 3),
+        "mean_us": round(sum(latencies) / len(latencies) * 1e6, 1),
+        "p99_us": round(percentile(latencies, 0.99) * 1e6, 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure fallback rate and latency with spelling correction")
+    parser.add_argument("--knowledge", default=os.path.join(os.path.dirname(os.path.dirname(
+        os.path.abspath(__file__))), "knowledge_base.json"))
+    parser.add_argument("--backends", default="keyword,vector", help="comma-separated backends")
+    parser.add_argument("--sizes", default="10,1000,100000",
+                        help="synthetic topic counts for the per-word latency run, empty to skip")
+    parser.add_argument("--words", type=int, default=2000, help="misspelled words per synthetic size")
+    parser.add_argument("--seed", type=int, default=23)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    knowledge_base = KnowledgeBase.open(args.knowledge)
+    corpus = make_corpus(knowledge_base.knowledge, rng)
+    for backend in (backend.strip() for backend in args.backends.split(",") if backend.strip()):
+        for name, queries in corpus.items():
+            print(json.dumps({
+                "backend": backend,
+                "corpus": name,
+                "queries": len(queries),
+                "off": measure(knowledge_base, queries, backend, correct=False),
+                "on": measure(knowledge_base, queries, backend, correct=True)
+            }), flush=True)
+
+    vocabulary = make_vocabulary(rng)
+    for size in (int(size) for size in args.sizes.split(",") if size.strip()):
+        print(json.dumps(bench_vocabulary(size, rng, vocabulary, args.words)), flush=True)
+
+
+if __name__ == "__main__":
+    main()
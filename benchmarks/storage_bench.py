@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Storage Backend Benchmark
+Compares insert, id lookup and indexed-filter page throughput of the
+in-memory and SQLite record collections.
+
+Usage:
+    python -m benchmarks.storage_bench --records 50000
+"""
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+from storage import open_collection
+
+
+def make_record(index):
+    return {
+        "claim_id": f"CLM-{index:08d}",
+        "patient_id": f"PAT-{index % 5000:05d}",
+        "policy_number": f"POL-{index % 2000:06d}",
+        "total_amount": round(random.uniform(50, 5000), 2),
+        "claim_type": random.choice(["emergency", "specialist", "prescription", "preventive_care"]),
+        "status": random.choice(["submitted", "approved", "denied"]),
+    }
+
+
+def timed(operation, count):
+    started = time.perf_counter()
+    operation()
+    elapsed = time.perf_counter() - started
+    return {"seconds": round(elapsed, 4), "ops_per_second": round(count / elapsed, 1) if elapsed else None}
+
+
+def bench_backend(backend, path, records, lookups):
+    collection = open_collection("bench", "claims", backend=backend, path=path)
+    data = [make_record(i) for i in range(records)]
+    ids = [record["claim_id"] for record in data]
+    probe_ids = [random.choice(ids) for _ in range(lookups)]
+    probe_patients = [f"PAT-{random.randrange(5000):05d}" for _ in range(lookups // 10)]
+
+    def insert():
+        for record in data:
+            collection[record["claim_id"]] = record
+
+    def lookup():
+        for record_id in probe_ids:
+            collection[record_id]
+
+    def filter_pages():
+        for patient_id in probe_patients:
+            collection.page(20, filters={"patient_id": patient_id})
+
+    return {
+        "insert": timed(insert, records),
+        "lookup_by_id": timed(lookup, lookups),
+        "page_by_patient_id": timed(filter_pages, len(probe_patients)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the storage backends")
+    parser.add_argument("--records", type=int, default=50000)
+    parser.add_argument("--lookups", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for backend in ("memory", "sqlite"):
+            random.seed(args.seed)
+            results[backend] = bench_backend(backend, os.path.join(directory, "bench.db"),
+                                             args.records, args.lookups)
+    print(json.dumps({"records": args.records, "lookups": args.lookups, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
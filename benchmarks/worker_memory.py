@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+RAG Worker Memory and Scaling Benchmark
+Starts the RAG server under gunicorn with and without preload_app on a
+synthetic knowledge base, and reports per-worker private (USS) and
+proportional (PSS) memory before and after load, plus query throughput
+for each worker count.
+
+Usage:
+    python -m benchmarks.worker_memory --topics 20000 --workers 1,2,4
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+from benchmarks.hospital_load import Client, percentile
+from benchmarks.match_bench import make_knowledge, make_queries, make_vocabulary
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def memory_mb(pid):
+    """{rss, pss, uss} in MB for a process, from /proc/<pid>/smaps_rollup (Linux only)"""
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[1].isdigit():
+                fields[parts[0].rstrip(":")] = int(parts[1])
+    uss = fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0)
+    return {"rss": round(fields["Rss"] / 1024, 1), "pss": round(fields["Pss"] / 1024, 1), "uss": round(uss / 1024, 1)}
+
+
+def child_pids(pid):
+    with open(f"/proc/{pid}/task/{pid}/children") as f:
+        return [int(child) for child in f.read().split()]
+
+
+def wait_for_workers(port, master, workers, timeout):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=2):
+                if len(child_pids(master.pid)) >= workers:
+                    return
+        except OSError:
+            pass
+        if master.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with code {master.returncode}")
+        time.sleep(0.5)
+    raise RuntimeError(f"workers not ready after {timeout}s")
+
+
+def summarize_memory(master_pid, worker_pids):
+    workers = [memory_mb(pid) for pid in worker_pids]
+    master = memory_mb(master_pid)
+    return {
+        "worker_uss_mb": round(sum(w["uss"] for w in workers) / len(workers), 1),
+        "worker_pss_mb": round(sum(w["pss"] for w in workers) / len(workers), 1),
+        "worker_rss_mb": round(sum(w["rss"] for w in workers) / len(workers), 1),
+        # PSS splits shared pages between processes, so the sum is the real footprint
+        "total_pss_mb": round(master["pss"] + sum(w["pss"] for w in workers), 1)
+    }
+
+
+def drive_load(port, queries, clients, requests):
+    latencies = []
+    errors = []
+
+    def run(seed):
+        rng = random.Random(seed)
+        client = Client("127.0.0.1", port, 30.0)
+        for _ in range(requests):
+            body = json.dumps({"query": rng.choice(queries)})
+            started = time.perf_counter()
+            try:
+                status, _ = client.request("POST", "/api/v1/rag/query", body)
+                if status >= 400:
+                    raise RuntimeError(f"HTTP {status}")
+            except Exception as e:
+                errors.append(str(e))
+                client.close()
+                client.connection = None
+                continue
+            latencies.append(time.perf_counter() - started)
+        client.close()
+
+    threads = [threading.Thread(target=run, args=(seed,)) for seed in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "requests_per_second": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "errors": len(errors)
+    }
+
+
+def run_mode(knowledge_path, queries, workers, preload, port, clients, requests, startup_timeout):
+    env = dict(os.environ, HEALTHGUARD_SERVICE="rag", PORT=str(port), WEB_CONCURRENCY=str(workers),
+               GUNICORN_PRELOAD="1" if preload else "0", KNOWLEDGE_BASE_PATH=knowledge_path,
+               LOG_LEVEL="WARNING", RAG_CACHE_SIZE="0",
+               # Unpreloaded workers build the index concurrently; don't let the boot time out
+               GUNICORN_TIMEOUT=str(int(startup_timeout)))
+    started = time.perf_counter()
+    master = subprocess.Popen([sys.executable, "-m", "gunicorn", "-c", "gunicorn_config.py",
+                               "enhanced_rag_server:app"], cwd=ROOT, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_for_workers(port, master, workers, startup_timeout)
+        startup = time.perf_counter() - started
+        worker_pids = child_pids(master.pid)
+        idle = summarize_memory(master.pid, worker_pids)
+        load = drive_load(port, queries, clients, requests)
+        loaded = summarize_memory(master.pid, worker_pids)
+    finally:
+        master.terminate()
+        master.wait(timeout=30)
+    return {
+        "workers": workers,
+        "preload": preload,
+        "startup_seconds": round(startup, 2),
+        "idle": idle,
+        "after_load": loaded,
+        "load": load
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure RAG worker memory sharing and throughput scaling")
+    parser.add_argument("--topics", type=int, default=20000, help="synthetic knowledge base size")
+    parser.add_argument("--workers", default="1,2,4", help="comma-separated worker counts")
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=100, help="requests per client")
+    parser.add_argument("--port", type=int, default=18105)
+    parser.add_argument("--startup-timeout", type=float, default=600)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    vocabulary = make_vocabulary(rng)
+    knowledge = make_knowledge(args.topics, vocabulary, rng)
+    # Cache disabled above so every request is scored
+    queries = make_queries(knowledge, vocabulary, rng, 2000)
+
+    with tempfile.TemporaryDirectory() as directory:
+        knowledge_path = os.path.join(directory, "knowledge_base.json")
+        with open(knowledge_path, "w", encoding="utf-8") as f:
+            json.dump(knowledge, f)
+        for workers in (int(count) for count in args.workers.split(",")):
+            for preload in (True, False):
+                result = run_mode(knowledge_path, queries, workers, preload, args.port,
+                                  args.clients, args.requests, args.startup_timeout)
+                print(json.dumps(result), flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Bulk Claim Assessment
+Assesses claims in vectorized chunks against each claim's policy
+(coverage, deductible and out-of-pocket maximum, accumulated per member
+across the run) and streams the results as JSONL.
+
+Usage:
+    python claim_assessment.py claims.jsonl --policies policies.jsonl > assessments.jsonl
+"""
+
+import argparse
+import json
+import sys
+import time
+
+from adjudication import AdjudicationEngine
+
+# Claims assessed per vectorized chunk
+DEFAULT_CHUNK_SIZE = 1000
+
+
+def _claim_amount(claim):
+    """Claim total as a float; raises ValueError for missing or negative amounts"""
+    amount = claim.get("total_amount")
+    if isinstance(amount, bool) or not isinstance(amount, (int, float)):
+        raise ValueError("total_amount must be a number")
+    if amount < 0:
+        raise ValueError("total_amount cannot be negative")
+    return float(amount)
+
+
+def _check_references(claim):
+    """Raise ValueError unless policy_number and patient_id can key the engine's tables"""
+    policy_number = claim.get("policy_number")
+    if policy_number is not None and not isinstance(policy_number, str):
+        raise ValueError("policy_number must be a string")
+    patient_id = claim.get("patient_id")
+    if patient_id is not None and (isinstance(patient_id, bool) or not isinstance(patient_id, (str, int))):
+        raise ValueError("patient_id must be a string")
+
+
+def assess_chunk(claims, engine, start_index=0, assessed_at=None):
+    """Assess a list of claims with the adjudication engine, results in input order
+
+    Invalid claims get {"index", "error"} entries instead of failing the chunk.
+    """
+    results = [None] * len(claims)
+    valid = []
+    offsets = []
+
+    for offset, claim in enumerate(claims):
+        try:
+            if isinstance(claim, ParseError):
+                raise ValueError(claim.message)
+            if not isinstance(claim, dict):
+                raise ValueError("claim must be an object")
+            _claim_amount(claim)
+            _check_references(claim)
+        except ValueError as e:
+            results[offset] = {"index": start_index + offset, "error": str(e)}
+            continue
+        valid.append(claim)
+        offsets.append(offset)
+
+    for offset, assessment in zip(offsets, engine.assess_batch(valid, assessed_at)):
+        results[offset] = {"index": start_index + offset, **assessment}
+    return results
+
+
+def assess_stream(claims, engine, chunk_size=DEFAULT_CHUNK_SIZE, stats=None):
+    """Yield assessments for an iterable of claims, one chunk at a time
+
+    stats (a dict) is filled in with running throughput totals.
+    """
+    stats = stats if stats is not None else {}
+    stats.update(claims=0, assessed=0, errors=0, approved=0, denied=0,
+                 total_amount=0.0, covered_amount=0.0)
+    started = time.perf_counter()
+
+    def flush(chunk, start_index):
+        for result in assess_chunk(chunk, engine, start_index):
+            if "error" in result:
+                stats["errors"] += 1
+            else:
+                stats["assessed"] += 1
+                stats[result["status"]] += 1
+                stats["total_amount"] += result["total_amount"]
+                stats["covered_amount"] += result["covered_amount"]
+            yield result
+
+    chunk = []
+    start_index = 0
+    for claim in claims:
+        chunk.append(claim)
+        stats["claims"] += 1
+        if len(chunk) >= chunk_size:
+            yield from flush(chunk, start_index)
+            start_index += len(chunk)
+            chunk = []
+    if chunk:
+        yield from flush(chunk, start_index)
+
+    elapsed = time.perf_counter() - started
+    stats["total_amount"] = round(stats["total_amount"], 2)
+    stats["covered_amount"] = round(stats["covered_amount"], 2)
+    stats["elapsed_seconds"] = round(elapsed, 4)
+    stats["claims_per_second"] = round(stats["claims"] / elapsed, 1) if elapsed else None
+
+
+class ParseError:
+    """Placeholder for a JSONL line that could not be parsed"""
+
+    def __init__(self, message):
+        self.message = message
+
+
+def read_jsonl(stream):
+    """Yield one JSON value per non-blank line; bad lines become error markers"""
+    for line_number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as e:
+            yield ParseError(f"line {line_number}: {e.msg}")
+
+
+def load_policies(path):
+    """Read the policies in a JSON list/object or JSONL file"""
+    with open(path, encoding="utf-8") as f:
+        if path.endswith(".jsonl"):
+            records = [record for record in read_jsonl(f) if isinstance(record, dict)]
+        else:
+            records = json.load(f)
+            if isinstance(records, dict):
+                records = records.get("data", list(records.values()))
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Assess a JSONL file of claims in vectorized chunks")
+    parser.add_argument("claims", help="JSONL file of claims ('-' for stdin)")
+    parser.add_argument("--policies", help="JSON/JSONL file of policies (claims without a policy are denied)")
+    parser.add_argument("--output", "-o", help="output JSONL file (default stdout)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    engine = AdjudicationEngine()
+    for policy in load_policies(args.policies) if args.policies else []:
+        engine.register_policy(policy)
+    source = sys.stdin if args.claims == "-" else open(args.claims, encoding="utf-8")
+    output = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    stats = {}
+    try:
+        for result in assess_stream(read_jsonl(source), engine, args.chunk_size, stats):
+            output.write(json.dumps(result, separators=(",", ":")) + "\n")
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if output is not sys.stdout:
+            output.close()
+    print(json.dumps(stats), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+"""
+Claim Processing Pipeline for the Hospital Server
+A bounded in-process queue of submitted claim ids drained by a pool of
+worker threads. Each worker takes a batch, checks every claim's
+medical_record_ids against the stored medical records, sends the valid
+claims to the insurance server's bulk assessment endpoint in one request
+(optionally from a process pool), and writes the resulting status back.
+"""
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from fast_json import dumps, loads, timestamp
+from metrics import REGISTRY, configure_logging
+
+INSURANCE_SERVER_URL = os.environ.get('INSURANCE_SERVER_URL', 'http://localhost:8004')
+# Worker threads taking batches off the queue
+CLAIM_WORKERS = int(os.environ.get('HOSPITAL_CLAIM_WORKERS', 4))
+# "thread" sends assessments from the worker threads, "process" from a process pool
+CLAIM_EXECUTOR = os.environ.get('HOSPITAL_CLAIM_EXECUTOR', 'thread').lower()
+# Most claims assessed per request, and how long (ms) a worker waits to fill a batch
+CLAIM_BATCH_SIZE = int(os.environ.get('HOSPITAL_CLAIM_BATCH', 100))
+CLAIM_BATCH_WAIT_MS = float(os.environ.get('HOSPITAL_CLAIM_BATCH_WAIT_MS', 20))
+# Claims waiting at most; submissions beyond it are refused
+CLAIM_QUEUE_LIMIT = int(os.environ.get('HOSPITAL_CLAIM_QUEUE', 10000))
+# Attempts at assessing a claim before it is marked failed, and the request timeout (s)
+CLAIM_MAX_ATTEMPTS = int(os.environ.get('HOSPITAL_CLAIM_ATTEMPTS', 3))
+CLAIM_ASSESS_TIMEOUT = float(os.environ.get('HOSPITAL_CLAIM_TIMEOUT', 10))
+
+# Statuses a claim moves through; the last four are final
+SUBMITTED, PROCESSING = 'submitted', 'processing'
+APPROVED, DENIED, REJECTED, FAILED = 'approved', 'denied', 'rejected', 'failed'
+PENDING_STATUSES = (SUBMITTED, PROCESSING)
+
+CLAIM_OUTCOMES = REGISTRY.counter('hospital_claims_processed_total', 'Claims finished by the pipeline',
+                                  ('status',))
+CLAIM_LATENCY = REGISTRY.histogram('hospital_claim_processing_seconds',
+                                   'Time from claim submission to its final status')
+CLAIM_BATCHES = REGISTRY.histogram('hospital_claim_batch_size', 'Claims per assessment batch',
+                                   buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000))
+
+logger = configure_logging('claims')
+
+
+class AssessmentError(Exception):
+    """The insurance server could not assess a batch (unreachable, timed out, 5xx)"""
+
+
+class InsuranceAssessor:
+    """Assess claims through the insurance server's bulk endpoint
+
+    A plain picklable object, so it can be run in a process pool.
+    """
+
+    def __init__(self, base_url=INSURANCE_SERVER_URL, timeout=CLAIM_ASSESS_TIMEOUT):
+        self.url = base_url.rstrip('/') + '/api/v1/claims/assess/bulk'
+        self.timeout = timeout
+
+    def __call__(self, claims):
+        """One result per claim, in order: an assessment or {"error": ...}"""
+        body = b"".join(dumps(claim) + b"\n" for claim in claims)
+        request = urllib.request.Request(self.url, data=body, method='POST',
+                                         headers={'Content-Type': 'application/x-ndjson'})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                lines = response.read().splitlines()
+        except (urllib.error.URLError, OSError) as e:
+            raise AssessmentError(f"Insurance server unavailable: {e}") from e
+        # The summary line has no index
+        return _in_claim_order((result for result in map(loads, lines) if "index" in result), len(claims))
+
+
+class LocalAssessor:
+    """Assess claims by calling the insurance service's assessment in this process (app.py)"""
+
+    def __init__(self, assess):
+        # assess(claims) yields results carrying their claim's "index"
+        self.assess = assess
+
+    def __call__(self, claims):
+        return _in_claim_order(self.assess(claims), len(claims))
+
+
+def _in_claim_order(results, count):
+    """Results indexed by claim position, in order; AssessmentError if any is missing"""
+    ordered = [None] * count
+    for result in results:
+        ordered[result.pop("index")] = result
+    if any(result is None for result in ordered):
+        raise AssessmentError("Insurance server returned an incomplete batch")
+    return ordered
+
+
+def _exit_with_parent(parent_pid):
+    """Pool worker initializer: exit once the server process is gone
+
+    A server killed by a signal never shuts its pool down, and the idle
+    workers would otherwise wait on the call queue forever.
+    """
+    def watch():
+        while os.getppid() == parent_pid:
+            time.sleep(1)
+        os._exit(0)
+
+    threading.Thread(target=watch, name='parent-watch', daemon=True).start()
+
+
+def validate_claim(claim, medical_records):
+    """Problems with a claim's medical_record_ids (empty when it is valid)"""
+    record_ids = claim.get("medical_record_ids")
+    if not isinstance(record_ids, list) or not record_ids:
+        return ["medical_record_ids must be a non-empty list"]
+    errors = []
+    for record_id in record_ids:
+        record = medical_records.get(record_id) if isinstance(record_id, str) else None
+        if record is None:
+            errors.append(f"Medical record {record_id} not found")
+        elif record.get("patient_id") != claim.get("patient_id"):
+            errors.append(f"Medical record {record_id} belongs to another patient")
+    return errors
+
+
+def assessment_request(claim):
+    """Fields the insurance server assesses a claim on"""
+    return {
+        "claim_id": claim["claim_id"],
+        "patient_id": claim.get("patient_id"),
+        "policy_number": claim.get("policy_number"),
+        "claim_type": claim.get("claim_type"),
+        "total_amount": claim.get("total_amount")
+    }
+
+
+class ClaimPipeline:
+    """Bounded queue of claim ids and the worker pool that assesses them"""
+
+    def __init__(self, claims, medical_records, assessor=None, workers=CLAIM_WORKERS,
+                 executor=CLAIM_EXECUTOR, batch_size=CLAIM_BATCH_SIZE, batch_wait=CLAIM_BATCH_WAIT_MS / 1000,
+                 max_queue=CLAIM_QUEUE_LIMIT, max_attempts=CLAIM_MAX_ATTEMPTS, retry_delay=1.0):
+        if executor not in ('thread', 'process'):
+            raise ValueError(f"HOSPITAL_CLAIM_EXECUTOR must be 'thread' or 'process', got {executor!r}")
+        self.claims = claims
+        self.medical_records = medical_records
+        self.assessor = assessor or InsuranceAssessor()
+        self.workers = workers
+        self.executor = executor
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.max_queue = max_queue
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        # (claim_id, enqueued_at) pairs
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._pool = None
+        self._started_pid = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        # Seconds from submission to final status of recently finished claims
+        self._latencies = deque(maxlen=2048)
+        self.accepted = 0
+        self.refused = 0
+        self.batches = 0
+        self.assessed = 0
+        self.outcomes = {}
+
+        REGISTRY.gauge('hospital_claim_queue_depth', 'Claims waiting for a pipeline worker',
+                       lambda: self._queue.qsize())
+
+    def start(self):
+        """Start the worker threads for this process; False if they were already running"""
+        with self._start_lock:
+            if self._started_pid == os.getpid():
+                return False
+            self._started_pid = os.getpid()
+            if self.executor == 'process':
+                # Spawned, not forked: a forked child would inherit the server's
+                # listening socket and worker threads
+                self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context('spawn'),
+                                                 initializer=_exit_with_parent, initargs=(os.getpid(),))
+            for number in range(self.workers):
+                threading.Thread(target=self._work, name=f'claim-worker-{number}', daemon=True).start()
+            return True
+
+    def has_room(self):
+        """False (counted as a refusal) when a submission would not fit in the queue"""
+        if not self._queue.full():
+            return True
+        with self._stats_lock:
+            self.refused += 1
+        return False
+
+    def submit(self, claim_id):
+        """Queue a stored claim; False when the queue is full"""
+        self.start()
+        try:
+            self._queue.put_nowait((claim_id, time.monotonic()))
+        except queue.Full:
+            with self._stats_lock:
+                self.refused += 1
+            return False
+        with self._stats_lock:
+            self.accepted += 1
+        return True
+
+    def resume(self):
+        """Queue claims left pending by a previous run (persistent storage only)"""
+        pending = [claim["claim_id"] for status in PENDING_STATUSES
+                   for claim in self.claims.iter_records({"status": status})]
+        queued = sum(1 for claim_id in pending if self.submit(claim_id))
+        if queued:
+            logger.info(f"📥 Resumed {queued} pending claims")
+        return queued
+
+    def _next_batch(self):
+        """Block for one claim, then take whatever else arrives within batch_wait"""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.batch_wait
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _work(self):
+        while True:
+            batch = self._next_batch()
+            try:
+                self.process_batch(batch)
+            except Exception:
+                logger.exception(f"❌ Claim batch of {len(batch)} failed")
+
+    def _finish(self, claim, status, enqueued_at, **fields):
+        self.claims[claim["claim_id"]] = {**claim, **fields, "status": status, "last_updated": timestamp()}
+        seconds = time.monotonic() - enqueued_at
+        CLAIM_OUTCOMES.inc(status=status)
+        CLAIM_LATENCY.observe(seconds)
+        with self._stats_lock:
+            self.outcomes[status] = self.outcomes.get(status, 0) + 1
+            self._latencies.append(seconds)
+
+    def process_batch(self, batch):
+        """Validate, assess and record the final status of a batch of (claim_id, enqueued_at)"""
+        valid = []
+        for claim_id, enqueued_at in batch:
+            claim = self.claims.get(claim_id)
+            if claim is None or claim.get("status") not in PENDING_STATUSES:
+                continue
+            errors = validate_claim(claim, self.medical_records)
+            if errors:
+                self._finish(claim, REJECTED, enqueued_at, validation_errors=errors)
+                continue
+            claim = {**claim, "status": PROCESSING}
+            self.claims[claim_id] = claim
+            valid.append((claim, enqueued_at))
+        if not valid:
+            return
+
+        requests = [assessment_request(claim) for claim, _ in valid]
+        CLAIM_BATCHES.observe(len(requests))
+        with self._stats_lock:
+            self.batches += 1
+            self.assessed += len(requests)
+        try:
+            if self._pool is not None:
+                results = self._pool.submit(self.assessor, requests).result()
+            else:
+                results = self.assessor(requests)
+        except AssessmentError as e:
+            self._retry(valid, str(e))
+            return
+        except Exception as e:
+            # A malformed response or a bug in the assessor: retry, then fail, rather than
+            # leaving the batch in processing until the server restarts
+            logger.exception(f"❌ Assessing a batch of {len(valid)} claims raised")
+            self._retry(valid, f"Assessment failed: {type(e).__name__}: {e}")
+            return
+
+        for (claim, enqueued_at), result in zip(valid, results):
+            try:
+                if "error" in result:
+                    self._finish(claim, REJECTED, enqueued_at, validation_errors=[result["error"]])
+                else:
+                    self._finish(claim, result["status"], enqueued_at, assessment=result,
+                                 covered_amount=result["covered_amount"],
+                                 patient_responsibility=result["patient_responsibility"])
+            except (KeyError, TypeError) as e:
+                self._finish(claim, FAILED, enqueued_at, error=f"Malformed assessment: {type(e).__name__}: {e}")
+
+    def _retry(self, pending, error):
+        """Requeue claims after a failed assessment, or mark them failed once out of attempts"""
+        logger.warning(f"⚠️ Assessment of {len(pending)} claims failed: {error}")
+        retry = []
+        attempts_made = 1
+        for claim, enqueued_at in pending:
+            attempts = claim.get("assessment_attempts", 0) + 1
+            if attempts >= self.max_attempts:
+                self._finish(claim, FAILED, enqueued_at, assessment_attempts=attempts, error=error)
+                continue
+            self.claims[claim["claim_id"]] = {**claim, "assessment_attempts": attempts, "error": error}
+            retry.append((claim["claim_id"], enqueued_at))
+            attempts_made = max(attempts_made, attempts)
+        if retry:
+            # Back off without holding a worker; the claims keep their place in the latency stats
+            timer = threading.Timer(self.retry_delay * attempts_made, self._requeue, args=(retry,))
+            timer.daemon = True
+            timer.start()
+
+    def _requeue(self, items):
+        for claim_id, enqueued_at in items:
+            try:
+                self._queue.put_nowait((claim_id, enqueued_at))
+            except queue.Full:
+                claim = self.claims.get(claim_id)
+                if claim is not None:
+                    self._finish(claim, FAILED, enqueued_at, error="Claim queue full on retry")
+
+    def stats(self):
+        """Queue depth, throughput and latency for the status endpoint"""
+        with self._stats_lock:
+            latencies = sorted(self._latencies)
+            finished = sum(self.outcomes.values())
+            return {
+                "queue_depth": self._queue.qsize(),
+                "max_queue": self.max_queue,
+                "workers": self.workers,
+                "executor": self.executor,
+                "batch_size": self.batch_size,
+                "accepted": self.accepted,
+                "refused": self.refused,
+                "finished": finished,
+                "outcomes": dict(self.outcomes),
+                "batches": self.batches,
+                "average_batch": round(self.assessed / self.batches, 1) if self.batches else 0.0,
+                "latency_ms": {
+                    "p50": round(latencies[len(latencies) // 2] * 1000, 1) if latencies else None,
+                    "p99": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000, 1)
+                    if latencies else None
+                }
+            }
@@ -0,0 +1,505 @@
+#!/usr/bin/env python3
+"""
+Compiled Knowledge Base Index
+Offline build step that writes a knowledge base and both retrieval
+indexes into one binary file (string tables, postings arrays, offsets),
+and a loader that maps it read-only so opening is near-instant and the
+pages are shared between processes through the page cache.
+
+Usage:
+    python compiled_index.py knowledge_base.json -o knowledge_base.hgidx
+"""
+
+import argparse
+from bisect import bisect_left
+from collections import deque
+from collections.abc import Mapping, Sequence
+from contextlib import nullcontext
+from datetime import datetime
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import time
+import zlib
+
+import numpy as np
+
+from fuzzy_index import DeletionIndex
+from knowledge_index import KeywordIndex
+from query_spelling import SpellingCorrector
+from vector_index import VectorIndex
+
+MAGIC = b"HGKBIDX1"
+FORMAT_VERSION = 1
+# Sections start on cache-line boundaries
+ALIGNMENT = 64
+
+# NumPy dtype -> memoryview format for fast scalar access
+_VIEW_FORMATS = {"<i8": "q", "<i4": "i", "<f8": "d", "<f4": "f", "|u1": "B"}
+
+
+def is_compiled_index(path):
+    """True when the file starts with the compiled index magic bytes"""
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def _table_bits(count):
+    """log2 of an open-addressing table size with load factor <= 0.5"""
+    bits = 3
+    while (1 << bits) < 2 * count:
+        bits += 1
+    return bits
+
+
+def _string_slot(data, mask):
+    return zlib.crc32(data) & mask
+
+
+# ---------------------------------------------------------------- compiling
+
+def _string_sections(name, strings, hashed=False):
+    """Offsets and UTF-8 blob (plus a lookup table) for a list of strings"""
+    encoded = [text.encode("utf-8") for text in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype="<i8")
+    offsets[1:] = np.cumsum([len(data) for data in encoded])
+    sections = {
+        f"{name}.offsets": offsets,
+        f"{name}.blob": np.frombuffer(b"".join(encoded), dtype="|u1"),
+    }
+    if hashed:
+        mask = (1 << _table_bits(len(encoded))) - 1
+        slots = [-1] * (mask + 1)
+        for position, data in enumerate(encoded):
+            slot = _string_slot(data, mask)
+            while slots[slot] != -1:
+                slot = (slot + 1) & mask
+            slots[slot] = position
+        sections[f"{name}.slots"] = np.array(slots, dtype="<i4")
+    return sections
+
+
+def _automaton_sections(keyword_index):
+    """Flatten the keyword automaton into edge, failure and output arrays"""
+    goto = keyword_index._goto
+    fail = keyword_index._fail
+    n_states = len(goto)
+
+    # Keywords that end exactly at each state (the index stores inherited lists)
+    own = [[] for _ in range(n_states)]
+    for keyword_id, keyword in enumerate(keyword_index.keywords):
+        state = 0
+        for char in keyword:
+            state = goto[state][char]
+        own[state].append(keyword_id)
+
+    # Nearest proper suffix state (excluding the root) that ends a keyword
+    dict_link = np.full(n_states, -1, dtype="<i4")
+    queue = deque(goto[0].values())
+    while queue:
+        state = queue.popleft()
+        queue.extend(goto[state].values())
+        suffix = fail[state]
+        if suffix:
+            dict_link[state] = suffix if own[suffix] else dict_link[suffix]
+
+    # Each state's edges sorted by character, found with a binary search
+    edge_counts = [len(edges) for edges in goto]
+    edge_offsets = np.zeros(n_states + 1, dtype="<i4")
+    edge_offsets[1:] = np.cumsum(edge_counts)
+    edges = [sorted((ord(char), target) for char, target in state_edges.items()) for state_edges in goto]
+
+    out_offsets = np.zeros(n_states + 1, dtype="<i4")
+    out_offsets[1:] = np.cumsum([len(ids) for ids in own])
+    return {
+        "automaton.edge_offsets": edge_offsets,
+        "automaton.edge_chars": np.array([code for state_edges in edges for code, _ in state_edges], dtype="<i4"),
+        "automaton.edge_targets": np.array([target for state_edges in edges for _, target in state_edges],
+                                           dtype="<i4"),
+        "automaton.fail": np.array(fail, dtype="<i4"),
+        "automaton.dict_link": dict_link,
+        "automaton.out_offsets": out_offsets,
+        "automaton.out_ids": np.array([i for ids in own for i in ids], dtype="<i4"),
+    }
+
+
+def _spelling_sections(speller):
+    """Vocabulary with counts, known words, and deletion key -> term ids postings"""
+    index = speller.index
+    terms = list(index.counts)
+    term_ids = {term: term_id for term_id, term in enumerate(terms)}
+    deletes = list(index._deletes.items())
+    sections = {}
+    sections.update(_string_sections("spelling.terms", terms, hashed=True))
+    sections["spelling.term_counts"] = np.array([index.counts[term] for term in terms], dtype="<i4")
+    sections.update(_string_sections("spelling.known", sorted(speller.known), hashed=True))
+    sections.update(_string_sections("spelling.deletes", [key for key, _ in deletes], hashed=True))
+    sections["spelling.delete_offsets"] = np.zeros(len(deletes) + 1, dtype="<i8")
+    sections["spelling.delete_offsets"][1:] = np.cumsum([len(keyed) for _, keyed in deletes])
+    sections["spelling.delete_terms"] = np.array([term_ids[term] for _, keyed in deletes for term in keyed],
+                                                 dtype="<i4")
+    return sections
+
+
+def compile_knowledge(knowledge, path, source=None):
+    """Build both indexes for a knowledge base and write them to path atomically"""
+    started = time.perf_counter()
+    keyword_index = KeywordIndex(knowledge)
+    vector_index = VectorIndex(knowledge)
+    topics = keyword_index.topics
+
+    sections = {}
+    sections.update(_string_sections("topics", topics, hashed=True))
+    sections.update(_string_sections("responses", [knowledge[key]["response"] for key in topics]))
+    sections.update(_string_sections("categories", [knowledge[key]["category"] for key in topics]))
+    sections.update(_string_sections("keywords", keyword_index.keywords, hashed=True))
+    vocabulary = sorted(vector_index.vocabulary, key=vector_index.vocabulary.get)
+    sections.update(_string_sections("vocabulary", vocabulary, hashed=True))
+
+    sections["topics.confidence"] = np.array([knowledge[key]["confidence"] for key in topics], dtype="<f8")
+    topic_keywords = [[keyword_index.keyword_ids[keyword] for keyword in knowledge[key]["keywords"]]
+                      for key in topics]
+    sections["topics.keyword_offsets"] = np.zeros(len(topics) + 1, dtype="<i8")
+    sections["topics.keyword_offsets"][1:] = np.cumsum([len(ids) for ids in topic_keywords])
+    sections["topics.keyword_ids"] = np.array([i for ids in topic_keywords for i in ids], dtype="<i4")
+
+    sections["keywords.posting_offsets"] = np.zeros(len(keyword_index.keywords) + 1, dtype="<i8")
+    sections["keywords.posting_offsets"][1:] = np.cumsum([len(p) for p in keyword_index.postings])
+    sections["keywords.posting_topics"] = np.array(
+        [position for p in keyword_index.postings for position, _ in p], dtype="<i4")
+    sections["keywords.posting_counts"] = np.array(
+        [count for p in keyword_index.postings for _, count in p], dtype="<i4")
+
+    sections.update(_automaton_sections(keyword_index))
+    speller = SpellingCorrector.from_knowledge(knowledge)
+    sections.update(_spelling_sections(speller))
+
+    sections["vector.confidences"] = vector_index.confidences.astype("<f4")
+    sections["vector.idf"] = vector_index.idf.astype("<f4")
+    sections["vector.term_offsets"] = vector_index.term_offsets.astype("<i8")
+    sections["vector.posting_topics"] = vector_index.posting_topics.astype("<i4")
+    sections["vector.posting_weights"] = vector_index.posting_weights.astype("<f4")
+
+    header = {
+        "format_version": FORMAT_VERSION,
+        "topics": len(topics),
+        "spelling": {"max_distance": speller.index.max_distance, "prefix_length": speller.index.prefix_length},
+        "source": source,
+        "compiled_at": datetime.now().isoformat(),
+        "sections": {}
+    }
+    # Lay the sections out after a header whose size is fixed up front
+    layout = [(name, np.ascontiguousarray(array)) for name, array in sections.items()]
+    header_size = 4096
+    while True:
+        offset = header_size
+        for name, array in layout:
+            header["sections"][name] = {"dtype": array.dtype.str, "offset": offset, "count": int(array.size)}
+            offset += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+        header_bytes = json.dumps(header).encode("utf-8")
+        if len(MAGIC) + 8 + len(header_bytes) <= header_size:
+            break
+        header_size *= 2
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".compiled-", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(MAGIC + struct.pack("<Q", len(header_bytes)) + header_bytes)
+            for name, array in layout:
+                f.seek(header["sections"][name]["offset"])
+                f.write(array.tobytes())
+            f.truncate(offset)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(temp_path, 0o644)
+        # Readers that already mapped the old file keep it; new opens see the new one
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+    return {"topics": len(topics), "bytes": offset, "seconds": round(time.perf_counter() - started, 3)}
+
+
+# ------------------------------------------------------------------ loading
+
+class StringTable(Sequence):
+    """Strings decoded on demand from an offsets array and a UTF-8 blob"""
+
+    def __init__(self, index, name):
+        self._offsets = index.view(f"{name}.offsets")
+        self._blob = index.view(f"{name}.blob")
+        self._slots = index.view(f"{name}.slots") if f"{name}.slots" in index.sections else None
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self[i] for i in range(*position.indices(len(self)))]
+        if position < 0:
+            position += len(self)
+        if not 0 <= position < len(self):
+            raise IndexError(position)
+        return bytes(self._blob[self._offsets[position]:self._offsets[position + 1]]).decode("utf-8")
+
+    def get(self, text, default=None):
+        """Position of a string (hashed tables only), like dict.get on string -> id"""
+        data = text.encode("utf-8")
+        slots = self._slots
+        mask = len(slots) - 1
+        slot = _string_slot(data, mask)
+        while True:
+            position = slots[slot]
+            if position == -1:
+                return default
+            if self._blob[self._offsets[position]:self._offsets[position + 1]] == data:
+                return position
+            slot = (slot + 1) & mask
+
+
+class CompiledKnowledge(Mapping):
+    """Read-only {topic_key: topic} view whose topics are built on access"""
+
+    def __init__(self, index):
+        self._topics = index.topics
+        self._responses = StringTable(index, "responses")
+        self._categories = StringTable(index, "categories")
+        self._keywords = index.keywords
+        self._confidences = index.view("topics.confidence")
+        self._keyword_offsets = index.view("topics.keyword_offsets")
+        self._keyword_ids = index.view("topics.keyword_ids")
+
+    def __getitem__(self, topic_key):
+        position = self._topics.get(topic_key)
+        if position is None:
+            raise KeyError(topic_key)
+        keyword_ids = self._keyword_ids[self._keyword_offsets[position]:self._keyword_offsets[position + 1]]
+        return {
+            "keywords": [self._keywords[keyword_id] for keyword_id in keyword_ids],
+            "response": self._responses[position],
+            "confidence": self._confidences[position],
+            "category": self._categories[position]
+        }
+
+    def __iter__(self):
+        return iter(self._topics)
+
+    def __len__(self):
+        return len(self._topics)
+
+
+class _PostingLists(Sequence):
+    """keyword id -> [(topic position, count)], read from the mapped arrays"""
+
+    def __init__(self, index):
+        self._offsets = index.view("keywords.posting_offsets")
+        self._topics = index.view("keywords.posting_topics")
+        self._counts = index.view("keywords.posting_counts")
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, keyword_id):
+        start, end = self._offsets[keyword_id], self._offsets[keyword_id + 1]
+        return list(zip(self._topics[start:end].tolist(), self._counts[start:end].tolist()))
+
+
+class MappedKeywordIndex(KeywordIndex):
+    """KeywordIndex whose automaton and postings live in the mapped file"""
+
+    def __init__(self, index):
+        self.topics = index.topics
+        self.keywords = index.keywords
+        self.keyword_ids = index.keywords
+        self.postings = _PostingLists(index)
+        self._edge_offsets = index.view("automaton.edge_offsets")
+        self._edge_chars = index.view("automaton.edge_chars")
+        self._edge_targets = index.view("automaton.edge_targets")
+        self._fail = index.view("automaton.fail")
+        self._dict_link = index.view("automaton.dict_link")
+        self._out_offsets = index.view("automaton.out_offsets")
+        self._out_ids = index.view("automaton.out_ids")
+        # Every failed lookup falls back to the root, so keep its few edges in a dict
+        root_end = self._edge_offsets[1]
+        self._root = dict(zip(self._edge_chars[:root_end].tolist(), self._edge_targets[:root_end].tolist()))
+
+    def matched_keywords(self, query_lower):
+        """Return the ids of all keywords occurring in the lowercased query"""
+        edge_offsets = self._edge_offsets
+        edge_chars = self._edge_chars
+        edge_targets = self._edge_targets
+        fail = self._fail
+        dict_link = self._dict_link
+        out_offsets = self._out_offsets
+        out_ids = self._out_ids
+        root = self._root
+
+        # Empty keywords match every query
+        found = set(out_ids[out_offsets[0]:out_offsets[1]])
+        state = 0
+        for char in query_lower:
+            code = ord(char)
+            while state:
+                start = edge_offsets[state]
+                end = edge_offsets[state + 1]
+                edge = bisect_left(edge_chars, code, start, end)
+                if edge < end and edge_chars[edge] == code:
+                    state = edge_targets[edge]
+                    break
+                state = fail[state]
+            else:
+                state = root.get(code, 0)
+
+            # Walk the keywords ending here and at every shorter suffix
+            ending = state if out_offsets[state] != out_offsets[state + 1] else dict_link[state]
+            while ending > 0:
+                found.update(out_ids[out_offsets[ending]:out_offsets[ending + 1]])
+                ending = dict_link[ending]
+        return found
+
+
+class _StringSet:
+    """`in` and len() over a hashed string table"""
+
+    def __init__(self, strings):
+        self._strings = strings
+
+    def __contains__(self, text):
+        return self._strings.get(text) is not None
+
+    def __len__(self):
+        return len(self._strings)
+
+
+class _TermCounts(Mapping):
+    """{term: count} over the spelling term table"""
+
+    def __init__(self, index):
+        self.terms = StringTable(index, "spelling.terms")
+        self._counts = index.view("spelling.term_counts")
+
+    def __getitem__(self, term):
+        term_id = self.terms.get(term)
+        if term_id is None:
+            raise KeyError(term)
+        return self._counts[term_id]
+
+    def __iter__(self):
+        return iter(self.terms)
+
+    def __len__(self):
+        return len(self.terms)
+
+
+class _DeletionPostings:
+    """deletion key -> [terms], read from the mapped arrays"""
+
+    def __init__(self, index, terms):
+        self._keys = StringTable(index, "spelling.deletes")
+        self._offsets = index.view("spelling.delete_offsets")
+        self._term_ids = index.view("spelling.delete_terms")
+        self._terms = terms
+
+    def get(self, key, default=None):
+        position = self._keys.get(key)
+        if position is None:
+            return default
+        return [self._terms[term_id]
+                for term_id in self._term_ids[self._offsets[position]:self._offsets[position + 1]]]
+
+    def __len__(self):
+        return len(self._keys)
+
+
+class MappedDeletionIndex(DeletionIndex):
+    """Read-only DeletionIndex whose terms and deletion postings live in the mapped file"""
+
+    def __init__(self, index):
+        settings = index.header["spelling"]
+        self.max_distance = settings["max_distance"]
+        self.prefix_length = settings["prefix_length"]
+        self.counts = _TermCounts(index)
+        self._deletes = _DeletionPostings(index, self.counts.terms)
+        # Nothing is written after compiling, so lookups need no lock
+        self._lock = nullcontext()
+
+    def add(self, term, count=1):
+        raise TypeError("A compiled deletion index is read-only")
+
+    remove = add
+
+
+class CompiledIndex:
+    """A compiled index file mapped read-only into memory"""
+
+    def __init__(self, path):
+        if sys.byteorder != "little":
+            raise ValueError("Compiled indexes can only be opened on little-endian machines")
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a compiled knowledge index")
+        (header_length,) = struct.unpack_from("<Q", self._mmap, len(MAGIC))
+        start = len(MAGIC) + 8
+        self.header = json.loads(self._mmap[start:start + header_length].decode("utf-8"))
+        if self.header.get("format_version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported compiled index version {self.header.get('format_version')}")
+        self.sections = self.header["sections"]
+        self._buffer = memoryview(self._mmap)
+
+        self.topics = StringTable(self, "topics")
+        self.keywords = StringTable(self, "keywords")
+        self.knowledge = CompiledKnowledge(self)
+        self.keyword_index = MappedKeywordIndex(self)
+        self.vector_index = VectorIndex.from_arrays(
+            topics=self.topics,
+            confidences=self.array("vector.confidences"),
+            vocabulary=StringTable(self, "vocabulary"),
+            idf=self.array("vector.idf"),
+            term_offsets=self.array("vector.term_offsets"),
+            posting_topics=self.array("vector.posting_topics"),
+            posting_weights=self.array("vector.posting_weights"),
+        )
+        # Files compiled before spelling correction have no spelling sections
+        self.speller = None
+        if "spelling" in self.header:
+            self.speller = SpellingCorrector.from_index(MappedDeletionIndex(self),
+                                                        _StringSet(StringTable(self, "spelling.known")))
+
+    def array(self, name):
+        """Zero-copy NumPy view of a section"""
+        section = self.sections[name]
+        return np.frombuffer(self._mmap, dtype=section["dtype"], count=section["count"], offset=section["offset"])
+
+    def view(self, name):
+        """Zero-copy memoryview of a section, for fast scalar reads from Python"""
+        section = self.sections[name]
+        itemsize = np.dtype(section["dtype"]).itemsize
+        start = section["offset"]
+        return self._buffer[start:start + section["count"] * itemsize].cast(_VIEW_FORMATS[section["dtype"]])
+
+
+def main():
+    from knowledge_base import load_knowledge_file
+
+    parser = argparse.ArgumentParser(description="Compile a knowledge base file into a memory-mapped index")
+    parser.add_argument("knowledge", help="JSON or JSONL knowledge base file")
+    parser.add_argument("--output", "-o", help="index file to write (default: <knowledge>.hgidx)")
+    args = parser.parse_args()
+
+    output = args.output or os.path.splitext(args.knowledge)[0] + ".hgidx"
+    knowledge = load_knowledge_file(args.knowledge)
+    stats = compile_knowledge(knowledge, output, source=os.path.abspath(args.knowledge))
+    print(f"Compiled {stats['topics']} topics into {output} "
+          f"({stats['bytes'] / 1e6:.1f} MB in {stats['seconds']:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,185 +5,416 @@ Port: 8005
 Ready for Cloud Deployment
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
-from datetime import datetime
-import re
+import hmac
+import logging
 import os
+import re
+import threading
+import time
+
+from admission import AdmissionController, RateLimiter, install_admission_control, open_bucket_store
+from fast_json import dumps, install_fast_json, request_timestamp
+from knowledge_base import KnowledgeBase
+from metrics import REGISTRY, configure_logging, instrument_flask
+from near_duplicate_cache import NearDuplicateCache
+from query_analytics import QueryAnalytics
+from response_cache import ResponseCache, normalize_query
 
 app = Flask(__name__)
 CORS(app, origins="*")
+instrument_flask(app, 'rag')
+install_fast_json(app)
+logger = configure_logging('rag')
 
 # Configuration
 PORT = int(os.environ.get('PORT', 8005))
 HOST = '0.0.0.0'
 
-# Comprehensive Insurance Knowledge Base
-INSURANCE_KNOWLEDGE = {
-    # Basic Coverage
-    "deductible": {
-        "keywords": ["deductible", "annual deductible", "pay first", "yearly deductible"],
-        "response": "Your annual deductible is $1,500 for individuals and $3,000 for families. This is the amount you pay for covered healthcare services before your insurance starts to pay. You've currently met $450 (30%) of your individual deductible.",
-        "confidence": 0.95,
-        "category": "coverage_basics"
-    },
-    "out_of_pocket": {
-        "keywords": ["out of pocket", "maximum", "oop", "out-of-pocket", "max out", "spending limit"],
-        "response": "Your out-of-pocket maximum is $6,500 for individuals and $13,000 for families per year. After reaching this limit, your insurance covers 100% of covered services for the rest of the year.",
-        "confidence": 0.95,
-        "category": "coverage_basics"
-    },
-    
-    # Preventive Care
-    "preventive": {
-        "keywords": ["preventive", "screening", "vaccination", "immunization", "wellness", "100%", "checkup", "physical", "annual exam"],
-        "response": "Preventive services are covered at 100% with in-network providers. This includes annual physicals, vaccinations, mammograms, colonoscopies (age-appropriate), blood pressure screening, cholesterol checks, diabetes screening, and pediatric vision/hearing screening. No deductible required.",
-        "confidence": 0.90,
-        "category": "preventive_care"
-    },
-    
-    # Emergency Services
-    "emergency": {
-        "keywords": ["emergency", "er", "emergency room", "emergency department", "urgent", "ambulance"],
-        "response": "Emergency room visits are covered after your deductible with a $250 copay per visit. The copay is waived if you're admitted to the hospital. Ambulance services are covered at 80% after deductible. For non-life-threatening conditions, consider urgent care ($50 copay).",
-        "confidence": 0.90,
-        "category": "emergency_care"
-    },
-    
-    # Prescription Drugs
-    "prescription": {
-        "keywords": ["prescription", "drug", "medication", "pharmacy", "rx", "medicine", "pills"],
-        "response": "Prescription drug coverage tiers: Generic (Tier 1): $10 copay, Preferred Brand (Tier 2): $35 copay, Non-Preferred Brand (Tier 3): $75 copay, Specialty (Tier 4): 25% coinsurance up to $250. Mail-order pharmacy offers 90-day supplies with reduced copays.",
-        "confidence": 0.90,
-        "category": "prescription"
-    },
-    
-    # Mental Health
-    "mental_health": {
-        "keywords": ["mental health", "therapy", "counseling", "psychiatrist", "psychology", "behavioral", "depression", "anxiety"],
-        "response": "Mental health services are covered with a $30 copay per outpatient session. You have 50 covered sessions per year. Inpatient mental health requires preauthorization and is covered at 80% after deductible. Teletherapy is covered at the same rate as in-person visits.",
-        "confidence": 0.85,
-        "category": "mental_health"
-    },
-    
-    # Dental & Vision
-    "dental": {
-        "keywords": ["dental", "teeth", "dentist", "oral", "tooth"],
-        "response": "Dental is NOT covered under your base medical plan. We offer comprehensive dental insurance for an additional $25/month covering cleanings (100%), basic procedures (80%), and major work (50%). Emergency dental care may have limited coverage under medical for accidents.",
-        "confidence": 0.90,
-        "category": "dental"
-    },
-    "vision": {
-        "keywords": ["vision", "eye", "glasses", "contacts", "optometry", "eyewear", "optical"],
-        "response": "Vision coverage includes annual eye exam covered at 100% with in-network providers, plus $150 allowance for frames or contact lenses per year. LASIK and cosmetic procedures are not covered. Children's vision is fully covered including frames.",
-        "confidence": 0.85,
-        "category": "vision"
-    },
-    
-    # Specialist Care
-    "specialist": {
-        "keywords": ["specialist", "referral", "specialty", "expert", "specialized"],
-        "response": "Specialist visits require a referral from your primary care physician. With referral: $40 copay, then 80% coverage after deductible. Without referral, coverage may be reduced or denied. Second opinions are covered at the same rate.",
-        "confidence": 0.85,
-        "category": "specialist"
-    },
-    
-    # Network
-    "network": {
-        "keywords": ["network", "in-network", "out-of-network", "provider", "ppo", "hmo", "covered doctors"],
-        "response": "In-network providers: Lower costs with 80% coverage after deductible. Out-of-network: Higher deductible ($3,000), higher out-of-pocket max ($12,000), and you pay 40% after deductible. We have 2,547 hospitals and 45,000+ doctors in-network. Always verify network status before receiving care.",
-        "confidence": 0.90,
-        "category": "network"
-    },
-    
-    # Maternity
-    "maternity": {
-        "keywords": ["maternity", "pregnancy", "prenatal", "delivery", "birth", "baby", "newborn", "pregnant"],
-        "response": "Maternity coverage includes prenatal visits (100% covered), delivery and hospital stay (80% after deductible), postnatal care (100% for 6 weeks), and newborn care. Average out-of-pocket for uncomplicated delivery is $3,000-4,000. Breast pumps and lactation support are covered.",
-        "confidence": 0.85,
-        "category": "maternity"
-    },
+# Retrieval backend: "keyword" (phrase matching) or "vector" (TF-IDF similarity)
+RAG_BACKENDS = ('keyword', 'vector')
+RAG_BACKEND = os.environ.get('RAG_BACKEND', 'keyword').lower()
+if RAG_BACKEND not in RAG_BACKENDS:
+    raise ValueError(f"RAG_BACKEND must be one of {RAG_BACKENDS}, got {RAG_BACKEND!r}")
+
+# Knowledge base file (JSON object/list or JSONL), reloadable at runtime
+KNOWLEDGE_BASE_PATH = os.environ.get(
+    'KNOWLEDGE_BASE_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'knowledge_base.json')
+)
+# Compiled index (python compiled_index.py ...) mapped instead of the JSON file when set
+RAG_INDEX_PATH = os.environ.get('RAG_INDEX_PATH')
+KNOWLEDGE_SOURCE = RAG_INDEX_PATH or KNOWLEDGE_BASE_PATH
+# Seconds between file modification checks; 0 disables watching
+KNOWLEDGE_WATCH_INTERVAL = float(os.environ.get('KNOWLEDGE_WATCH_INTERVAL', 0))
+# Token required by admin endpoints; they are disabled while it is unset, since
+# analytics returns members' own questions
+RAG_ADMIN_TOKEN = os.environ.get('RAG_ADMIN_TOKEN')
+
+# Answers for repeated questions, keyed on (knowledge version, backend, normalized query)
+RESPONSE_CACHE = ResponseCache(
+    max_size=int(os.environ.get('RAG_CACHE_SIZE', 1024)),
+    ttl=float(os.environ.get('RAG_CACHE_TTL', 300))
+)
+
+# Retrieval metrics served on /metrics next to the request metrics
+RAG_QUERIES = REGISTRY.counter('rag_queries_total', 'Answered queries by outcome (matched or fallback)',
+                               ('backend', 'outcome'))
+RAG_SCORING = REGISTRY.histogram('rag_scoring_seconds', 'Time scoring uncached queries against the knowledge base',
+                                 ('backend',))
+# Matched answers reused for near-identical questions that missed the exact cache
+NEAR_DUPLICATE_CACHE = NearDuplicateCache(
+    max_size=int(os.environ.get('RAG_NEAR_DUP_SIZE', 4096)),
+    ttl=float(os.environ.get('RAG_CACHE_TTL', 300)),
+    threshold=float(os.environ.get('RAG_NEAR_DUP_THRESHOLD', 0.8))
+)
+
+# Rescore questions that fall back with misspelled words corrected against
+# the keyword vocabulary (opt-in)
+RAG_SPELL_CORRECTION = os.environ.get('RAG_SPELL_CORRECTION', 'false').lower() == 'true'
+RAG_CORRECTED = REGISTRY.counter('rag_spelling_corrections_total', 'Scored queries with misspelled words corrected',
+                                 ('backend',))
+
+# Top unmatched and low-confidence questions and top topics, per process,
+# over RAG_ANALYTICS_SLOTS slots of RAG_ANALYTICS_SLOT_SECONDS
+QUERY_ANALYTICS = QueryAnalytics(
+    capacity=int(os.environ.get('RAG_ANALYTICS_CAPACITY', 1000)),
+    slot_seconds=int(os.environ.get('RAG_ANALYTICS_SLOT_SECONDS', 300)),
+    slots=int(os.environ.get('RAG_ANALYTICS_SLOTS', 12))
+)
+
+REGISTRY.gauge('rag_cache_hit_ratio', 'Response cache hit rate', lambda: RESPONSE_CACHE.stats()["hit_rate"])
+REGISTRY.gauge('rag_near_duplicate_hit_ratio', 'Near-duplicate cache hit rate',
+               lambda: NEAR_DUPLICATE_CACHE.stats()["hit_rate"])
+REGISTRY.gauge('rag_knowledge_topics', 'Topics in the active knowledge base',
+               lambda: len(KNOWLEDGE_BASE.knowledge) if KNOWLEDGE_BASE else 0)
+
+_reload_lock = threading.Lock()
+KNOWLEDGE_BASE = None
+
+def activate_knowledge(knowledge_base):
+    """Swap in a fully built knowledge base and drop cached answers
     
-    # Additional Services
-    "rehabilitation": {
-        "keywords": ["physical therapy", "pt", "rehabilitation", "occupational therapy", "speech therapy", "rehab"],
-        "response": "Physical therapy, occupational therapy, and speech therapy are covered up to 30 visits per year combined, with a $30 copay per visit. Additional visits may be approved with medical necessity documentation.",
-        "confidence": 0.85,
-        "category": "rehabilitation"
-    },
-    "telemedicine": {
-        "keywords": ["telemedicine", "virtual", "telehealth", "online doctor", "video visit", "remote"],
-        "response": "Telemedicine visits are covered with $15 copay for general medicine, $30 for specialists. Available 24/7 through our approved platforms. Mental health teletherapy has the same coverage as in-person visits.",
-        "confidence": 0.90,
-        "category": "telemedicine"
-    },
-    "alternative": {
-        "keywords": ["alternative", "acupuncture", "chiropractic", "massage", "holistic", "complementary"],
-        "response": "Alternative therapies: Chiropractic care covered up to 20 visits/year with $30 copay. Acupuncture covered up to 12 visits/year with $40 copay when medically necessary. Massage therapy not covered unless prescribed for specific conditions with preauthorization.",
-        "confidence": 0.85,
-        "category": "alternative"
+    Requests read KNOWLEDGE_BASE once and keep using that object, so a
+    swap is a single reference assignment and never exposes a half-built index.
+    """
+    global KNOWLEDGE_BASE, INSURANCE_KNOWLEDGE
+    KNOWLEDGE_BASE = knowledge_base
+    INSURANCE_KNOWLEDGE = knowledge_base.knowledge
+    RESPONSE_CACHE.clear()
+    NEAR_DUPLICATE_CACHE.clear()
+
+def load_knowledge(path=None):
+    """Build (or map) a new knowledge base off to the side, then activate it"""
+    with _reload_lock:
+        version = KNOWLEDGE_BASE.version + 1 if KNOWLEDGE_BASE else 1
+        knowledge_base = KnowledgeBase.open(path or KNOWLEDGE_SOURCE, version=version)
+        if RAG_SPELL_CORRECTION:
+            # Build it here, in the preloaded master at startup, not on some worker's first query
+            knowledge_base.speller
+        activate_knowledge(knowledge_base)
+        return knowledge_base
+
+def watch_knowledge_file(interval):
+    """Reload the knowledge base whenever its file changes"""
+    failed_mtime = None
+    while True:
+        time.sleep(interval)
+        mtime = None
+        try:
+            mtime = os.path.getmtime(KNOWLEDGE_SOURCE)
+            if mtime in (KNOWLEDGE_BASE.mtime, failed_mtime):
+                continue
+            knowledge_base = load_knowledge()
+            logger.info(f"🔄 Knowledge base reloaded: {len(knowledge_base.knowledge)} topics "
+                        f"in {knowledge_base.load_seconds * 1000:.1f} ms (v{knowledge_base.version})")
+        except Exception as e:
+            # Don't retry the same broken file until it changes again
+            failed_mtime = mtime
+            logger.error(f"❌ Knowledge base reload failed, keeping v{KNOWLEDGE_BASE.version}: {e}")
+
+# Knowledge base and retrieval indexes built once at startup
+load_knowledge()
+
+_watcher_pid = None
+
+def start_knowledge_watcher():
+    """Start the file watcher thread for this process, if watching is enabled"""
+    global _watcher_pid
+    if KNOWLEDGE_WATCH_INTERVAL <= 0 or _watcher_pid == os.getpid():
+        return
+    _watcher_pid = os.getpid()
+    threading.Thread(target=watch_knowledge_file, args=(KNOWLEDGE_WATCH_INTERVAL,),
+                     name='knowledge-watcher', daemon=True).start()
+
+start_knowledge_watcher()
+# Threads don't survive fork, so workers forked from a preloaded app start their own
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=start_knowledge_watcher)
+
+# Per-client token bucket for the query endpoints: requests per second and
+# burst size (a batch costs one token per query); 0 disables rate limiting
+RAG_RATE_LIMIT = float(os.environ.get('RAG_RATE_LIMIT', 0))
+RAG_RATE_BURST = float(os.environ.get('RAG_RATE_BURST', max(1.0, 2 * RAG_RATE_LIMIT)))
+# Proxies in front of the server; the client IP is read from X-Forwarded-For past them
+RAG_PROXY_HOPS = int(os.environ.get('RAG_PROXY_HOPS', 0))
+# Load shedding: queries running at once per process, the p99 latency (ms) above
+# which that limit drops to a quarter, and the longest a request may have queued
+# (X-Request-Start, ms) before it is dropped; 0 disables each check. A gunicorn
+# worker never runs more than its threads at once, so that is the default limit
+RAG_MAX_IN_FLIGHT = int(os.environ.get('RAG_MAX_IN_FLIGHT', os.environ.get('GUNICORN_THREADS', 64)))
+RAG_P99_LIMIT_MS = float(os.environ.get('RAG_P99_LIMIT_MS', 1000))
+RAG_MAX_QUEUE_MS = float(os.environ.get('RAG_MAX_QUEUE_MS', 500))
+
+RATE_LIMITER = RateLimiter(RAG_RATE_LIMIT, RAG_RATE_BURST, open_bucket_store() if RAG_RATE_LIMIT > 0 else None)
+ADMISSION = AdmissionController(
+    max_in_flight=RAG_MAX_IN_FLIGHT,
+    p99_limit=RAG_P99_LIMIT_MS / 1000,
+    max_queue_wait=RAG_MAX_QUEUE_MS / 1000
+)
+
+def query_cost(request):
+    """Tokens a query request spends: one per query in a batch"""
+    if request.endpoint == 'rag_query_batch':
+        data = request.get_json(silent=True)
+        if isinstance(data, dict) and isinstance(data.get('queries'), list) and data['queries']:
+            return len(data['queries'])
+    return 1
+
+install_admission_control(app, 'rag', ('rag_query', 'rag_query_stream', 'rag_query_batch'),
+                          RATE_LIMITER, ADMISSION, proxy_hops=RAG_PROXY_HOPS, cost=query_cost)
+
+# Fallback returned when no topic matches well enough
+CUSTOMER_SERVICE_FALLBACK = {
+    "response": "I couldn't find specific information about your question in our insurance policy database. For accurate information about your specific situation, please contact our customer service team at 1234567890 who can provide personalized assistance with your specific query.",
+    "confidence": 0.3,
+    "sources": ["Customer Service Recommended"],
+    "matched": False,
+    "customer_service": {
+        "phone": "1234567890",
+        "hours": "24/7 Support Available",
+        "wait_time": "Average wait: 2 minutes"
     }
 }
 
-def find_best_match(query):
-    """Find the best matching response for a query"""
-    query_lower = query.lower()
+# Largest number of queries accepted by the batch endpoint
+RAG_BATCH_MAX = int(os.environ.get('RAG_BATCH_MAX', 500))
+
+# Topics combined into one answer, and the lowest score (relative to the
+# best topic, 0-1) a topic needs to be included; both overridable per request.
+# The keyword backend only adds topics after the best on whole-word keyword
+# matches scoring at least KEYWORD_RUNNER_UP_MIN_SCORE (knowledge_base.py)
+RAG_TOP_K = int(os.environ.get('RAG_TOP_K', 3))
+RAG_MAX_TOP_K = int(os.environ.get('RAG_MAX_TOP_K', 10))
+RAG_MIN_TOPIC_SCORE = float(os.environ.get('RAG_MIN_TOPIC_SCORE', 0.5))
+
+def topic_source(data):
+    return f"Insurance Policy Handbook - {data['category'].replace('_', ' ').title()}"
+
+def build_match_result(knowledge_base, matches):
+    """Turn ranked (topic_key, confidence, score) matches into a query result"""
+    if matches:
+        topics = []
+        for topic_key, confidence, score in matches:
+            data = knowledge_base.knowledge[topic_key]
+            topics.append({
+                "topic": topic_key,
+                "confidence": confidence,
+                "score": score,
+                "source": topic_source(data),
+                "response": data["response"]
+            })
+        return {
+            # Passages in rank order; the best topic sets the overall confidence
+            "response": "\n\n".join(topic.pop("response") for topic in topics),
+            "confidence": matches[0][1],
+            "sources": list(dict.fromkeys(topic["source"] for topic in topics)),
+            "topics": topics,
+            "matched": True
+        }
+    # No good match found - provide customer service fallback
+    return {**CUSTOMER_SERVICE_FALLBACK, "customer_service": dict(CUSTOMER_SERVICE_FALLBACK["customer_service"])}
+
+def find_best_match(query, backend=None, knowledge_base=None, top_k=1, min_score=0.0):
+    """Find the best matching topics (one by default) for a query"""
+    knowledge_base = knowledge_base or KNOWLEDGE_BASE
+    backend = backend or RAG_BACKEND
+    with RAG_SCORING.time(backend=backend):
+        matches = knowledge_base.top_matches(query, backend, top_k, min_score)
+    return build_match_result(knowledge_base, matches)
+
+def find_best_matches(queries, backend=None, knowledge_base=None, top_k=1, min_score=0.0):
+    """Find the best matching topics for each query, scored together"""
+    knowledge_base = knowledge_base or KNOWLEDGE_BASE
+    backend = backend or RAG_BACKEND
+    with RAG_SCORING.time(backend=backend):
+        matches = knowledge_base.top_matches_many(queries, backend, top_k, min_score)
+    return [build_match_result(knowledge_base, ranked) for ranked in matches]
+
+def answer_queries(queries, backend=None, top_k=None, min_score=None):
+    """Answer queries through the exact and near-duplicate caches, scoring only the misses"""
+    backend = backend or RAG_BACKEND
+    top_k = RAG_TOP_K if top_k is None else top_k
+    min_score = RAG_MIN_TOPIC_SCORE if min_score is None else min_score
+    knowledge_base = KNOWLEDGE_BASE
+    keys = [(knowledge_base.version, backend, top_k, min_score, normalize_query(query)) for query in queries]
+    results = [RESPONSE_CACHE.get(key) for key in keys]
     
-    # Remove common filler words
-    query_cleaned = re.sub(r'\b(what|how|is|are|my|the|a|an|about|tell|me|coverage|for|much)\b', '', query_lower)
+    # Then reuse answers to near-identical questions already answered
+    missing = list(dict.fromkeys(key for key, result in zip(keys, results) if result is None))
+    speller = knowledge_base.speller if RAG_SPELL_CORRECTION and missing else None
+    answered = {}
+    corrected = 0
+    # Only reused between questions scored on the same keywords or terms
+    terms = {key: knowledge_base.query_terms(key[-1], backend) for key in missing}
+    for key in missing:
+        result = NEAR_DUPLICATE_CACHE.get(key[:-1], key[-1], terms[key])
+        if result is not None:
+            # The stored correction was made for a different question; only a
+            # question that needed correcting to match gets one of its own
+            needed_correction = "corrected_query" in result
+            result = {field: value for field, value in result.items() if field != "corrected_query"}
+            text = speller.correct(key[-1]) if speller and needed_correction else key[-1]
+            if text != key[-1]:
+                result["corrected_query"] = text
+                corrected += 1
+            answered[key] = result
+            RESPONSE_CACHE.put(key, result)
     
-    best_match = None
-    best_score = 0
-    best_confidence = 0
+    # Score each remaining question once, on its normalized form
+    missing = [key for key in missing if key not in answered]
+    if missing:
+        started = time.perf_counter()
+        texts = [key[-1] for key in missing]
+        matches = find_best_matches(texts, backend, knowledge_base, top_k, min_score)
+        if speller:
+            # Only questions that fall back are corrected, and the correction
+            # is kept only if it then matches: a word outside the knowledge
+            # base is more often a real word than a typo of a keyword
+            retry = [(position, speller.correct(texts[position]))
+                     for position, result in enumerate(matches) if not result["matched"]]
+            retry = [(position, text) for position, text in retry if text != texts[position]]
+            if retry:
+                rescored = find_best_matches([text for _, text in retry], backend, knowledge_base, top_k, min_score)
+                for (position, text), result in zip(retry, rescored):
+                    if result["matched"]:
+                        texts[position] = text
+                        matches[position] = result
+        cost = (time.perf_counter() - started) / len(missing)
+        for key, text, result in zip(missing, texts, matches):
+            if text != key[-1]:
+                result["corrected_query"] = text
+                corrected += 1
+            answered[key] = result
+            RESPONSE_CACHE.put(key, result)
+            # Only matched answers: a variant of an unmatched question may still match
+            if result["matched"]:
+                NEAR_DUPLICATE_CACHE.put(key[:-1], key[-1], result, cost, terms[key])
+    if corrected:
+        RAG_CORRECTED.inc(corrected, backend=backend)
+    results = [answered[key] if result is None else result for key, result in zip(keys, results)]
+    QUERY_ANALYTICS.record([key[-1] for key in keys], results)
     
-    # Search through knowledge base
-    for topic_key, topic_data in INSURANCE_KNOWLEDGE.items():
-        score = 0
-        
-        # Check keyword matches
-        for keyword in topic_data["keywords"]:
-            if keyword in query_lower:
-                # Exact phrase match
-                if keyword == query_lower.strip():
-                    score += 10
-                # Phrase contained
-                elif keyword in query_lower:
-                    score += 5
-                # Word overlap
-                else:
-                    keyword_words = keyword.split()
-                    for word in keyword_words:
-                        if word in query_cleaned:
-                            score += 2
-        
-        # Update best match
-        if score > best_score:
-            best_score = score
-            best_match = topic_key
-            best_confidence = topic_data["confidence"]
+    matched = sum(1 for result in results if result["matched"])
+    RAG_QUERIES.inc(matched, backend=backend, outcome="matched")
+    RAG_QUERIES.inc(len(results) - matched, backend=backend, outcome="fallback")
+    return results
+
+def answer_query(query, backend=None, top_k=None, min_score=None):
+    """Answer a single query through the response cache"""
+    return answer_queries([query], backend, top_k, min_score)[0]
+
+def answer_options(data):
+    """(top_k, min_score) from a request, or raise ValueError"""
+    top_k = data.get('top_k', RAG_TOP_K)
+    min_score = data.get('min_score', RAG_MIN_TOPIC_SCORE)
+    try:
+        top_k = int(top_k)
+        min_score = float(min_score)
+    except (TypeError, ValueError):
+        raise ValueError("'top_k' must be an integer and 'min_score' a number")
+    if not 1 <= top_k <= RAG_MAX_TOP_K:
+        raise ValueError(f"'top_k' must be between 1 and {RAG_MAX_TOP_K}")
+    if not 0 <= min_score <= 1:
+        raise ValueError("'min_score' must be between 0 and 1")
+    return top_k, min_score
+
+def build_query_response(query, result, backend, timestamp):
+    """Build the API response for one answered query"""
+    response_data = {
+        "query": query,
+        "response": result["response"],
+        "confidence": result["confidence"],
+        "sources": result["sources"],
+        "topics": result.get("topics", []),
+        "backend": backend,
+        "timestamp": timestamp
+    }
+    if "corrected_query" in result:
+        response_data["corrected_query"] = result["corrected_query"]
     
-    # Return result based on confidence
-    if best_match and best_score >= 5:  # Threshold for match
-        data = INSURANCE_KNOWLEDGE[best_match]
-        return {
-            "response": data["response"],
-            "confidence": best_confidence,
-            "sources": [f"Insurance Policy Handbook - {data['category'].replace('_', ' ').title()}"],
-            "matched": True
-        }
-    else:
-        # No good match found - provide customer service fallback
-        return {
-            "response": "I couldn't find specific information about your question in our insurance policy database. For accurate information about your specific situation, please contact our customer service team at 1234567890 who can provide personalized assistance with your specific query.",
-            "confidence": 0.3,
-            "sources": ["Customer Service Recommended"],
-            "matched": False,
+    # Add customer service info if low confidence or no match
+    if not result.get("matched", True) or result["confidence"] < 0.4:
+        response_data["customer_service"] = result.get("customer_service", {
+            "phone": "1234567890",
+            "hours": "24/7 Support Available",
+            "wait_time": "Average wait: 2 minutes",
+            "message": "For more detailed assistance, please contact our customer service team at 1234567890"
+        })
+    return response_data
+
+def query_request_error(query, backend):
+    """400 response for an unknown backend or empty query, else None"""
+    if backend not in RAG_BACKENDS:
+        return jsonify({
+            "error": f"Unknown backend '{backend}'. Available: {', '.join(RAG_BACKENDS)}",
             "customer_service": {
                 "phone": "1234567890",
-                "hours": "24/7 Support Available",
-                "wait_time": "Average wait: 2 minutes"
+                "message": "Please retry without a backend or call customer service at 1234567890"
             }
-        }
+        }), 400
+    
+    if not query:
+        return jsonify({
+            "error": "No query provided",
+            "customer_service": {
+                "phone": "1234567890",
+                "message": "Please provide a question or call customer service at 1234567890"
+            }
+        }), 400
+    return None
+
+# Target size of each streamed answer chunk, split at word boundaries
+RAG_STREAM_CHUNK_CHARS = int(os.environ.get('RAG_STREAM_CHUNK_CHARS', 80))
+_WORD = re.compile(r'\s*\S+\s*')
+
+def answer_chunks(text, size=RAG_STREAM_CHUNK_CHARS):
+    """Split text into chunks of about size characters that join back to text"""
+    chunks = []
+    current = ''
+    for word in _WORD.findall(text):
+        current += word
+        if len(current) >= size:
+            chunks.append(current)
+            current = ''
+    if current or not chunks:
+        chunks.append(current)
+    return chunks
+
+def sse_event(event, data):
+    """One Server-Sent Events message with a JSON payload"""
+    return f"event: {event}\ndata: {dumps(data).decode()}\n\n"
+
+def stream_query_events(query, result, backend, timestamp):
+    """Sources and confidence first, then the answer text, then a done marker"""
+    response_data = build_query_response(query, result, backend, timestamp)
+    answer = response_data.pop("response")
+    yield sse_event("meta", response_data)
+    chunks = answer_chunks(answer)
+    for index, chunk in enumerate(chunks):
+        yield sse_event("chunk", {"index": index, "text": chunk})
+    yield sse_event("done", {"chunks": len(chunks), "characters": len(answer)})
 
 @app.route('/health', methods=['GET', 'OPTIONS'])
 def health_check():
@@ -193,8 +424,17 @@ def health_check():
         "service": "enhanced_rag_server",
         "version": "3.0.0",
         "port": PORT,
-        "knowledge_topics": len(INSURANCE_KNOWLEDGE),
-        "timestamp": datetime.now().isoformat(),
+        "knowledge_topics": len(KNOWLEDGE_BASE.knowledge),
+        "near_duplicate_cache": NEAR_DUPLICATE_CACHE.stats(),
+        "knowledge": KNOWLEDGE_BASE.stats(),
+        "backend": RAG_BACKEND,
+        "available_backends": list(RAG_BACKENDS),
+        "spell_correction": RAG_SPELL_CORRECTION,
+        "cache": RESPONSE_CACHE.stats(),
+        "rate_limit": RATE_LIMITER.stats(),
+        "admission": ADMISSION.stats(),
+        "analytics": QUERY_ANALYTICS.stats(),
+        "timestamp": request_timestamp(),
         "deployment_ready": True
     })
 
@@ -209,46 +449,148 @@ def rag_query():
     try:
         data = request.json
         query = data.get('query', '').strip()
+        backend = data.get('backend') or RAG_BACKEND
         
-        if not query:
-            return jsonify({
-                "error": "No query provided",
-                "customer_service": {
-                    "phone": "1234567890",
-                    "message": "Please provide a question or call customer service at 1234567890"
-                }
-            }), 400
+        error = query_request_error(query, backend)
+        if error:
+            return error
+        try:
+            top_k, min_score = answer_options(data)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         
-        print(f"📨 Query received: {query}")
+        logger.debug("📨 Query received: %s", query)
         
         # Process query
-        result = find_best_match(query)
+        result = answer_query(query, backend, top_k, min_score)
         
         # Build response
-        response_data = {
-            "query": query,
-            "response": result["response"],
-            "confidence": result["confidence"],
-            "sources": result["sources"],
-            "timestamp": datetime.now().isoformat()
-        }
+        response_data = build_query_response(query, result, backend, request_timestamp())
         
-        # Add customer service info if low confidence or no match
-        if not result.get("matched", True) or result["confidence"] < 0.4:
-            response_data["customer_service"] = result.get("customer_service", {
-                "phone": "1234567890",
-                "hours": "24/7 Support Available",
-                "wait_time": "Average wait: 2 minutes",
-                "message": "For more detailed assistance, please contact our customer service team at 1234567890"
-            })
-            print(f"🔴 Low confidence ({result['confidence']:.0%}) - Customer service recommended")
-        else:
-            print(f"🟢 High confidence ({result['confidence']:.0%})")
+        if logger.isEnabledFor(logging.DEBUG):
+            if "customer_service" in response_data:
+                logger.debug(f"🔴 Low confidence ({result['confidence']:.0%}) - Customer service recommended")
+            else:
+                logger.debug(f"🟢 High confidence ({result['confidence']:.0%})")
         
         return jsonify(response_data)
         
     except Exception as e:
-        print(f"❌ Error: {e}")
+        logger.exception(f"❌ Error: {e}")
+        return jsonify({
+            "error": str(e),
+            "customer_service": {
+                "phone": "1234567890",
+                "message": "An error occurred. Please contact customer service at 1234567890 for assistance"
+            }
+        }), 500
+
+@app.route('/api/v1/rag/query/stream', methods=['GET', 'POST', 'OPTIONS'])
+def rag_query_stream():
+    """RAG query answered as Server-Sent Events (meta, chunk..., done)
+    
+    GET takes ?query=&backend=&top_k=&min_score= so browsers can use
+    EventSource; POST takes the same JSON body as /api/v1/rag/query.
+    """
+    
+    # Handle preflight
+    if request.method == 'OPTIONS':
+        return jsonify({'status': 'ok'}), 200
+    
+    data = request.args if request.method == 'GET' else (request.get_json(silent=True) or {})
+    query = (data.get('query') or '').strip()
+    backend = data.get('backend') or RAG_BACKEND
+    error = query_request_error(query, backend)
+    if error:
+        return error
+    try:
+        top_k, min_score = answer_options(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    logger.debug("📨 Streaming query received: %s", query)
+    try:
+        result = answer_query(query, backend, top_k, min_score)
+    except Exception as e:
+        logger.exception(f"❌ Error: {e}")
+        return jsonify({
+            "error": str(e),
+            "customer_service": {
+                "phone": "1234567890",
+                "message": "An error occurred. Please contact customer service at 1234567890 for assistance"
+            }
+        }), 500
+    
+    events = stream_query_events(query, result, backend, request_timestamp())
+    return Response(stream_with_context(events), mimetype='text/event-stream', headers={
+        "Cache-Control": "no-cache",
+        # Stop nginx-style proxies from buffering the stream
+        "X-Accel-Buffering": "no"
+    })
+
+@app.route('/api/v1/rag/query/batch', methods=['POST', 'OPTIONS'])
+def rag_query_batch():
+    """Answer a list of queries in one request, results in input order"""
+    
+    # Handle preflight
+    if request.method == 'OPTIONS':
+        return jsonify({'status': 'ok'}), 200
+    
+    try:
+        data = request.get_json(silent=True) or {}
+        queries = data.get('queries')
+        backend = data.get('backend') or RAG_BACKEND
+        
+        if backend not in RAG_BACKENDS:
+            return jsonify({
+                "error": f"Unknown backend '{backend}'. Available: {', '.join(RAG_BACKENDS)}"
+            }), 400
+        try:
+            top_k, min_score = answer_options(data)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        if not isinstance(queries, list) or not queries:
+            return jsonify({"error": "'queries' must be a non-empty list"}), 400
+        
+        if len(queries) > RAG_BATCH_MAX:
+            return jsonify({"error": f"Batch too large: {len(queries)} queries (max {RAG_BATCH_MAX})"}), 413
+        
+        # Validate items; invalid ones get a per-item error instead of failing the batch
+        results = [None] * len(queries)
+        valid_positions = []
+        valid_queries = []
+        for position, item in enumerate(queries):
+            query = item.get('query') if isinstance(item, dict) else item
+            if query is not None and not isinstance(query, str):
+                results[position] = {"index": position, "error": "Query must be a string"}
+                continue
+            if not query or not query.strip():
+                results[position] = {"index": position, "error": "No query provided"}
+                continue
+            valid_positions.append(position)
+            valid_queries.append(query.strip())
+        
+        timestamp = request_timestamp()
+        matches = answer_queries(valid_queries, backend, top_k, min_score) if valid_queries else []
+        for position, query, result in zip(valid_positions, valid_queries, matches):
+            results[position] = {"index": position, **build_query_response(query, result, backend, timestamp)}
+        
+        if logger.isEnabledFor(logging.DEBUG):
+            fallbacks = sum(1 for result in results if "customer_service" in result)
+            logger.debug(f"📦 Batch of {len(queries)} queries: {len(valid_queries) - fallbacks} matched, "
+                         f"{fallbacks} low confidence, {len(queries) - len(valid_queries)} invalid")
+        
+        return jsonify({
+            "count": len(results),
+            "errors": len(queries) - len(valid_queries),
+            "backend": backend,
+            "results": results,
+            "timestamp": timestamp
+        })
+        
+    except Exception as e:
+        logger.exception(f"❌ Batch error: {e}")
         return jsonify({
             "error": str(e),
             "customer_service": {
@@ -261,7 +603,7 @@ def rag_query():
 def get_topics():
     """Get all available topics"""
     topics = {}
-    for key, data in INSURANCE_KNOWLEDGE.items():
+    for key, data in KNOWLEDGE_BASE.knowledge.items():
         topics[key] = {
             "keywords": data["keywords"],
             "confidence": data["confidence"],
@@ -269,6 +611,65 @@ def get_topics():
         }
     return jsonify(topics)
 
+def admin_token_error():
+    """403 response unless RAG_ADMIN_TOKEN is set and the request carries it, else None"""
+    if not RAG_ADMIN_TOKEN:
+        return jsonify({"error": "Admin endpoints are disabled: set RAG_ADMIN_TOKEN"}), 403
+    if not hmac.compare_digest(request.headers.get('X-Admin-Token', '').encode(), RAG_ADMIN_TOKEN.encode()):
+        return jsonify({"error": "Admin token required"}), 403
+    return None
+
+@app.route('/api/v1/rag/admin/reload', methods=['POST'])
+def reload_knowledge():
+    """Reload the knowledge base file and atomically swap the indexes"""
+    error = admin_token_error()
+    if error:
+        return error
+    
+    previous_version = KNOWLEDGE_BASE.version
+    try:
+        knowledge_base = load_knowledge()
+    except (OSError, ValueError) as e:
+        logger.error(f"❌ Knowledge base reload failed, keeping v{previous_version}: {e}")
+        return jsonify({
+            "status": "error",
+            "error": f"Reload failed: {e}",
+            "knowledge": KNOWLEDGE_BASE.stats()
+        }), 422
+    
+    logger.info(f"🔄 Knowledge base reloaded: {len(knowledge_base.knowledge)} topics "
+                f"in {knowledge_base.load_seconds * 1000:.1f} ms (v{knowledge_base.version})")
+    return jsonify({
+        "status": "success",
+        "previous_version": previous_version,
+        "knowledge": knowledge_base.stats()
+    })
+
+@app.route('/api/v1/rag/admin/analytics', methods=['GET'])
+def query_analytics():
+    """Most frequent unmatched and low-confidence questions and most used topics
+    
+    ?window= seconds to look back (default: everything tracked) and
+    ?limit= entries per list (default 20). Counts are for this process.
+    """
+    error = admin_token_error()
+    if error:
+        return error
+    try:
+        window = int(request.args['window']) if 'window' in request.args else None
+        limit = int(request.args.get('limit', 20))
+    except ValueError:
+        return jsonify({"error": "'window' and 'limit' must be integers"}), 400
+    if (window is not None and window < 1) or not 1 <= limit <= 1000:
+        return jsonify({"error": "'window' must be positive and 'limit' between 1 and 1000"}), 400
+    return jsonify({
+        "status": "success",
+        "pid": os.getpid(),
+        "knowledge_version": KNOWLEDGE_BASE.version,
+        **QUERY_ANALYTICS.report(window, limit),
+        "timestamp": request_timestamp()
+    })
+
 @app.route('/')
 def index():
     """Root endpoint"""
@@ -279,7 +680,12 @@ def index():
         "endpoints": {
             "health": "/health",
             "query": "/api/v1/rag/query",
-            "topics": "/api/v1/rag/topics"
+            "query_stream": "/api/v1/rag/query/stream",
+            "batch_query": "/api/v1/rag/query/batch",
+            "topics": "/api/v1/rag/topics",
+            "reload": "/api/v1/rag/admin/reload",
+            "analytics": "/api/v1/rag/admin/analytics",
+            "metrics": "/metrics"
         },
         "deployment": {
             "ready": True,
@@ -294,14 +700,23 @@ if __name__ == '__main__':
     print("="*60)
     print(f"📍 Port: {PORT}")
     print(f"🌐 CORS: Enabled for all origins")
-    print(f"📚 Knowledge Base: {len(INSURANCE_KNOWLEDGE)} topics")
+    print(f"📚 Knowledge Base: {len(KNOWLEDGE_BASE.knowledge)} topics ({KNOWLEDGE_SOURCE}, {KNOWLEDGE_BASE.format})")
+    print(f"🔎 Retrieval Backend: {RAG_BACKEND} (spelling correction {'on' if RAG_SPELL_CORRECTION else 'off'})")
+    print(f"🚦 Rate Limit: {f'{RAG_RATE_LIMIT:g}/s per client (burst {RAG_RATE_BURST:g})' if RATE_LIMITER.enabled else 'off'}, "
+          f"max {RAG_MAX_IN_FLIGHT} in flight, p99 limit {RAG_P99_LIMIT_MS:g} ms")
+    print(f"🔐 Admin Endpoints: {'X-Admin-Token required' if RAG_ADMIN_TOKEN else 'disabled (set RAG_ADMIN_TOKEN)'}")
     print(f"☁️  Cloud Deployment: Ready")
     print("="*60)
     print("Endpoints:")
     print(f"  GET  / - Service info")
     print(f"  GET  /health - Health check")
     print(f"  POST /api/v1/rag/query - Process queries")
+    print(f"  GET|POST /api/v1/rag/query/stream - Stream an answer (Server-Sent Events)")
+    print(f"  POST /api/v1/rag/query/batch - Process a list of queries")
     print(f"  GET  /api/v1/rag/topics - List topics")
+    print(f"  POST /api/v1/rag/admin/reload - Reload knowledge base")
+    print(f"  GET  /api/v1/rag/admin/analytics - Top unmatched questions and topics")
+    print(f"  GET  /metrics - Prometheus metrics")
     print("="*60)
     
     # Use debug=False for production
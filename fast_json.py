@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Fast JSON Responses
+Compact JSON through orjson when it is installed (the standard library
+otherwise), gzip/br compression of large bodies negotiated from
+Accept-Encoding, and one timestamp per request.
+"""
+
+from datetime import datetime
+from decimal import Decimal
+import json
+import os
+import zlib
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+JSON_ENCODER = 'orjson' if orjson else 'json'
+# Bodies smaller than this go out uncompressed; compression would cost more than it saves
+COMPRESS_MIN_BYTES = int(os.environ.get('COMPRESS_MIN_BYTES', 1024))
+# Fast levels: responses are compressed on every request, not once
+GZIP_LEVEL = int(os.environ.get('GZIP_LEVEL', 5))
+BROTLI_QUALITY = int(os.environ.get('BROTLI_QUALITY', 4))
+COMPRESSIBLE_TYPES = ('application/json', 'application/x-ndjson', 'text/')
+
+
+def _default(value):
+    """Types the encoders don't handle natively (matches Flask's provider)"""
+    if isinstance(value, Decimal):
+        return str(value)
+    if hasattr(value, 'item'):
+        # NumPy scalars
+        return value.item()
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+if orjson:
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+    def dumps(data):
+        """Compact UTF-8 JSON bytes"""
+        return orjson.dumps(data, default=_default, option=_ORJSON_OPTIONS)
+
+    loads = orjson.loads
+else:
+    _encoder = json.JSONEncoder(separators=(',', ':'), ensure_ascii=False, default=_default)
+
+    def dumps(data):
+        """Compact UTF-8 JSON bytes"""
+        return _encoder.encode(data).encode('utf-8')
+
+    loads = json.loads
+
+
+def accepted_encoding(accept_encoding):
+    """Best supported content coding in an Accept-Encoding header: 'br', 'gzip' or None"""
+    accepted = {}
+    for part in (accept_encoding or '').split(','):
+        coding, _, params = part.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding.strip().lower()] = quality
+    wildcard = accepted.get('*', 0.0)
+    for coding in ('br', 'gzip') if brotli else ('gzip',):
+        if accepted.get(coding, wildcard) > 0:
+            return coding
+    return None
+
+
+def compressible(content_type):
+    return (content_type or '').startswith(COMPRESSIBLE_TYPES)
+
+
+def compress(body, accept_encoding):
+    """(body, content coding or None) for a complete response body"""
+    encoding = accepted_encoding(accept_encoding) if len(body) >= COMPRESS_MIN_BYTES else None
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY), encoding
+    if encoding == 'gzip':
+        return zlib.compress(body, GZIP_LEVEL, wbits=31), encoding
+    return body, None
+
+
+def compress_chunks(chunks, encoding):
+    """Compress a stream chunk by chunk, flushing so each chunk is decodable on arrival"""
+    chunks = (chunk.encode('utf-8') if isinstance(chunk, str) else chunk for chunk in chunks)
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        for chunk in chunks:
+            data = compressor.process(chunk) + compressor.flush()
+            if data:
+                yield data
+        yield compressor.finish()
+    else:
+        compressor = zlib.compressobj(GZIP_LEVEL, wbits=31)
+        for chunk in chunks:
+            data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+            if data:
+                yield data
+        yield compressor.flush()
+
+
+def timestamp():
+    return datetime.now().isoformat()
+
+
+def request_timestamp():
+    """One timestamp for the whole Flask request, however many records use it"""
+    from flask import g
+
+    if 'request_timestamp' not in g:
+        g.request_timestamp = timestamp()
+    return g.request_timestamp
+
+
+def install_fast_json(app):
+    """Use the fast encoder for a Flask app's JSON and compress large responses"""
+    from flask import request
+    from flask.json.provider import JSONProvider
+
+    class FastJSONProvider(JSONProvider):
+        """Flask JSON provider backed by dumps/loads above; always compact"""
+
+        def dumps(self, obj, **kwargs):
+            return dumps(obj).decode('utf-8')
+
+        def loads(self, s, **kwargs):
+            return loads(s)
+
+        def response(self, *args, **kwargs):
+            obj = self._prepare_response_obj(args, kwargs)
+            return self._app.response_class(dumps(obj), mimetype='application/json')
+
+    app.json = FastJSONProvider(app)
+
+    @app.after_request
+    def compress_response(response):
+        if (response.status_code < 200 or response.status_code in (204, 304)
+                or 'Content-Encoding' in response.headers or not compressible(response.content_type)):
+            return response
+        response.vary.add('Accept-Encoding')
+        encoding = accepted_encoding(request.headers.get('Accept-Encoding'))
+        if encoding is None:
+            return response
+        if response.is_streamed:
+            # Server-Sent Events stay uncompressed so every event reaches the client as sent
+            if response.mimetype == 'application/x-ndjson':
+                response.response = compress_chunks(response.response, encoding)
+                response.headers['Content-Encoding'] = encoding
+            return response
+        body, encoding = compress(response.get_data(), request.headers.get('Accept-Encoding'))
+        if encoding:
+            response.set_data(body)
+            response.headers['Content-Encoding'] = encoding
+        return response
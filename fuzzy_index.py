@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Typo-Tolerant Term Lookup
+SymSpell-style deletion index: every term is stored under each string
+obtained by deleting up to max_distance characters from its prefix, so
+a misspelled word finds its candidates by generating its own deletions
+and looking them up, instead of comparing against the whole vocabulary.
+Candidates are then confirmed with a bounded Damerau-Levenshtein distance.
+"""
+
+import threading
+
+
+def edit_distance(a, b, limit):
+    """Damerau-Levenshtein (optimal string alignment) distance, or limit + 1 once it exceeds limit"""
+    if a == b:
+        return 0
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        row_best = i
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if (previous2 is not None and i > 1 and j > 1
+                    and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]):
+                value = min(value, previous2[j - 2] + 1)
+            current[j] = value
+            row_best = min(row_best, value)
+        if row_best > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return min(previous[-1], limit + 1)
+
+
+def deletions(word, max_distance):
+    """word and every string made by deleting up to max_distance characters from it"""
+    found = {word}
+    frontier = {word}
+    for _ in range(max_distance):
+        frontier = {candidate[:i] + candidate[i + 1:] for candidate in frontier for i in range(len(candidate))}
+        frontier -= found
+        found |= frontier
+    return found
+
+
+class DeletionIndex:
+    """Thread-safe set of terms (with counts) searchable within an edit distance"""
+
+    def __init__(self, max_distance=2, prefix_length=7):
+        self.max_distance = max_distance
+        # Only prefixes are indexed: it keeps the index small, and typos in
+        # long words are still caught by the full-length distance check
+        self.prefix_length = prefix_length
+        # term -> count (e.g. how many records or topics use it)
+        self.counts = {}
+        # deletion of a term prefix -> terms
+        self._deletes = {}
+        self._lock = threading.Lock()
+
+    def __contains__(self, term):
+        return term in self.counts
+
+    def __len__(self):
+        return len(self.counts)
+
+    def add(self, term, count=1):
+        """Add a term, or raise the count of one already indexed"""
+        with self._lock:
+            if term in self.counts:
+                self.counts[term] += count
+                return
+            self.counts[term] = count
+            for key in deletions(term[:self.prefix_length], self.max_distance):
+                self._deletes.setdefault(key, []).append(term)
+
+    def remove(self, term, count=1):
+        """Lower a term's count, dropping it from the index once it reaches zero"""
+        with self._lock:
+            remaining = self.counts.get(term, 0) - count
+            if remaining > 0:
+                self.counts[term] = remaining
+                return
+            if self.counts.pop(term, None) is None:
+                return
+            for key in deletions(term[:self.prefix_length], self.max_distance):
+                terms = self._deletes.get(key)
+                if terms is not None:
+                    terms.remove(term)
+                    if not terms:
+                        del self._deletes[key]
+
+    def lookup(self, word, max_distance=None, limit=None):
+        """[(term, distance, count)] within max_distance of word, closest and most common first"""
+        max_distance = self.max_distance if max_distance is None else min(max_distance, self.max_distance)
+        prefix = word[:self.prefix_length]
+        candidates = set()
+        with self._lock:
+            for key in deletions(prefix, max_distance):
+                terms = self._deletes.get(key)
+                if terms:
+                    candidates.update(terms)
+            counts = {term: self.counts[term] for term in candidates}
+        matches = []
+        for term in candidates:
+            distance = edit_distance(word, term, max_distance)
+            if distance <= max_distance:
+                matches.append((term, distance, counts[term]))
+        matches.sort(key=lambda match: (match[1], -match[2], match[0]))
+        return matches[:limit] if limit else matches
+
+    def stats(self):
+        with self._lock:
+            return {
+                "terms": len(self.counts),
+                "deletion_keys": len(self._deletes),
+                "max_distance": self.max_distance,
+                "prefix_length": self.prefix_length
+            }
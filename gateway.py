@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+API Gateway - Healthcare Insurance RAG System
+One endpoint for the frontend that fans a member question out to the RAG,
+hospital and insurance servers concurrently over pooled keep-alive
+connections, returning whatever arrived before each backend's timeout.
+"""
+
+import asyncio
+from datetime import datetime
+import functools
+import logging
+import os
+import time
+from urllib.parse import quote
+
+import aiohttp
+from aiohttp import web
+
+from fast_json import dumps, loads
+from metrics import PROMETHEUS_CONTENT_TYPE, REGISTRY, configure_logging, observe_request
+
+PORT = int(os.environ.get('PORT', 8000))
+HOST = '0.0.0.0'
+
+BACKENDS = {
+    "rag": os.environ.get('RAG_SERVER_URL', 'http://localhost:8005'),
+    "hospital": os.environ.get('HOSPITAL_SERVER_URL', 'http://localhost:8003'),
+    "insurance": os.environ.get('INSURANCE_SERVER_URL', 'http://localhost:8004'),
+}
+# Seconds to wait for each backend before answering without it
+BACKEND_TIMEOUTS = {
+    name: float(os.environ.get(f'GATEWAY_{name.upper()}_TIMEOUT', 2.0)) for name in BACKENDS
+}
+# Open connections kept per backend
+GATEWAY_POOL_SIZE = int(os.environ.get('GATEWAY_POOL_SIZE', 100))
+# Seconds an idle backend connection stays open for reuse
+GATEWAY_KEEP_ALIVE = float(os.environ.get('GATEWAY_KEEP_ALIVE', 30))
+
+CORS_HEADERS = {
+    "Access-Control-Allow-Origin": "*",
+    "Access-Control-Allow-Methods": "GET, POST, OPTIONS",
+    "Access-Control-Allow-Headers": "Content-Type, Accept, Authorization",
+}
+
+SESSION = web.AppKey("session", aiohttp.ClientSession)
+
+
+def _dumps(data):
+    return dumps(data).decode('utf-8')
+
+
+# Responses go through the same fast encoder as the Flask services
+json_response = functools.partial(web.json_response, dumps=_dumps)
+
+logger = configure_logging('gateway')
+
+
+async def call_backend(session, backend, method, path, payload=None):
+    """Return (data, error, elapsed_ms) for one backend call; never raises"""
+    started = time.perf_counter()
+    try:
+        async with session.request(method, BACKENDS[backend] + path, json=payload,
+                                   timeout=aiohttp.ClientTimeout(total=BACKEND_TIMEOUTS[backend])) as response:
+            if response.status >= 400:
+                try:
+                    body = await response.json(content_type=None, loads=loads)
+                except ValueError:
+                    body = None
+                message = body.get("message") or body.get("error") if isinstance(body, dict) else None
+                error = f"HTTP {response.status}: {message or response.reason}"
+                return None, error, _elapsed_ms(started)
+            return await response.json(content_type=None, loads=loads), None, _elapsed_ms(started)
+    except asyncio.TimeoutError:
+        return None, f"Timed out after {BACKEND_TIMEOUTS[backend]}s", _elapsed_ms(started)
+    except (aiohttp.ClientError, ValueError) as e:
+        return None, f"{type(e).__name__}: {e}", _elapsed_ms(started)
+
+
+def _elapsed_ms(started):
+    return round((time.perf_counter() - started) * 1000, 1)
+
+
+@web.middleware
+async def metrics_middleware(request, handler):
+    """Record latency, sizes and status for every request"""
+    started = time.perf_counter()
+    status = 500
+    response = None
+    try:
+        response = await handler(request)
+        status = response.status
+        return response
+    except web.HTTPException as e:
+        status = e.status
+        raise
+    finally:
+        # Route templates keep the endpoint label bounded
+        resource = request.match_info.route.resource
+        endpoint = resource.canonical if resource is not None else 'unmatched'
+        observe_request('gateway', request.method, endpoint, status, time.perf_counter() - started,
+                        request.content_length, response.content_length if response is not None else None)
+
+
+@web.middleware
+async def cors_middleware(request, handler):
+    """Answer preflights and add CORS headers to every response"""
+    if request.method == 'OPTIONS':
+        return web.Response(headers=CORS_HEADERS)
+    try:
+        response = await handler(request)
+    except web.HTTPException as e:
+        response = json_response({"status": "error", "message": e.reason}, status=e.status)
+    response.headers.update(CORS_HEADERS)
+    return response
+
+
+async def health(request):
+    """Gateway health plus the health of each backend"""
+    session = request.app[SESSION]
+    names = list(BACKENDS)
+    results = await asyncio.gather(*(call_backend(session, name, 'GET', '/health') for name in names))
+    backends = {
+        name: {"status": "healthy" if error is None else "unhealthy", "error": error, "elapsed_ms": elapsed}
+        for name, (_, error, elapsed) in zip(names, results)
+    }
+    return json_response({
+        "status": "healthy",
+        "service": "gateway",
+        "timestamp": datetime.now().isoformat(),
+        "backends": backends
+    })
+
+
+async def member_summary(request):
+    """Patient record, coverage and a RAG answer for one member question"""
+    try:
+        data = await request.json(loads=loads)
+    except ValueError:
+        data = None
+    if not isinstance(data, dict):
+        return json_response({"status": "error", "message": "Request body must be a JSON object"}, status=400)
+
+    patient_id = data.get("patient_id")
+    question = data.get("question") or data.get("query")
+    service = data.get("service")
+    if not (patient_id or question or service):
+        return json_response({"status": "error", "message": "patient_id, service or question is required"},
+                                 status=400)
+    # The client normalizes dot segments even when escaped, so these would leave the patients route
+    if patient_id and str(patient_id) in (".", ".."):
+        return json_response({"status": "error", "message": "Invalid patient_id"}, status=400)
+
+    session = request.app[SESSION]
+    results = {}
+
+    async def fetch_patient():
+        # Escaped so an id containing / or ? can't reach another backend route
+        path = f"/api/v1/patients/{quote(str(patient_id), safe='')}"
+        return await call_backend(session, "hospital", 'GET', path)
+
+    async def fetch_coverage(patient_task):
+        policy_number = data.get("policy_number")
+        if not policy_number and patient_task is not None:
+            # Without a policy number the coverage lookup waits for the patient record
+            patient, _, _ = await patient_task
+            policy_number = (patient or {}).get("data", {}).get("insurance_policy_number") or None
+        payload = {"service": service, "policy_number": policy_number, "patient_id": patient_id}
+        return await call_backend(session, "insurance", 'POST', '/api/v1/coverage', payload)
+
+    async def fetch_answer():
+        return await call_backend(session, "rag", 'POST', '/api/v1/rag/query', {"query": question})
+
+    tasks = {}
+    if patient_id:
+        tasks["patient"] = asyncio.ensure_future(fetch_patient())
+    if service:
+        tasks["coverage"] = asyncio.ensure_future(fetch_coverage(tasks.get("patient")))
+    if question:
+        tasks["answer"] = asyncio.ensure_future(fetch_answer())
+    await asyncio.gather(*tasks.values())
+
+    errors = {}
+    timings = {}
+    for part, task in tasks.items():
+        result, error, elapsed = task.result()
+        results[part] = result.get("data", result) if part == "patient" and result else result
+        timings[part] = elapsed
+        if error:
+            errors[part] = error
+
+    if len(errors) == len(tasks):
+        status, code = "error", 502
+    else:
+        status, code = ("partial" if errors else "success"), 200
+    return json_response({
+        "status": status,
+        **results,
+        "errors": errors,
+        "timings_ms": timings,
+        "timestamp": datetime.now().isoformat()
+    }, status=code)
+
+
+async def metrics(request):
+    """Prometheus metrics"""
+    return web.Response(body=REGISTRY.render().encode(), headers={"Content-Type": PROMETHEUS_CONTENT_TYPE})
+
+
+async def index(request):
+    """Root endpoint"""
+    return json_response({
+        "service": "API Gateway",
+        "version": "1.0.0",
+        "port": PORT,
+        "backends": BACKENDS,
+        "timeouts_seconds": BACKEND_TIMEOUTS,
+        "endpoints": {
+            "health": "/health",
+            "member_summary": "/api/v1/member/summary",
+            "metrics": "/metrics"
+        }
+    })
+
+
+async def open_session(app):
+    """Share one pooled client session across requests"""
+    connector = aiohttp.TCPConnector(limit_per_host=GATEWAY_POOL_SIZE, keepalive_timeout=GATEWAY_KEEP_ALIVE)
+    app[SESSION] = aiohttp.ClientSession(connector=connector, json_serialize=_dumps)
+    yield
+    await app[SESSION].close()
+
+
+def create_app():
+    app = web.Application(middlewares=[cors_middleware, metrics_middleware])
+    app.cleanup_ctx.append(open_session)
+    app.router.add_get('/health', health)
+    app.router.add_post('/api/v1/member/summary', member_summary)
+    app.router.add_get('/metrics', metrics)
+    app.router.add_get('/', index)
+    return app
+
+
+app = create_app()
+
+if __name__ == '__main__':
+    print("=" * 60)
+    print("API GATEWAY")
+    print("=" * 60)
+    print(f"Starting on http://localhost:{PORT}")
+    for name, url in BACKENDS.items():
+        print(f"  {name:<10} {url} (timeout {BACKEND_TIMEOUTS[name]}s)")
+    print("=" * 60)
+    # Access lines only at LOG_LEVEL=DEBUG
+    access_log = logger if logger.isEnabledFor(logging.DEBUG) else None
+    web.run_app(app, host=HOST, port=PORT, print=None, access_log=access_log)
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Gunicorn Settings for the HealthGuard Flask Services
+The app is preloaded in the master so the knowledge base and its indexes
+are built once and shared copy-on-write by every forked worker.
+
+Usage:
+    HEALTHGUARD_SERVICE=rag gunicorn -c gunicorn_config.py enhanced_rag_server:app
+    HEALTHGUARD_SERVICE=insurance STORAGE_BACKEND=sqlite gunicorn -c gunicorn_config.py insurance_server_actual:app
+    HEALTHGUARD_SERVICE=hospital gunicorn -c gunicorn_config.py hospital_server_8003:app
+    HEALTHGUARD_SERVICE=all gunicorn -c gunicorn_config.py app:app
+"""
+
+import gc
+import multiprocessing
+import os
+
+# service -> (default port, default threads per worker)
+SERVICE_DEFAULTS = {
+    # Scoring is CPU-bound: one process per core, a few threads to overlap socket I/O
+    "rag": (8005, 4),
+    # Mostly storage and JSON work; more threads keep SQLite waits overlapped
+    "insurance": (8004, 8),
+    # Many small requests from clients that keep their connections open
+    "hospital": (8003, 32),
+    # app.py: every service mounted in one process
+    "all": (8005, 16),
+}
+# The patient search index and the claim queue live in the hospital
+# process, and each member's deductible and out-of-pocket totals in the
+# insurance process, so they (and app.py, which mounts both) must run as
+# one worker
+SINGLE_WORKER_SERVICES = ("insurance", "hospital", "all")
+
+SERVICE = os.environ.get('HEALTHGUARD_SERVICE', 'rag')
+if SERVICE not in SERVICE_DEFAULTS:
+    raise ValueError(f"HEALTHGUARD_SERVICE must be one of {tuple(SERVICE_DEFAULTS)}, got {SERVICE!r}")
+_default_port, _default_threads = SERVICE_DEFAULTS[SERVICE]
+
+bind = f"0.0.0.0:{os.environ.get('PORT', _default_port)}"
+_default_workers = 1 if SERVICE in SINGLE_WORKER_SERVICES else multiprocessing.cpu_count()
+workers = int(os.environ.get('WEB_CONCURRENCY', _default_workers))
+# gthread (stamping X-Request-Start as requests queue for a thread, see
+# gunicorn_workers.py); gevent adds nothing for CPU-bound scoring
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gunicorn_workers.QueueTimedThreadWorker')
+threads = int(os.environ.get('GUNICORN_THREADS', _default_threads))
+# The preloaded app sizes its admission limits from this
+os.environ['GUNICORN_THREADS'] = str(threads)
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') != '0'
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+# Without preload each worker builds its own index while booting, and a
+# worker that misses this deadline is killed and rebooted
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = 10
+accesslog = None
+
+if SERVICE in SINGLE_WORKER_SERVICES and workers > 1:
+    print(f"⚠️  {SERVICE} keeps state a second worker would split; running 1 worker")
+    workers = 1
+
+
+def when_ready(server):
+    """Freeze the preloaded objects before workers fork
+
+    Moving them out of the garbage collector's generations means a
+    collection in a worker never writes to (and so never copies) the
+    pages holding the shared knowledge base.
+    """
+    gc.collect()
+    gc.freeze()
+    server.log.info(f"{SERVICE}: {workers} workers x {threads} threads ({worker_class}), "
+                    f"preload={'on' if preload_app else 'off'}, {gc.get_freeze_count()} objects frozen")
@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+"""
+Gunicorn Worker for the HealthGuard Flask Services
+A gthread worker that stamps each request with X-Request-Start when its
+connection is queued for a thread. A worker runs at most
+GUNICORN_THREADS requests at once and queues the rest inside gunicorn,
+so without the stamp the app (and admission.py's queue-wait and p99
+checks) only sees a request once a thread picks it up.
+
+Usage (gunicorn_config.py selects it by default):
+    gunicorn -k gunicorn_workers.QueueTimedThreadWorker ...
+"""
+
+import time
+
+from gunicorn.workers.gthread import ThreadWorker
+
+
+class QueueTimedThreadWorker(ThreadWorker):
+    """gthread worker adding X-Request-Start (seconds since the epoch) unless a proxy already did"""
+
+    def enqueue_req(self, conn):
+        # Called when a new or kept-alive connection has a request to read
+        conn.enqueued_at = time.time()
+        super().enqueue_req(conn)
+
+    def handle_request(self, req, conn):
+        # The parser upper-cases header names; a proxy's earlier stamp wins
+        if not any(name == 'X-REQUEST-START' for name, _ in req.headers):
+            req.headers.append(('X-REQUEST-START', f"t={conn.enqueued_at:.6f}"))
+        return super().handle_request(req, conn)
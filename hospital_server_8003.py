@@ -5,194 +5,329 @@
 Hospital Server - Healthcare Insurance RAG System
 """
 
-import http.server
-import socketserver
-import json
+import os
+import sys
+import time
 import uuid
-from datetime import datetime
-from urllib.parse import urlparse, parse_qs
-
-# In-memory storage
-patients = {}
-medical_records = {}
-claims = {}
-
-class HospitalHandler(http.server.BaseHTTPRequestHandler):
-    def do_GET(self):
-        if self.path == '/health':
-            self.send_json_response({
-                "status": "healthy",
-                "timestamp": datetime.now().isoformat(),
-                "server": "hospital",
-                "version": "1.0.0",
-                "patients_count": len(patients),
-                "records_count": len(medical_records),
-                "claims_count": len(claims)
-            })
-        
-        elif self.path == '/api/v1/patients':
-            self.send_json_response({
-                "status": "success",
-                "data": list(patients.values()),
-                "count": len(patients)
-            })
-        
-        elif self.path.startswith('/api/v1/patients/'):
-            patient_id = self.path.split('/')[-1]
-            if patient_id in patients:
-                self.send_json_response({
-                    "status": "success",
-                    "data": patients[patient_id]
-                })
-            else:
-                self.send_error_response(404, "Patient not found")
-        else:
-            self.send_error_response(404, "Endpoint not found")
-
-    def do_POST(self):
-        content_length = int(self.headers.get('Content-Length', 0))
-        if content_length > 0:
-            post_data = self.rfile.read(content_length)
-            try:
-                data = json.loads(post_data.decode('utf-8'))
-            except json.JSONDecodeError:
-                self.send_error_response(400, "Invalid JSON")
-                return
-        else:
-            data = {}
-
-        if self.path == '/api/v1/patients/register':
-            self.register_patient(data)
-        
-        elif self.path == '/api/v1/medical-records':
-            self.create_medical_record(data)
-        
-        elif self.path == '/api/v1/insurance-claims':
-            self.submit_insurance_claim(data)
-        
-        else:
-            self.send_error_response(404, "Endpoint not found")
 
-    def register_patient(self, data):
-        patient_id = f"PAT-{uuid.uuid4().hex[:8].upper()}"
-        
-        patient_data = {
-            "patient_id": patient_id,
-            "first_name": data.get("first_name", ""),
-            "last_name": data.get("last_name", ""),
-            "date_of_birth": data.get("date_of_birth", ""),
-            "gender": data.get("gender", ""),
-            "phone": data.get("phone", ""),
-            "email": data.get("email", ""),
-            "address": data.get("address", ""),
-            "insurance_policy_number": data.get("insurance_policy_number", ""),
-            "registration_date": datetime.now().isoformat(),
-            "last_updated": datetime.now().isoformat()
-        }
-        
-        patients[patient_id] = patient_data
-        
-        self.send_json_response({
-            "status": "success",
-            "message": "Patient registered successfully",
-            "patient_id": patient_id,
-            "data": patient_data
-        })
-
-    def create_medical_record(self, data):
-        record_id = f"REC-{uuid.uuid4().hex[:8].upper()}"
-        
-        # Verify patient exists
-        patient_id = data.get("patient_id")
-        if patient_id not in patients:
-            self.send_error_response(404, "Patient not found")
-            return
-        
-        record_data = {
-            "record_id": record_id,
-            "patient_id": patient_id,
-            "doctor_id": data.get("doctor_id", ""),
-            "visit_date": data.get("visit_date", ""),
-            "visit_type": data.get("visit_type", ""),
-            "diagnosis": data.get("diagnosis", ""),
-            "treatments": data.get("treatments", []),
-            "total_cost": data.get("total_cost", 0),
-            "insurance_claim_amount": data.get("insurance_claim_amount", 0),
-            "notes": data.get("notes", ""),
-            "created_date": datetime.now().isoformat(),
-            "last_updated": datetime.now().isoformat()
-        }
-        
-        medical_records[record_id] = record_data
-        
-        self.send_json_response({
-            "status": "success",
-            "message": "Medical record created successfully",
-            "record_id": record_id,
-            "data": record_data
-        })
-
-    def submit_insurance_claim(self, data):
-        claim_id = f"CLM-{uuid.uuid4().hex[:8].upper()}"
-        
-        claim_data = {
-            "claim_id": claim_id,
-            "patient_id": data.get("patient_id", ""),
-            "policy_number": data.get("policy_number", ""),
-            "medical_record_ids": data.get("medical_record_ids", []),
-            "total_amount": data.get("total_amount", 0),
-            "claim_type": data.get("claim_type", ""),
-            "priority": data.get("priority", "normal"),
-            "status": "submitted",
-            "submission_date": datetime.now().isoformat(),
-            "last_updated": datetime.now().isoformat()
-        }
+from flask import Flask, Response, jsonify, request, url_for
+
+from claim_pipeline import ClaimPipeline
+from fast_json import install_fast_json, loads, request_timestamp
+from metrics import configure_logging, instrument_flask
+from pagination import ndjson_chunks, parse_filters, parse_limit, wants_ndjson
+from patient_index import HASHED_FIELDS, NAME_FIELDS, PatientIndex
+from storage import STORAGE_BACKEND, open_collection
+
+app = Flask(__name__)
+instrument_flask(app, 'hospital')
+# Compact orjson/json responses, gzip or br for large bodies
+install_fast_json(app)
+
+# Same fixed CORS headers the hospital server has always sent, on every
+# response (OPTIONS preflights are answered by Flask's automatic handler)
+CORS_HEADERS = {
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
+    'Access-Control-Allow-Headers': 'Content-Type'
+}
+
+@app.after_request
+def add_cors_headers(response):
+    response.headers.update(CORS_HEADERS)
+    return response
+
+# Record storage (thread-safe; in-memory dicts unless STORAGE_BACKEND=sqlite)
+patients = open_collection('hospital', 'patients')
+medical_records = open_collection('hospital', 'medical_records')
+claims = open_collection('hospital', 'claims')
+
+# Name, date of birth, email and policy number search; built from storage
+# at startup and kept current as patients are registered
+PATIENT_INDEX = PatientIndex()
+PATIENT_INDEX.update(patients.iter_records())
+# Results returned by patient search unless ?limit= says otherwise
+SEARCH_DEFAULT_LIMIT = 20
+
+# Submitted claims are validated and assessed in the background
+CLAIM_PIPELINE = ClaimPipeline(claims, medical_records)
+# Seconds a client is asked to wait when the claim queue is full
+CLAIM_RETRY_AFTER = 1
+
+# Fields accepted as exact-match filters on GET /api/v1/patients
+PATIENT_FILTER_FIELDS = ('patient_id', 'insurance_policy_number', 'last_name', 'date_of_birth', 'email')
+
+logger = configure_logging('hospital')
+
+@app.before_request
+def start_claim_pipeline():
+    """Start the claim workers in the serving process and queue claims a previous run left pending
+
+    Runs on the first request of each process: threads don't survive the
+    fork into a gunicorn worker, and a preloaded master must not process
+    the queue itself.
+    """
+    if CLAIM_PIPELINE.start():
+        CLAIM_PIPELINE.resume()
+
+def error_response(status_code, message, headers=None):
+    """Hospital error body: {"status": "error", "message", "timestamp"}"""
+    response = jsonify({
+        "status": "error",
+        "message": message,
+        "timestamp": request_timestamp()
+    })
+    response.status_code = status_code
+    response.headers.extend(headers or {})
+    return response
+
+def request_data():
+    """JSON object in the request body ({} when empty); raises ValueError if it isn't one"""
+    body = request.get_data()
+    if not body:
+        return {}
+    data = loads(body)
+    if not isinstance(data, dict):
+        raise ValueError("JSON body must be an object")
+    return data
+
+@app.errorhandler(404)
+def endpoint_not_found(error):
+    return error_response(404, "Endpoint not found")
+
+@app.errorhandler(405)
+def method_not_allowed(error):
+    return error_response(405, "Method not allowed")
+
+@app.route('/health', methods=['GET'])
+def health_check():
+    return jsonify({
+        "status": "healthy",
+        "timestamp": request_timestamp(),
+        "server": "hospital",
+        "version": "1.0.0",
+        "patients_count": len(patients),
+        "records_count": len(medical_records),
+        "claims_count": len(claims),
+        "patient_index": PATIENT_INDEX.stats(),
+        "claim_pipeline": CLAIM_PIPELINE.stats()
+    })
+
+@app.route('/api/v1/patients', methods=['GET'])
+def list_patients():
+    try:
+        limit = parse_limit(request.args.get('limit'))
+        cursor = request.args.get('cursor')
+        filters = parse_filters(request.args, PATIENT_FILTER_FIELDS)
         
-        claims[claim_id] = claim_data
+        if wants_ndjson(request.args, request.headers.get('Accept')):
+            records = patients.iter_records(filters, cursor)
+            return Response(ndjson_chunks(records), mimetype='application/x-ndjson')
         
-        self.send_json_response({
-            "status": "success",
-            "message": "Insurance claim submitted successfully",
-            "claim_id": claim_id,
-            "data": claim_data
-        })
-
-    def send_json_response(self, data, status_code=200):
-        self.send_response(status_code)
-        self.send_header('Content-type', 'application/json')
-        self.send_header('Access-Control-Allow-Origin', '*')
-        self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
-        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
-        self.end_headers()
-        self.wfile.write(json.dumps(data, indent=2).encode())
-
-    def send_error_response(self, status_code, message):
-        self.send_json_response({
-            "status": "error",
-            "message": message,
-            "timestamp": datetime.now().isoformat()
-        }, status_code)
-
-    def do_OPTIONS(self):
-        self.send_response(200)
-        self.send_header('Access-Control-Allow-Origin', '*')
-        self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
-        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
-        self.end_headers()
+        page, next_cursor = patients.page(limit, cursor, filters)
+    except ValueError as e:
+        return error_response(400, str(e))
+    
+    return jsonify({
+        "status": "success",
+        "data": page,
+        "count": len(page),
+        "total": len(patients),
+        "limit": limit,
+        "next_cursor": next_cursor
+    })
+
+@app.route('/api/v1/patients/search', methods=['GET'])
+def search_patients():
+    """Patients matching ?q= (name words, by prefix or with typos) and exact-field filters"""
+    try:
+        limit = parse_limit(request.args.get('limit', SEARCH_DEFAULT_LIMIT))
+    except ValueError as e:
+        return error_response(400, str(e))
+    text = request.args.get('q', '')
+    filters = parse_filters(request.args, NAME_FIELDS + HASHED_FIELDS)
+    if not text.strip() and not filters:
+        return error_response(400, f"Provide q or one of: {', '.join(NAME_FIELDS + HASHED_FIELDS)}")
+    fuzzy = request.args.get('fuzzy', 'true').lower() not in ('0', 'false', 'no')
+    
+    started = time.perf_counter()
+    patient_ids, truncated = PATIENT_INDEX.search(text, filters, fuzzy, limit)
+    took_ms = (time.perf_counter() - started) * 1000
+    results = [patient for patient in map(patients.get, patient_ids) if patient is not None]
+    
+    return jsonify({
+        "status": "success",
+        "data": results,
+        "count": len(results),
+        "truncated": truncated,
+        "took_ms": round(took_ms, 3)
+    })
+
+@app.route('/api/v1/patients/<patient_id>', methods=['GET'])
+def get_patient(patient_id):
+    patient = patients.get(patient_id)
+    if patient is None:
+        return error_response(404, "Patient not found")
+    return jsonify({
+        "status": "success",
+        "data": patient
+    })
+
+@app.route('/api/v1/insurance-claims/pipeline', methods=['GET'])
+def claim_pipeline_stats():
+    return jsonify({
+        "status": "success",
+        "data": CLAIM_PIPELINE.stats()
+    })
+
+@app.route('/api/v1/insurance-claims/<claim_id>', methods=['GET'])
+def get_claim(claim_id):
+    claim = claims.get(claim_id)
+    if claim is None:
+        return error_response(404, "Claim not found")
+    return jsonify({
+        "status": "success",
+        "data": claim
+    })
+
+@app.route('/api/v1/patients/register', methods=['POST'])
+def register_patient():
+    try:
+        data = request_data()
+    except ValueError:
+        return error_response(400, "Invalid JSON")
+    patient_id = f"PAT-{uuid.uuid4().hex[:8].upper()}"
+    
+    patient_data = {
+        "patient_id": patient_id,
+        "first_name": data.get("first_name", ""),
+        "last_name": data.get("last_name", ""),
+        "date_of_birth": data.get("date_of_birth", ""),
+        "gender": data.get("gender", ""),
+        "phone": data.get("phone", ""),
+        "email": data.get("email", ""),
+        "address": data.get("address", ""),
+        "insurance_policy_number": data.get("insurance_policy_number", ""),
+        "registration_date": request_timestamp(),
+        "last_updated": request_timestamp()
+    }
+    
+    patients[patient_id] = patient_data
+    PATIENT_INDEX.add(patient_data)
+    
+    return jsonify({
+        "status": "success",
+        "message": "Patient registered successfully",
+        "patient_id": patient_id,
+        "data": patient_data
+    })
+
+@app.route('/api/v1/medical-records', methods=['POST'])
+def create_medical_record():
+    try:
+        data = request_data()
+    except ValueError:
+        return error_response(400, "Invalid JSON")
+    record_id = f"REC-{uuid.uuid4().hex[:8].upper()}"
+    
+    # Verify patient exists
+    patient_id = data.get("patient_id")
+    if patient_id not in patients:
+        return error_response(404, "Patient not found")
+    
+    record_data = {
+        "record_id": record_id,
+        "patient_id": patient_id,
+        "doctor_id": data.get("doctor_id", ""),
+        "visit_date": data.get("visit_date", ""),
+        "visit_type": data.get("visit_type", ""),
+        "diagnosis": data.get("diagnosis", ""),
+        "treatments": data.get("treatments", []),
+        "total_cost": data.get("total_cost", 0),
+        "insurance_claim_amount": data.get("insurance_claim_amount", 0),
+        "notes": data.get("notes", ""),
+        "created_date": request_timestamp(),
+        "last_updated": request_timestamp()
+    }
+    
+    medical_records[record_id] = record_data
+    
+    return jsonify({
+        "status": "success",
+        "message": "Medical record created successfully",
+        "record_id": record_id,
+        "data": record_data
+    })
+
+@app.route('/api/v1/insurance-claims', methods=['POST'])
+def submit_insurance_claim():
+    """Store the claim and queue it for assessment; answers before it is assessed"""
+    try:
+        data = request_data()
+    except ValueError:
+        return error_response(400, "Invalid JSON")
+    if not CLAIM_PIPELINE.has_room():
+        return error_response(503, "Claim queue is full, please retry shortly",
+                              headers={'Retry-After': str(CLAIM_RETRY_AFTER)})
+    
+    claim_id = f"CLM-{uuid.uuid4().hex[:8].upper()}"
+    
+    claim_data = {
+        "claim_id": claim_id,
+        "patient_id": data.get("patient_id", ""),
+        "policy_number": data.get("policy_number", ""),
+        "medical_record_ids": data.get("medical_record_ids", []),
+        "total_amount": data.get("total_amount", 0),
+        "claim_type": data.get("claim_type", ""),
+        "priority": data.get("priority", "normal"),
+        "status": "submitted",
+        "submission_date": request_timestamp(),
+        "last_updated": request_timestamp()
+    }
+    
+    claims[claim_id] = claim_data
+    if not CLAIM_PIPELINE.submit(claim_id):
+        # Another submission took the last slot since the check above
+        claims[claim_id] = {**claim_data, "status": "failed", "error": "Claim queue full"}
+        return error_response(503, "Claim queue is full, please retry shortly",
+                              headers={'Retry-After': str(CLAIM_RETRY_AFTER)})
+    
+    response = jsonify({
+        "status": "success",
+        "message": "Insurance claim submitted for processing",
+        "claim_id": claim_id,
+        # Includes the mount prefix when served from app.py
+        "status_url": url_for('get_claim', claim_id=claim_id),
+        "data": claim_data
+    })
+    response.status_code = 202
+    return response
 
 if __name__ == "__main__":
-    PORT = 8003
-    print(f"Starting Hospital Server on http://localhost:{PORT}")
+    PORT = int(os.environ.get('PORT', 8003))
+    print(f"Starting Hospital Server on http://localhost:{PORT} ({STORAGE_BACKEND} storage)")
     print("Available endpoints:")
     print("  GET  /health")
     print("  POST /api/v1/patients/register")
     print("  GET  /api/v1/patients")
+    print("  GET  /api/v1/patients/search?q=")
     print("  POST /api/v1/medical-records")
     print("  POST /api/v1/insurance-claims")
+    print("  GET  /api/v1/insurance-claims/<claim_id>")
+    print("  GET  /api/v1/insurance-claims/pipeline")
+    print("  GET  /metrics")
     print("\nPress Ctrl+C to stop")
     
-    with socketserver.TCPServer(("", PORT), HospitalHandler) as httpd:
-        try:
-            httpd.serve_forever()
-        except KeyboardInterrupt:
-            print("\nShutting down Hospital Server...")
+    print(f"Claim pipeline: {CLAIM_PIPELINE.workers} {CLAIM_PIPELINE.executor} workers, "
+          f"batches of {CLAIM_PIPELINE.batch_size}, queue limit {CLAIM_PIPELINE.max_queue}")
+    debug_mode = os.environ.get('DEBUG', 'False').lower() == 'true'
+    if debug_mode:
+        # Reloader and debugger; werkzeug closes the connection after every response
+        app.run(host='0.0.0.0', port=PORT, debug=True, threaded=True)
+    else:
+        # The same bounded gthread worker launch_system.py runs: GUNICORN_THREADS
+        # (32) threads and keep-alive connections
+        root = os.path.dirname(os.path.abspath(__file__))
+        os.environ.update(HEALTHGUARD_SERVICE='hospital', PORT=str(PORT))
+        os.execv(sys.executable, [sys.executable, "-m", "gunicorn", "--chdir", root,
+                                  "-c", os.path.join(root, "gunicorn_config.py"), "hospital_server_8003:app"])
@@ -4,14 +4,23 @@ Insurance Server - Actual Server (Port 8004)
 Handles insurance policies, claims, and assessments
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
-from datetime import datetime
-import json
 import random
 import os
+import threading
+
+from adjudication import DEFAULT_OUT_OF_POCKET_MAX, AdjudicationEngine, validate_policy
+from claim_assessment import assess_chunk, assess_stream, read_jsonl
+from fast_json import dumps, install_fast_json, request_timestamp
+from metrics import instrument_flask
+from pagination import ndjson_chunks, parse_filters, parse_limit, wants_ndjson
+from storage import STORAGE_BACKEND, open_collection
 
 app = Flask(__name__)
+instrument_flask(app, 'insurance')
+# Compact orjson/json responses, gzip or br for large bodies
+install_fast_json(app)
 
 # Single CORS configuration - no duplicates
 CORS(app, 
@@ -23,10 +32,45 @@ CORS(app,
 PORT = int(os.environ.get('PORT', 8004))
 HOST = '0.0.0.0'
 
-# In-memory storage
-policies = {}
-claims = {}
-assessments = {}
+# Record storage (in-memory dicts unless STORAGE_BACKEND=sqlite)
+policies = open_collection('insurance', 'policies')
+claims = open_collection('insurance', 'claims')
+assessments = open_collection('insurance', 'assessments')
+# Each member's deductible met and out-of-pocket spent, per policy
+accumulators = open_collection('insurance', 'accumulators')
+
+# Fields accepted as exact-match filters on GET /api/v1/policies
+POLICY_FILTER_FIELDS = ('patient_id', 'policy_number', 'plan_type', 'status')
+
+
+def find_policy_by_number(policy_number):
+    """Policy stored under a policy number (uses the storage index)"""
+    found, _ = policies.page(1, filters={"policy_number": policy_number})
+    return found[0] if found else None
+
+
+# Coverage tables are built when policies are created; policies and
+# accumulators stored before a restart are loaded on first use. The engine
+# owns the accumulators, so the service runs as one worker (gunicorn_config.py)
+ENGINE = AdjudicationEngine(load_policy=find_policy_by_number, accumulator_store=accumulators)
+# Held while checking a new policy's number is free and storing it
+_create_policy_lock = threading.Lock()
+
+def assess_and_store(claims_in, stats=None):
+    """Assess claims in vectorized chunks, storing the assessments; yields one result per claim
+
+    Also called directly by the hospital's claim pipeline when both
+    services run in one process (app.py).
+    """
+    batch = {}
+    for result in assess_stream(claims_in, ENGINE, stats=stats):
+        if "assessment_id" in result:
+            batch[result["assessment_id"]] = {k: v for k, v in result.items() if k != "index"}
+            if len(batch) >= 1000:
+                assessments.update(batch)
+                batch = {}
+        yield result
+    assessments.update(batch)
 
 @app.route('/health', methods=['GET'])
 def health_check():
@@ -36,7 +80,7 @@ def health_check():
         "server": "insurance",
         "version": "1.0.0",
         "port": PORT,
-        "timestamp": datetime.now().isoformat(),
+        "timestamp": request_timestamp(),
         "policies_count": len(policies),
         "claims_count": len(claims),
         "assessments_count": len(assessments)
@@ -44,17 +88,35 @@ def health_check():
 
 @app.route('/api/v1/policies', methods=['GET'])
 def get_policies():
-    """Get all policies"""
+    """List policies a page at a time, or stream them as NDJSON"""
+    try:
+        limit = parse_limit(request.args.get('limit'))
+        cursor = request.args.get('cursor')
+        filters = parse_filters(request.args, POLICY_FILTER_FIELDS)
+        
+        if wants_ndjson(request.args, request.headers.get('Accept')):
+            records = policies.iter_records(filters, cursor)
+            return Response(ndjson_chunks(records), mimetype='application/x-ndjson')
+        
+        page, next_cursor = policies.page(limit, cursor, filters)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    
     return jsonify({
         "status": "success",
-        "count": len(policies),
-        "data": list(policies.values())
+        "count": len(page),
+        "total": len(policies),
+        "limit": limit,
+        "next_cursor": next_cursor,
+        "data": page
     })
 
 @app.route('/api/v1/policies', methods=['POST'])
 def create_policy():
     """Create new policy"""
-    data = request.json
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"status": "error", "message": "Request body must be a JSON object"}), 400
     policy_id = f"POL-{random.randint(100000, 999999)}"
     
     policy = {
@@ -64,6 +126,7 @@ def create_policy():
         "plan_type": data.get("plan_type", "PPO"),
         "premium": data.get("premium", 450.00),
         "deductible": data.get("deductible", 1500),
+        "out_of_pocket_max": data.get("out_of_pocket_max", DEFAULT_OUT_OF_POCKET_MAX),
         "coverage_details": data.get("coverage_details", {
             "preventive_care": 100,
             "emergency": 80,
@@ -71,10 +134,19 @@ def create_policy():
             "prescription": 80
         }),
         "status": "active",
-        "created_at": datetime.now().isoformat()
+        "created_at": request_timestamp()
     }
+    errors = validate_policy(policy)
+    if errors:
+        return jsonify({"status": "error", "message": "; ".join(errors)}), 400
     
-    policies[policy_id] = policy
+    with _create_policy_lock:
+        # Claims name policies by number, so two policies can't share one
+        if find_policy_by_number(policy["policy_number"]) is not None:
+            return jsonify({"status": "error",
+                            "message": f"Policy number {policy['policy_number']} already exists"}), 409
+        ENGINE.register_policy(policy)
+        policies[policy_id] = policy
     
     return jsonify({
         "status": "success",
@@ -86,24 +158,13 @@ def create_policy():
 @app.route('/api/v1/claims/assess', methods=['POST'])
 def assess_claim():
     """Assess insurance claim"""
-    data = request.json
-    assessment_id = f"ASS-{random.randint(100000, 999999)}"
-    
-    # Simple assessment logic
-    total_amount = data.get("total_amount", 0)
-    covered_amount = total_amount * 0.8  # 80% coverage
-    
-    assessment = {
-        "assessment_id": assessment_id,
-        "claim_id": data.get("claim_id"),
-        "policy_number": data.get("policy_number"),
-        "total_amount": total_amount,
-        "covered_amount": covered_amount,
-        "patient_responsibility": total_amount - covered_amount,
-        "status": "approved" if covered_amount > 0 else "denied",
-        "assessed_at": datetime.now().isoformat()
-    }
+    data = request.get_json(silent=True)
+    result = assess_chunk([data], ENGINE)[0]
+    if "error" in result:
+        return jsonify({"status": "error", "message": result["error"]}), 400
     
+    assessment = {k: v for k, v in result.items() if k != "index"}
+    assessment_id = assessment["assessment_id"]
     assessments[assessment_id] = assessment
     
     return jsonify({
@@ -113,29 +174,36 @@ def assess_claim():
         "data": assessment
     })
 
+@app.route('/api/v1/claims/assess/bulk', methods=['POST'])
+def assess_claims_bulk():
+    """Assess many claims in vectorized chunks, streaming JSONL results"""
+    if request.mimetype == 'application/x-ndjson':
+        claims_in = list(read_jsonl(request.get_data(as_text=True).splitlines()))
+    else:
+        data = request.get_json(silent=True) or {}
+        claims_in = data.get('claims')
+        if not isinstance(claims_in, list) or not claims_in:
+            return jsonify({"status": "error", "message": "'claims' must be a non-empty list"}), 400
+    
+    def generate():
+        stats = {}
+        for result in assess_and_store(claims_in, stats):
+            yield dumps(result) + b"\n"
+        yield dumps({"summary": stats}) + b"\n"
+    
+    return Response(generate(), mimetype='application/x-ndjson')
+
 @app.route('/api/v1/coverage', methods=['POST'])
 def check_coverage():
     """Check coverage for a specific service"""
-    data = request.json
-    service = data.get("service", "").lower()
-    
-    coverage_map = {
-        "preventive": 100,
-        "emergency": 80,
-        "specialist": 80,
-        "prescription": 80,
-        "dental": 0,
-        "vision": 50
-    }
+    data = request.get_json(silent=True) or {}
+    service = str(data.get("service", "")).lower()
     
-    coverage = coverage_map.get(service, 50)
+    coverage = ENGINE.coverage(service, data.get("policy_number"), data.get("patient_id"))
+    if coverage is None:
+        return jsonify({"status": "error", "message": "Policy not found"}), 404
     
-    return jsonify({
-        "service": service,
-        "coverage_percentage": coverage,
-        "requires_preauth": coverage < 80,
-        "deductible_applies": coverage < 100
-    })
+    return jsonify({"service": service, **coverage})
 
 @app.route('/', methods=['GET'])
 def index():
@@ -148,7 +216,9 @@ def index():
             "health": "/health",
             "policies": "/api/v1/policies",
             "assess_claim": "/api/v1/claims/assess",
-            "check_coverage": "/api/v1/coverage"
+            "assess_claims_bulk": "/api/v1/claims/assess/bulk",
+            "check_coverage": "/api/v1/coverage",
+            "metrics": "/metrics"
         }
     })
 
@@ -156,7 +226,7 @@ if __name__ == '__main__':
     print("="*60)
     print("INSURANCE SERVER")
     print("="*60)
-    print(f"Starting on http://localhost:{PORT}")
+    print(f"Starting on http://localhost:{PORT} ({STORAGE_BACKEND} storage)")
     print("="*60)
     # Use debug=False for production
     debug_mode = os.environ.get('DEBUG', 'False').lower() == 'true'
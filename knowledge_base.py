@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Knowledge Base Loader for the RAG Server
+Reads insurance topics from a JSON/JSONL file (or opens a compiled
+index) and bundles them with their retrieval indexes so a reload can be
+swapped in atomically.
+"""
+
+from datetime import datetime
+import json
+import os
+import threading
+import time
+
+from compiled_index import CompiledIndex, is_compiled_index
+from knowledge_index import KeywordIndex
+from query_spelling import SpellingCorrector
+from vector_index import MIN_SIMILARITY, VectorIndex, tokenize
+
+# Minimum keyword score for the keyword backend to count as a match
+KEYWORD_MATCH_THRESHOLD = 5
+# Keyword topics after the best need at least this score relative to it,
+# even when the caller's min_score is lower
+KEYWORD_RUNNER_UP_MIN_SCORE = 0.6
+
+
+def _validate_topic(topic_key, data):
+    """Raise ValueError if a topic entry is missing fields or has wrong types"""
+    if not isinstance(topic_key, str) or not topic_key:
+        raise ValueError(f"Topic key must be a non-empty string, got {topic_key!r}")
+    if not isinstance(data, dict):
+        raise ValueError(f"Topic '{topic_key}' must be an object")
+    keywords = data.get("keywords")
+    if not isinstance(keywords, list) or not all(isinstance(k, str) for k in keywords):
+        raise ValueError(f"Topic '{topic_key}' needs a list of string keywords")
+    if not isinstance(data.get("response"), str):
+        raise ValueError(f"Topic '{topic_key}' needs a string response")
+    confidence = data.get("confidence")
+    if isinstance(confidence, bool) or not isinstance(confidence, (int, float)) or not 0 <= confidence <= 1:
+        raise ValueError(f"Topic '{topic_key}' needs a confidence between 0 and 1")
+    if not isinstance(data.get("category"), str):
+        raise ValueError(f"Topic '{topic_key}' needs a string category")
+
+
+def load_knowledge_file(path):
+    """Load {topic_key: topic} from a .json or .jsonl knowledge base file
+
+    JSON files hold either an object keyed by topic or a list of topics
+    with a "topic" field; JSONL files hold one such topic per line.
+    """
+    with open(path, encoding="utf-8") as f:
+        if path.endswith(".jsonl"):
+            entries = [json.loads(line) for line in f if line.strip()]
+        else:
+            entries = json.load(f)
+
+    if isinstance(entries, dict):
+        items = list(entries.items())
+    elif isinstance(entries, list):
+        items = []
+        for entry in entries:
+            if not isinstance(entry, dict):
+                raise ValueError("Each knowledge base entry must be an object")
+            entry = dict(entry)
+            items.append((entry.pop("topic", None), entry))
+    else:
+        raise ValueError("Knowledge base must be an object or a list of topics")
+
+    knowledge = {}
+    for topic_key, data in items:
+        _validate_topic(topic_key, data)
+        if topic_key in knowledge:
+            raise ValueError(f"Duplicate topic '{topic_key}'")
+        knowledge[topic_key] = data
+    return knowledge
+
+
+class KnowledgeBase:
+    """A knowledge base and the indexes built from it, never mutated after construction"""
+
+    def __init__(self, knowledge, source=None, version=1, mtime=None, indexes=None, speller=None):
+        started = time.perf_counter()
+        self.knowledge = knowledge
+        if indexes is None:
+            self.keyword_index = KeywordIndex(knowledge)
+            self.vector_index = VectorIndex(knowledge)
+            self.format = "source"
+        else:
+            self.keyword_index, self.vector_index = indexes
+            self.format = "compiled"
+        self.source = source
+        self.version = version
+        self.mtime = mtime
+        self.loaded_at = datetime.now().isoformat()
+        self.load_seconds = time.perf_counter() - started
+        self._speller = speller
+        self._speller_lock = threading.Lock()
+
+    @classmethod
+    def from_file(cls, path, version=1):
+        """Read, validate and index a knowledge base file"""
+        started = time.perf_counter()
+        # Read the mtime first so a write during loading triggers another reload
+        mtime = os.path.getmtime(path)
+        knowledge_base = cls(load_knowledge_file(path), source=path, version=version, mtime=mtime)
+        knowledge_base.load_seconds = time.perf_counter() - started
+        return knowledge_base
+
+    @classmethod
+    def from_index(cls, path, version=1):
+        """Map a file written by compiled_index.py; topics are read on access"""
+        started = time.perf_counter()
+        mtime = os.path.getmtime(path)
+        index = CompiledIndex(path)
+        knowledge_base = cls(index.knowledge, source=path, version=version, mtime=mtime,
+                             indexes=(index.keyword_index, index.vector_index), speller=index.speller)
+        knowledge_base.load_seconds = time.perf_counter() - started
+        return knowledge_base
+
+    @classmethod
+    def open(cls, path, version=1):
+        """from_index for compiled index files, from_file for JSON/JSONL"""
+        if is_compiled_index(path):
+            return cls.from_index(path, version)
+        return cls.from_file(path, version)
+
+    @property
+    def speller(self):
+        """SpellingCorrector over the keyword vocabulary: mapped from a compiled index, else built on first use"""
+        with self._speller_lock:
+            if self._speller is None:
+                self._speller = SpellingCorrector.from_knowledge(self.knowledge)
+            return self._speller
+
+    def _rank_keyword(self, ranked, min_score, whole_word_best=None):
+        """(topic_key, confidence, score) from keyword scores, score relative to the best
+
+        Runners-up scored on whole words only are compared with the best
+        topic's whole-word score, when it has one.
+        """
+        ranked = [(topic_key, score) for topic_key, score in ranked if score >= KEYWORD_MATCH_THRESHOLD]
+        if not ranked:
+            return []
+        best = ranked[0][1]
+        runner_up_best = whole_word_best or best
+        matches = []
+        for topic_key, score in ranked:
+            relevance = min(1.0, score / (runner_up_best if matches else best))
+            if relevance < (min_score if not matches else max(min_score, KEYWORD_RUNNER_UP_MIN_SCORE)):
+                break
+            confidence = self.knowledge[topic_key]["confidence"]
+            matches.append((topic_key, confidence if relevance == 1 else round(confidence * relevance, 2),
+                            round(relevance, 3)))
+        return matches
+
+    def _rank_vector(self, ranked, top_k, min_score):
+        """(topic_key, confidence, score) from similarities, each calibrated against the next"""
+        if not ranked or ranked[0][1] < MIN_SIMILARITY:
+            return []
+        best = ranked[0][1]
+        matches = []
+        for rank, (position, similarity) in enumerate(ranked[:top_k]):
+            relevance = similarity / best
+            if similarity < MIN_SIMILARITY or relevance < min_score:
+                break
+            runner_up = ranked[rank + 1][1] if rank + 1 < len(ranked) else 0.0
+            matches.append((self.vector_index.topics[position],
+                            self.vector_index.calibrate(position, similarity, runner_up), round(relevance, 3)))
+        return matches
+
+    def top_matches(self, query, backend, top_k=1, min_score=0.0):
+        """Return up to top_k (topic_key, confidence, score) for one query, best first
+
+        score is relative to the best topic (1.0), and topics scoring
+        below min_score are dropped.
+        """
+        if backend == "vector":
+            # One extra result so the last topic's confidence has a runner-up
+            return self._rank_vector(self.vector_index.search(query, top_k=top_k + 1), top_k, min_score)
+        if backend == "keyword":
+            ranked, whole_word_best = self.keyword_index.rank(query, top_k, whole_word_runners_up=True)
+            return self._rank_keyword(ranked, min_score, whole_word_best)
+        raise ValueError(f"Unknown backend: {backend}")
+
+    def top_matches_many(self, queries, backend, top_k=1, min_score=0.0):
+        """top_matches for many queries, scored together"""
+        if backend == "vector":
+            return [self._rank_vector(ranked, top_k, min_score)
+                    for ranked in self.vector_index.search_many(queries, top_k=top_k + 1)]
+        if backend == "keyword":
+            results = {}
+            for query in queries:
+                if query not in results:
+                    results[query] = self.top_matches(query, backend, top_k, min_score)
+            return [results[query] for query in queries]
+        raise ValueError(f"Unknown backend: {backend}")
+
+    def query_terms(self, query, backend):
+        """What a backend scores the query on: the keywords it contains, or its vector terms
+
+        Questions with different terms can get different answers however
+        alike they look ("...pays for glasses" / "...pays for massages").
+        """
+        if backend == "vector":
+            vocabulary = self.vector_index.vocabulary
+            return frozenset(token for token in tokenize(query) if vocabulary.get(token) is not None)
+        if backend == "keyword":
+            return frozenset(self.keyword_index.matched_keywords(query.lower()))
+        raise ValueError(f"Unknown backend: {backend}")
+
+    def stats(self):
+        """Summary for the health and reload endpoints"""
+        return {
+            "version": self.version,
+            "topics": len(self.knowledge),
+            "source": self.source,
+            "format": self.format,
+            "loaded_at": self.loaded_at,
+            "load_seconds": round(self.load_seconds, 4)
+        }
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Keyword Index for the RAG Server
+Aho-Corasick automaton over every knowledge base keyword, built once
+so a query is scored in time proportional to its length.
+"""
+
+from collections import deque
+import heapq
+import re
+
+# Score awarded per matched keyword (same weights as the original scan)
+EXACT_MATCH_SCORE = 10
+PHRASE_MATCH_SCORE = 5
+
+
+def _rank_key(item):
+    """Highest score first, then topic order"""
+    return -item[1], item[0]
+
+
+def _on_word_boundaries(keyword, query_lower):
+    """Whether keyword occurs in the query as whole words, allowing a plural ending ("drugs")"""
+    return re.search(r"(?<!\w)" + re.escape(keyword) + r"(?:e?s)?(?!\w)", query_lower) is not None
+
+
+class KeywordIndex:
+    """Precompiled keyword -> topic index with substring semantics"""
+
+    def __init__(self, knowledge):
+        self.topics = list(knowledge.keys())
+        self.keywords = []
+        # keyword id -> [(topic position, occurrences in that topic)]
+        self.postings = []
+        keyword_ids = {}
+
+        for position, topic_key in enumerate(self.topics):
+            counts = {}
+            for keyword in knowledge[topic_key]["keywords"]:
+                counts[keyword] = counts.get(keyword, 0) + 1
+            for keyword, count in counts.items():
+                keyword_id = keyword_ids.get(keyword)
+                if keyword_id is None:
+                    keyword_id = len(self.keywords)
+                    keyword_ids[keyword] = keyword_id
+                    self.keywords.append(keyword)
+                    self.postings.append([])
+                self.postings[keyword_id].append((position, count))
+
+        self.keyword_ids = keyword_ids
+        self._build_automaton()
+
+    def _build_automaton(self):
+        """Build the goto/fail/output tables"""
+        goto = [{}]
+        output = [[]]
+
+        for keyword_id, keyword in enumerate(self.keywords):
+            state = 0
+            for char in keyword:
+                next_state = goto[state].get(char)
+                if next_state is None:
+                    next_state = len(goto)
+                    goto[state][char] = next_state
+                    goto.append({})
+                    output.append([])
+                state = next_state
+            output[state].append(keyword_id)
+
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in goto[state].items():
+                queue.append(next_state)
+                fallback = fail[state]
+                while fallback and char not in goto[fallback]:
+                    fallback = fail[fallback]
+                fail[next_state] = goto[fallback].get(char, 0)
+                if fail[next_state] == next_state:
+                    fail[next_state] = 0
+                # Inherit every keyword that ends at the fallback state
+                output[next_state] = output[next_state] + output[fail[next_state]]
+
+        self._goto = goto
+        self._fail = fail
+        self._output = output
+
+    def matched_keywords(self, query_lower):
+        """Return the ids of all keywords occurring in the lowercased query"""
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+
+        # Empty keywords match every query
+        found = set(output[0])
+        state = 0
+        for char in query_lower:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                found.update(output[state])
+        return found
+
+    def score(self, query):
+        """Return {topic position: score} for every topic with a match"""
+        query_lower = query.lower()
+        return self._score(self.matched_keywords(query_lower), query_lower)
+
+    def _score(self, keyword_ids, query_lower):
+        """{topic position: score} from matched keyword ids"""
+        exact_id = self.keyword_ids.get(query_lower.strip())
+        scores = {}
+        for keyword_id in keyword_ids:
+            points = EXACT_MATCH_SCORE if keyword_id == exact_id else PHRASE_MATCH_SCORE
+            for position, count in self.postings[keyword_id]:
+                scores[position] = scores.get(position, 0) + points * count
+        return scores
+
+    def top_matches(self, query, top_k, whole_word_runners_up=False):
+        """Return up to top_k (topic_key, score) pairs, best first, ties by topic order
+
+        With whole_word_runners_up, topics after the best are scored only on
+        keywords found between word boundaries, so "pt" inside "prescription"
+        can't add a second topic. The best topic is scored as usual.
+        """
+        return self.rank(query, top_k, whole_word_runners_up)[0]
+
+    def rank(self, query, top_k, whole_word_runners_up=False):
+        """top_matches, and the best topic's whole-word score (None unless runners-up were scored on whole words)
+
+        Runners-up should be compared with that score, not the best topic's
+        total: "emergency prescription" scores emergency 10 ("emergency" and
+        the "er" inside it) but 5 on whole words, the same as prescription.
+        """
+        query_lower = query.lower()
+        matched = self.matched_keywords(query_lower)
+        scores = self._score(matched, query_lower)
+        if not whole_word_runners_up or top_k < 2:
+            ranked = heapq.nsmallest(top_k, scores.items(), key=_rank_key)
+            return [(self.topics[position], score) for position, score in ranked], None
+
+        ranked = heapq.nsmallest(1, scores.items(), key=_rank_key)
+        whole_word_best = None
+        if ranked:
+            whole_words = [keyword_id for keyword_id in matched
+                           if _on_word_boundaries(self.keywords[keyword_id], query_lower)]
+            runners_up = self._score(whole_words, query_lower)
+            whole_word_best = runners_up.pop(ranked[0][0], 0)
+            ranked += heapq.nsmallest(top_k - 1, runners_up.items(), key=_rank_key)
+        return [(self.topics[position], score) for position, score in ranked], whole_word_best
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+HealthGuard AI System Launcher
+Runs the RAG server under gunicorn (preloaded, one worker per core) and
+the insurance and hospital servers as single threaded gunicorn workers,
+and stops them all together if any one exits. --single-process runs
+app.py instead: every service in one process on one port.
+
+Usage:
+    python launch_system.py
+    python launch_system.py --services rag --dry-run
+    python launch_system.py --single-process
+"""
+
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# name -> (command, port variable, default port)
+SERVICES = {
+    "rag": ([sys.executable, "-m", "gunicorn", "-c", "gunicorn_config.py", "enhanced_rag_server:app"],
+            "PORT", 8005),
+    "insurance": ([sys.executable, "-m", "gunicorn", "-c", "gunicorn_config.py", "insurance_server_actual:app"],
+                  "INSURANCE_PORT", 8004),
+    "hospital": ([sys.executable, "-m", "gunicorn", "-c", "gunicorn_config.py", "hospital_server_8003:app"],
+                 "HOSPITAL_PORT", 8003),
+    # app.py, mounting the three above under /rag, /insurance and /hospital
+    "all": ([sys.executable, "-m", "gunicorn", "-c", "gunicorn_config.py", "app:app"], "PORT", 8005),
+}
+# Services started unless --services says otherwise
+DEFAULT_SERVICES = ("rag", "insurance", "hospital")
+
+
+def service_env(name):
+    """Environment for one service: its port and the shared storage backend"""
+    _, port_variable, default_port = SERVICES[name]
+    env = dict(os.environ)
+    env["PORT"] = os.environ.get(port_variable, str(default_port))
+    env["HEALTHGUARD_SERVICE"] = name
+    # Several gunicorn workers only see each other's records through SQLite
+    env.setdefault("STORAGE_BACKEND", "sqlite")
+    if name in ("rag", "all"):
+        # Vector scoring allocates and frees topic-sized arrays per query; keep
+        # glibc from handing that heap back to the kernel and faulting it in
+        # again each time (most visible with a small, mapped RAG_INDEX_PATH process)
+        env.setdefault("MALLOC_TOP_PAD_", str(16 << 20))
+    return env
+
+
+def launch(names):
+    processes = {}
+    for name in names:
+        command = SERVICES[name][0]
+        env = service_env(name)
+        print(f"🚀 Starting {name} on port {env['PORT']}: {' '.join(command[1:])}")
+        processes[name] = subprocess.Popen(command, cwd=ROOT, env=env)
+    return processes
+
+
+def stop(processes, timeout=15):
+    for process in processes.values():
+        if process.poll() is None:
+            process.terminate()
+    deadline = time.time() + timeout
+    for process in processes.values():
+        try:
+            process.wait(timeout=max(0.1, deadline - time.time()))
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def supervise(processes):
+    """Wait until a service exits or we are told to stop; returns an exit code"""
+    stopping = []
+
+    def request_stop(signum, frame):
+        stopping.append(signum)
+
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+
+    while not stopping:
+        for name, process in processes.items():
+            code = process.poll()
+            if code is not None:
+                print(f"❌ {name} exited with code {code}; stopping the other services")
+                return code or 1
+        time.sleep(0.5)
+    print("\nShutting down HealthGuard AI...")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the HealthGuard AI services")
+    parser.add_argument("--services", default=",".join(DEFAULT_SERVICES),
+                        help=f"comma-separated services to run (default {','.join(DEFAULT_SERVICES)})")
+    parser.add_argument("--single-process", action="store_true",
+                        help="run every service in one process (app.py); same as --services all")
+    parser.add_argument("--dry-run", action="store_true", help="print the commands without running them")
+    args = parser.parse_args()
+
+    names = ["all"] if args.single_process else [name.strip() for name in args.services.split(",") if name.strip()]
+    if "all" in names and len(names) > 1:
+        parser.error("'all' already runs every service; don't combine it with others")
+    unknown = [name for name in names if name not in SERVICES]
+    if unknown:
+        parser.error(f"unknown services: {', '.join(unknown)}")
+
+    if args.dry_run:
+        for name in names:
+            env = service_env(name)
+            print(f"PORT={env['PORT']} HEALTHGUARD_SERVICE={name} STORAGE_BACKEND={env['STORAGE_BACKEND']} "
+                  f"{' '.join(SERVICES[name][0])}")
+        return 0
+
+    print("="*60)
+    print("🏥 HEALTHGUARD AI SYSTEM")
+    print("="*60)
+    processes = launch(names)
+    try:
+        code = supervise(processes)
+    finally:
+        stop(processes)
+    return code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+Request Metrics and Logging Shared by All Servers
+Thread-safe counters and histograms rendered in the Prometheus text format,
+request middleware for the Flask apps, and logging that hands records to a
+background thread so request handlers never block on stdout.
+"""
+
+import atexit
+from bisect import bisect_left
+import logging
+from logging.handlers import QueueHandler, QueueListener
+import os
+import queue
+import sys
+import threading
+import time
+
+# Log level for every server (DEBUG shows one line per query)
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Histogram bucket upper bounds
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=""):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """Monotonic count per label combination"""
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {value}" for key, value in items]
+
+
+class Histogram:
+    """Bucketed observations per label combination, plus their sum and count"""
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # label values -> [per-bucket counts (last is +Inf), sum, count]
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        slot = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][slot] += 1
+            state[1] += value
+            state[2] += 1
+
+    def time(self, **labels):
+        """Context manager observing the seconds spent inside it"""
+        return _Timer(self, labels)
+
+    def render(self):
+        with self._lock:
+            items = sorted((key, (list(state[0]), state[1], state[2])) for key, state in self._values.items())
+        lines = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{float(bound)!r}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {total}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class _Timer:
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.started, **self.labels)
+
+
+class Gauge:
+    """Value read from a callback each time metrics are rendered"""
+    kind = "gauge"
+
+    def __init__(self, name, documentation, callback):
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+
+    def render(self):
+        return [f"{self.name} {self.callback()}"]
+
+
+class Registry:
+    """Named metrics rendered together on /metrics"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                # Re-registering (e.g. a module imported twice) reuses the metric
+                if existing.kind != metric.kind:
+                    raise ValueError(f"Metric {metric.name} already registered as a {existing.kind}")
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge(self, name, documentation, callback):
+        """Register a callback gauge; a later registration replaces the callback"""
+        gauge = self._register(Gauge(name, documentation, callback))
+        gauge.callback = callback
+        return gauge
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# Process-wide registry; each server labels its samples with its service name
+REGISTRY = Registry()
+
+HTTP_REQUESTS = REGISTRY.counter(
+    'http_requests_total', 'HTTP requests handled', ('service', 'method', 'endpoint', 'status'))
+HTTP_LATENCY = REGISTRY.histogram(
+    'http_request_duration_seconds', 'Time from request start to response (first byte for streams)',
+    ('service', 'method', 'endpoint'))
+HTTP_REQUEST_SIZE = REGISTRY.histogram(
+    'http_request_size_bytes', 'Request body sizes', ('service', 'endpoint'), SIZE_BUCKETS)
+HTTP_RESPONSE_SIZE = REGISTRY.histogram(
+    'http_response_size_bytes', 'Response body sizes (streamed bodies are not counted)',
+    ('service', 'endpoint'), SIZE_BUCKETS)
+
+
+def observe_request(service, method, endpoint, status, seconds, request_bytes=0, response_bytes=None):
+    """Record one handled request"""
+    HTTP_REQUESTS.inc(service=service, method=method, endpoint=endpoint, status=str(status))
+    HTTP_LATENCY.observe(seconds, service=service, method=method, endpoint=endpoint)
+    HTTP_REQUEST_SIZE.observe(request_bytes or 0, service=service, endpoint=endpoint)
+    if response_bytes is not None:
+        HTTP_RESPONSE_SIZE.observe(response_bytes, service=service, endpoint=endpoint)
+
+
+def instrument_flask(app, service):
+    """Time every request of a Flask app and serve GET /metrics"""
+    from flask import Response, g, request
+
+    @app.before_request
+    def start_request_timer():
+        g.metrics_started = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        started = g.pop('metrics_started', None)
+        if started is not None:
+            # Route templates keep the endpoint label bounded (no raw ids)
+            endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+            observe_request(service, request.method, endpoint, response.status_code,
+                            time.perf_counter() - started, request.content_length, response.content_length)
+        return response
+
+    def metrics():
+        return Response(REGISTRY.render(), content_type=PROMETHEUS_CONTENT_TYPE)
+
+    app.add_url_rule('/metrics', 'metrics', metrics, methods=['GET'])
+
+
+_log_listener = None
+_log_lock = threading.Lock()
+
+
+def configure_logging(name):
+    """Logger whose records are written to stdout by a background thread"""
+    global _log_listener
+    with _log_lock:
+        if _log_listener is None:
+            records = queue.SimpleQueue()
+            output = logging.StreamHandler(sys.stdout)
+            output.setFormatter(logging.Formatter('%(asctime)s %(levelname)s [%(name)s] %(message)s'))
+            _log_listener = QueueListener(records, output, respect_handler_level=True)
+            _log_listener.start()
+            # Flush anything still queued when the process exits
+            atexit.register(_stop_log_listener)
+
+            root = logging.getLogger()
+            root.handlers = [QueueHandler(records)]
+            root.setLevel(LOG_LEVEL)
+    return logging.getLogger(name)
+
+
+def _stop_log_listener():
+    if _log_listener is not None:
+        _log_listener.stop()
+
+
+def _restart_log_listener():
+    """Threads don't survive fork; give a forked worker its own writer thread"""
+    global _log_listener, _log_lock
+    _log_lock = threading.Lock()
+    if _log_listener is not None:
+        _log_listener = QueueListener(_log_listener.queue, *_log_listener.handlers, respect_handler_level=True)
+        _log_listener.start()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_restart_log_listener)
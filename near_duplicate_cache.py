@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Near-Duplicate Answer Cache for the RAG Server
+MinHash signatures over character shingles of the normalized query,
+indexed by LSH bands, so trivial variants of a cached question ("whats
+my deductible", "what is the deductible?") reuse its answer without
+being scored again. Callers can pass the terms a question is scored on;
+an answer is then only reused by a question with the same terms.
+"""
+
+from collections import OrderedDict
+import itertools
+import threading
+import time
+
+import numpy as np
+
+_SHIFT = np.uint64(32)
+
+
+def shingles(text, size=3):
+    """Character shingles of text, padded so short queries still get some"""
+    padded = f" {text} "
+    if len(padded) <= size:
+        return {padded}
+    return {padded[i:i + size] for i in range(len(padded) - size + 1)}
+
+
+class NearDuplicateCache:
+    """Thread-safe LRU cache looked up by estimated Jaccard similarity"""
+
+    def __init__(self, max_size=4096, ttl=300.0, threshold=0.8, num_perm=64, bands=16,
+                 shingle_size=3, seed=1, clock=time.monotonic):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.max_size = max_size
+        self.ttl = ttl
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self._clock = clock
+        rng = np.random.default_rng(seed)
+        # Multiply-shift hash family: high 32 bits of (a * x + b) mod 2**64, a odd
+        self._a = rng.integers(0, 1 << 63, size=(num_perm, 1), dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self._b = rng.integers(0, 1 << 63, size=(num_perm, 1), dtype=np.uint64)
+
+        # entry id -> (expires_at, scope, signature, band keys, value, cost, terms)
+        self._entries = OrderedDict()
+        # (scope, band, band bytes) -> entry ids
+        self._buckets = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.candidates = 0
+        # Similar enough, but scored on different terms
+        self.term_mismatches = 0
+        self.saved_seconds = 0.0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def signature(self, text):
+        """MinHash signature (uint32 per permutation) of the text's shingles
+
+        Shingles go through the built-in hash, which is only stable within
+        one process; that is all an in-memory cache needs.
+        """
+        hashes = np.array([hash(shingle) & 0xFFFFFFFF for shingle in shingles(text, self.shingle_size)],
+                          dtype=np.uint64)
+        return ((self._a * hashes + self._b) >> _SHIFT).min(axis=1).astype(np.uint32)
+
+    def _band_keys(self, scope, signature):
+        data = signature.tobytes()
+        width = self.rows * signature.itemsize
+        return [(scope, band, data[band * width:(band + 1) * width]) for band in range(self.bands)]
+
+    def _remove(self, entry_id):
+        _, _, _, band_keys, _, _, _ = self._entries.pop(entry_id)
+        for band_key in band_keys:
+            bucket = self._buckets[band_key]
+            bucket.discard(entry_id)
+            if not bucket:
+                del self._buckets[band_key]
+
+    def get(self, scope, text, terms=None):
+        """Return the value cached for the most similar text in scope, or None
+
+        Only entries sharing at least one LSH band and stored with the same
+        terms are compared, and the best one must reach the similarity
+        threshold.
+        """
+        signature = self.signature(text)
+        band_keys = self._band_keys(scope, signature)
+        with self._lock:
+            candidates = set()
+            for band_key in band_keys:
+                candidates.update(self._buckets.get(band_key, ()))
+            self.candidates += len(candidates)
+
+            now = self._clock()
+            best_id, best_similarity = None, 0.0
+            mismatched = False
+            for entry_id in candidates:
+                expires_at, _, entry_signature, _, _, _, entry_terms = self._entries[entry_id]
+                if expires_at <= now:
+                    self._remove(entry_id)
+                    self.expirations += 1
+                    continue
+                similarity = float(np.count_nonzero(entry_signature == signature)) / len(signature)
+                if similarity >= self.threshold and entry_terms != terms:
+                    mismatched = True
+                    continue
+                if similarity > best_similarity:
+                    best_id, best_similarity = entry_id, similarity
+
+            if best_id is None or best_similarity < self.threshold:
+                self.misses += 1
+                self.term_mismatches += mismatched
+                return None
+            self._entries.move_to_end(best_id)
+            _, _, _, _, value, cost, _ = self._entries[best_id]
+            self.hits += 1
+            self.saved_seconds += cost
+            return value
+
+    def put(self, scope, text, value, cost=0.0, terms=None):
+        """Store a value for text; cost is the scoring time a later hit saves"""
+        if self.max_size <= 0:
+            return
+        signature = self.signature(text)
+        band_keys = self._band_keys(scope, signature)
+        with self._lock:
+            entry_id = next(self._ids)
+            self._entries[entry_id] = (self._clock() + self.ttl, scope, signature, band_keys, value, cost, terms)
+            for band_key in band_keys:
+                self._buckets.setdefault(band_key, set()).add(entry_id)
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def clear(self):
+        """Drop every entry, e.g. after the knowledge base changed"""
+        with self._lock:
+            self._entries.clear()
+            self._buckets.clear()
+            self.invalidations += 1
+
+    def stats(self):
+        """Counters for the health endpoint"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl,
+                "threshold": self.threshold,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                # Each hit is a query that skipped scoring
+                "scoring_avoided": self.hits,
+                "scoring_seconds_saved": round(self.saved_seconds, 6),
+                "candidates_per_lookup": round(self.candidates / lookups, 2) if lookups else 0.0,
+                "term_mismatches": self.term_mismatches,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations
+            }
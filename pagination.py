@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Pagination Helpers for List Endpoints
+Cursor-based pages, field filters and NDJSON streaming over a store
+whose records are only ever appended, in insertion order.
+"""
+
+import base64
+
+from fast_json import dumps
+
+DEFAULT_PAGE_LIMIT = 100
+MAX_PAGE_LIMIT = 1000
+# Records buffered per NDJSON write
+STREAM_CHUNK_RECORDS = 256
+
+
+def encode_cursor(position):
+    """Opaque cursor for the next scan position"""
+    return base64.urlsafe_b64encode(f"pos:{position}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Scan position encoded in a cursor; raises ValueError if malformed"""
+    if not cursor:
+        return 0
+    try:
+        text = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        prefix, position = text.split(":", 1)
+        position = int(position)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError("Invalid cursor") from e
+    if prefix != "pos" or position < 0:
+        raise ValueError("Invalid cursor")
+    return position
+
+
+def parse_limit(value):
+    """Page size from a query parameter; raises ValueError if out of range"""
+    if value in (None, ""):
+        return DEFAULT_PAGE_LIMIT
+    try:
+        limit = int(value)
+    except ValueError:
+        raise ValueError(f"limit must be an integer between 1 and {MAX_PAGE_LIMIT}") from None
+    if not 1 <= limit <= MAX_PAGE_LIMIT:
+        raise ValueError(f"limit must be an integer between 1 and {MAX_PAGE_LIMIT}")
+    return limit
+
+
+def parse_filters(params, allowed_fields):
+    """Pick exact-match filters from query parameters (first value wins)"""
+    filters = {}
+    for field in allowed_fields:
+        value = params.get(field)
+        if isinstance(value, list):
+            value = value[0] if value else None
+        if value not in (None, ""):
+            filters[field] = value
+    return filters
+
+
+def matches(record, filters):
+    """True when every filter equals the record's field"""
+    for field, value in filters.items():
+        if str(record.get(field, "")) != value:
+            return False
+    return True
+
+
+def paginate(keys, records, limit=DEFAULT_PAGE_LIMIT, cursor=None, filters=None):
+    """Return (page, next_cursor) scanning keys from the cursor position
+
+    keys is the store's append-only list of record ids, so positions stay
+    valid while other threads add records and a cursor seeks in O(1).
+    """
+    position = decode_cursor(cursor)
+    end = len(keys)
+    page = []
+    while position < end and len(page) < limit:
+        record = records[keys[position]]
+        position += 1
+        if not filters or matches(record, filters):
+            page.append(record)
+    return page, encode_cursor(position) if position < end else None
+
+
+def iter_records(keys, records, filters=None, cursor=None):
+    """Iterator over matching records that never copies the store
+
+    The cursor is decoded up front, so a bad cursor raises ValueError
+    before any response has been started.
+    """
+    start = decode_cursor(cursor)
+    # Stop at the size seen when the stream started, for a consistent snapshot
+    end = len(keys)
+    scanned = (records[keys[position]] for position in range(start, end))
+    return (record for record in scanned if not filters or matches(record, filters))
+
+
+def ndjson_chunks(records, chunk_records=STREAM_CHUNK_RECORDS):
+    """Encode records as newline-delimited JSON, a few hundred lines per chunk"""
+    lines = []
+    for record in records:
+        lines.append(dumps(record))
+        if len(lines) >= chunk_records:
+            yield b"\n".join(lines) + b"\n"
+            lines = []
+    if lines:
+        yield b"\n".join(lines) + b"\n"
+
+
+def wants_ndjson(params, accept_header):
+    """True when the client asked for ?format=ndjson or Accept: application/x-ndjson"""
+    requested = params.get("format")
+    if isinstance(requested, list):
+        requested = requested[0] if requested else None
+    return requested == "ndjson" or "application/x-ndjson" in (accept_header or "")
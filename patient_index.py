@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Patient Search Index for the Hospital Server
+Name tokens kept in a sorted list for prefix search and in a deletion
+index for typo-tolerant search, plus hash indexes on date of birth, email
+and insurance policy number. Updated one patient at a time as patients
+are registered, so a search never scans the patient store.
+"""
+
+from bisect import bisect_left, insort
+from datetime import datetime
+import re
+import threading
+import unicodedata
+
+from fuzzy_index import DeletionIndex
+
+# Fields searched as whole values through hash indexes
+HASHED_FIELDS = ('date_of_birth', 'email', 'insurance_policy_number')
+NAME_FIELDS = ('first_name', 'last_name')
+# Query tokens shorter than this are matched by prefix only; typos in
+# one- or two-letter fragments would match almost every name
+FUZZY_MIN_LENGTH = 4
+# Typos tolerated per query token
+FUZZY_MAX_DISTANCE = 2
+
+_TOKEN = re.compile(r"[^\W_]+")
+_DATE_FORMATS = ('%Y-%m-%d', '%m/%d/%Y', '%d.%m.%Y', '%Y%m%d')
+
+
+def name_tokens(text):
+    """Lowercase, accent-free word tokens of a name ('García-López' -> garcia, lopez)"""
+    text = unicodedata.normalize('NFKD', str(text or '')).casefold()
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return _TOKEN.findall(text)
+
+
+def normalize_date(value):
+    """ISO date for the formats front desks type, else the stripped input"""
+    value = str(value or '').strip()
+    for date_format in _DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format).date().isoformat()
+        except ValueError:
+            continue
+    return value
+
+
+NORMALIZERS = {
+    'date_of_birth': normalize_date,
+    'email': lambda value: str(value or '').strip().lower(),
+    'insurance_policy_number': lambda value: str(value or '').strip().upper(),
+}
+
+
+class PatientIndex:
+    """Thread-safe search indexes over patient records, keyed by patient_id"""
+
+    def __init__(self, fuzzy_max_distance=FUZZY_MAX_DISTANCE):
+        # name token -> patient ids
+        self._names = {}
+        # Distinct name tokens, sorted, for prefix ranges
+        self._sorted_names = []
+        self._fuzzy = DeletionIndex(max_distance=fuzzy_max_distance)
+        # field -> normalized value -> patient ids
+        self._hashes = {field: {} for field in HASHED_FIELDS}
+        # patient id -> (name tokens, normalized HASHED_FIELDS values) as indexed
+        self._entries = {}
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, patient):
+        """Index a patient, replacing what was indexed for the same patient_id"""
+        patient_id = patient['patient_id']
+        tokens = tuple(dict.fromkeys(token for field in NAME_FIELDS for token in name_tokens(patient.get(field))))
+        values = tuple(NORMALIZERS[field](patient.get(field)) for field in HASHED_FIELDS)
+        with self._lock:
+            if patient_id in self._entries:
+                self._remove(patient_id)
+            self._entries[patient_id] = (tokens, values)
+            for token in tokens:
+                ids = self._names.get(token)
+                if ids is None:
+                    ids = self._names[token] = []
+                    insort(self._sorted_names, token)
+                    self._fuzzy.add(token)
+                ids.append(patient_id)
+            for field, value in zip(HASHED_FIELDS, values):
+                if value:
+                    self._hashes[field].setdefault(value, []).append(patient_id)
+
+    def update(self, patients):
+        """Index every patient in an iterable"""
+        for patient in patients:
+            self.add(patient)
+
+    def _remove(self, patient_id):
+        tokens, values = self._entries.pop(patient_id)
+        for token in tokens:
+            ids = self._names[token]
+            ids.remove(patient_id)
+            if not ids:
+                del self._names[token]
+                del self._sorted_names[bisect_left(self._sorted_names, token)]
+                self._fuzzy.remove(token)
+        for field, value in zip(HASHED_FIELDS, values):
+            ids = self._hashes[field].get(value)
+            if ids and patient_id in ids:
+                ids.remove(patient_id)
+                if not ids:
+                    del self._hashes[field][value]
+
+    def remove(self, patient_id):
+        with self._lock:
+            if patient_id in self._entries:
+                self._remove(patient_id)
+
+    def _prefixed(self, prefix):
+        """Indexed name tokens starting with prefix, in sorted order"""
+        names = self._sorted_names
+        position = bisect_left(names, prefix)
+        while position < len(names) and names[position].startswith(prefix):
+            yield names[position]
+            position += 1
+
+    def token_matches(self, token, fuzzy=True):
+        """{name token: rank} a query token matches: 0 exact, 1 prefix, 1 + distance for typos
+
+        Typos are only looked for when the token is not a known name, and
+        at one edit before two, since most misspellings are a single edit.
+        """
+        matches = {token: 0} if token in self._names else {}
+        for name in self._prefixed(token):
+            matches.setdefault(name, 1)
+        if fuzzy and token not in self._names and len(token) >= FUZZY_MIN_LENGTH:
+            found = []
+            for max_distance in range(1, self._fuzzy.max_distance + 1):
+                found = self._fuzzy.lookup(token, max_distance)
+                if found:
+                    break
+            for name, distance, _ in found:
+                matches.setdefault(name, 1 + distance)
+        return matches
+
+    def search(self, text=None, filters=None, fuzzy=True, limit=20):
+        """(patient ids, truncated) matching every name token in text and every filter
+
+        Exact-value filters (date_of_birth, email, insurance_policy_number)
+        narrow the candidates first. Name tokens are matched exactly, by
+        prefix or within FUZZY_MAX_DISTANCE typos; results come back best
+        rank first and stop at limit.
+        """
+        filters = filters or {}
+        query_tokens = list(dict.fromkeys(name_tokens(text)))
+        for field in NAME_FIELDS:
+            query_tokens.extend(token for token in name_tokens(filters.get(field)) if token not in query_tokens)
+        with self._lock:
+            candidates = None
+            for field in HASHED_FIELDS:
+                if filters.get(field):
+                    ids = self._hashes[field].get(NORMALIZERS[field](filters[field]), ())
+                    candidates = set(ids) if candidates is None else candidates.intersection(ids)
+            if not query_tokens:
+                if candidates is None:
+                    return [], False
+                ordered = sorted(candidates)
+                return ordered[:limit], len(ordered) > limit
+
+            token_matches = [self.token_matches(token, fuzzy) for token in query_tokens]
+            if not all(token_matches):
+                return [], False
+            if candidates is not None:
+                return self._rank(candidates, token_matches, limit)
+
+            # Walk the query token with the fewest matching patients, best
+            # names first, checking each patient against the other tokens
+            sizes = [sum(len(self._names[name]) for name in matches) for matches in token_matches]
+            driver = sizes.index(min(sizes))
+            others = token_matches[:driver] + token_matches[driver + 1:]
+            results = []
+            seen = set()
+            for name, rank in sorted(token_matches[driver].items(), key=lambda item: (item[1], item[0])):
+                for patient_id in self._names[name]:
+                    if patient_id in seen:
+                        continue
+                    seen.add(patient_id)
+                    score = self._score(patient_id, others)
+                    if score is not None:
+                        results.append(patient_id)
+                        if len(results) > limit:
+                            return results[:limit], True
+            return results, False
+
+    def _score(self, patient_id, token_matches):
+        """Summed rank of the patient's best name for each query token, or None if one has none"""
+        tokens = self._entries[patient_id][0]
+        total = 0
+        for matches in token_matches:
+            best = min((matches[token] for token in tokens if token in matches), default=None)
+            if best is None:
+                return None
+            total += best
+        return total
+
+    def _rank(self, candidates, token_matches, limit):
+        scored = []
+        for patient_id in candidates:
+            score = self._score(patient_id, token_matches)
+            if score is not None:
+                scored.append((score, patient_id))
+        scored.sort()
+        return [patient_id for _, patient_id in scored[:limit]], len(scored) > limit
+
+    def stats(self):
+        with self._lock:
+            return {
+                "patients": len(self._entries),
+                "name_tokens": len(self._sorted_names),
+                "fuzzy": self._fuzzy.stats(),
+                **{f"{field}_values": len(self._hashes[field]) for field in HASHED_FIELDS}
+            }
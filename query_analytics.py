@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Query Analytics for the RAG Server
+Counts the questions that fell back to customer service or were answered
+with low confidence, and which topics answered the rest, over a sliding
+time window. Each time slot keeps Space-Saving summaries of a fixed size,
+so memory stays the same however much traffic there is and recording a
+query is a few dict operations.
+"""
+
+from collections import deque
+import math
+import threading
+import time
+
+# Longest normalized query stored; longer ones are truncated
+MAX_QUERY_CHARS = 120
+
+
+class SpaceSaving:
+    """Approximate counts of the most frequent items of a stream, holding at most capacity items
+
+    When full, a new item replaces one with the smallest count and
+    inherits that count as its possible overcount (error), so every
+    item's true count is between count - error and count.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        # item -> [count, error]
+        self._entries = {}
+        # count -> items with that count, oldest first
+        self._buckets = {}
+        self._min = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, item):
+        entry = self._entries.get(item)
+        if entry is not None:
+            count = entry[0]
+            bucket = self._buckets[count]
+            del bucket[item]
+            if not bucket:
+                del self._buckets[count]
+                if count == self._min:
+                    self._min = count + 1
+            entry[0] = count + 1
+            self._buckets.setdefault(count + 1, {})[item] = None
+            return
+        if len(self._entries) < self.capacity:
+            self._entries[item] = [1, 0]
+            self._buckets.setdefault(1, {})[item] = None
+            self._min = 1
+            return
+        # Replace the oldest item with the smallest count
+        count = self._min
+        bucket = self._buckets[count]
+        victim = next(iter(bucket))
+        del bucket[victim]
+        del self._entries[victim]
+        if not bucket:
+            del self._buckets[count]
+            self._min = count + 1
+        self._entries[item] = [count + 1, count]
+        self._buckets.setdefault(count + 1, {})[item] = None
+
+    def items(self):
+        """{item: (count, error)}"""
+        return {item: tuple(entry) for item, entry in self._entries.items()}
+
+
+class _Slot:
+    __slots__ = ("index", "counts", "unmatched", "low_confidence", "topics")
+
+    def __init__(self, index, capacity):
+        self.index = index
+        # Exact number of queries, unmatched and low-confidence answers
+        self.counts = [0, 0, 0]
+        self.unmatched = SpaceSaving(capacity)
+        self.low_confidence = SpaceSaving(capacity)
+        self.topics = SpaceSaving(capacity)
+
+
+def _merge(summaries, limit, label):
+    """Top items of several summaries, counts and errors summed"""
+    totals = {}
+    for summary in summaries:
+        for item, (count, error) in summary.items().items():
+            total = totals.get(item)
+            totals[item] = (count, error) if total is None else (total[0] + count, total[1] + error)
+    ranked = sorted(totals.items(), key=lambda entry: (-entry[1][0], entry[0]))[:limit]
+    return [{label: item, "count": count, "error": error} for item, (count, error) in ranked]
+
+
+class QueryAnalytics:
+    """Thread-safe sliding-window heavy hitters over answered RAG queries"""
+
+    def __init__(self, capacity=1000, slot_seconds=300, slots=12, low_confidence=0.4, clock=time.monotonic):
+        self.capacity = capacity
+        self.slot_seconds = slot_seconds
+        self.slots = slots
+        # Matched answers below this confidence are sent to customer service
+        self.low_confidence = low_confidence
+        self._clock = clock
+        self._slots = deque()
+        self._lock = threading.Lock()
+        # Exact totals since start
+        self._totals = [0, 0, 0]
+
+    def _current(self, now):
+        """The slot for now, dropping slots that have left the window"""
+        index = int(now // self.slot_seconds)
+        slots = self._slots
+        if not slots or slots[-1].index != index:
+            slots.append(_Slot(index, self.capacity))
+        while slots[0].index <= index - self.slots:
+            slots.popleft()
+        return slots[-1]
+
+    def record(self, queries, results):
+        """Count answered queries (normalized text) with their results
+
+        Queries that normalize to nothing ("??") say nothing about the
+        knowledge base and are not counted.
+        """
+        with self._lock:
+            slot = self._current(self._clock())
+            recorded = unmatched = low_confidence = 0
+            for query, result in zip(queries, results):
+                if not query:
+                    continue
+                recorded += 1
+                if not result["matched"]:
+                    slot.unmatched.add(query[:MAX_QUERY_CHARS])
+                    unmatched += 1
+                    continue
+                if result["confidence"] < self.low_confidence:
+                    slot.low_confidence.add(query[:MAX_QUERY_CHARS])
+                    low_confidence += 1
+                slot.topics.add(result["topics"][0]["topic"])
+            for counts in (slot.counts, self._totals):
+                counts[0] += recorded
+                counts[1] += unmatched
+                counts[2] += low_confidence
+
+    def report(self, window=None, limit=20):
+        """Top unmatched and low-confidence queries and top topics over the last window seconds
+
+        window is rounded up to whole slots and capped at the tracked span.
+        Counts may overstate an item by at most its error.
+        """
+        span = self.slot_seconds * self.slots
+        window = span if window is None else min(max(window, self.slot_seconds), span)
+        with self._lock:
+            now = self._clock()
+            first = self._current(now).index - math.ceil(window / self.slot_seconds) + 1
+            slots = [slot for slot in self._slots if slot.index >= first]
+            queries, unmatched, low_confidence = (sum(counts) for counts in zip(*(slot.counts for slot in slots)))
+            return {
+                "window_seconds": window,
+                "queries": queries,
+                "unmatched": unmatched,
+                "low_confidence": low_confidence,
+                "top_unmatched": _merge([slot.unmatched for slot in slots], limit, "query"),
+                "top_low_confidence": _merge([slot.low_confidence for slot in slots], limit, "query"),
+                "top_topics": _merge([slot.topics for slot in slots], limit, "topic")
+            }
+
+    def stats(self):
+        with self._lock:
+            return {
+                "queries": self._totals[0],
+                "unmatched": self._totals[1],
+                "low_confidence": self._totals[2],
+                "tracked_seconds": self.slot_seconds * self.slots,
+                "slot_seconds": self.slot_seconds,
+                "capacity": self.capacity
+            }
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Query Spelling Correction for the RAG Server
+Maps misspelled query words onto the knowledge base keyword vocabulary
+through a deletion index (fuzzy_index.py), so "deductable" is scored as
+"deductible" instead of falling through to customer service. Correcting
+a word costs a few dozen dict lookups, however large the vocabulary.
+"""
+
+import re
+
+from fuzzy_index import DeletionIndex
+
+_WORD = re.compile(r"[^\W\d_]+")
+# Shorter words are left alone; one typo in three letters is another word
+MIN_LENGTH = 4
+# Words this long may be corrected by two edits, shorter ones by one
+LONG_WORD_LENGTH = 8
+
+# Everyday words members use that are one or two edits from a keyword
+# ("bills" / "pills", "denial" / "dental"); never corrected
+COMMON_WORDS = frozenset("""
+    able about above account accept accepted access accident across action actually address admin after again
+    against agent allow allowed almost alone along already also although always amount answer anyone anything
+    apply appeal appeals appealed approve approved april area around arrive asked assist august available away
+    back balance bank because become been before begin behind being believe below best better between bill
+    billed billing bills birth book both bring brother business call called calling calls came cancel canceled
+    cancelled card cards care case cases cash cause change changed charge charged charges check checked checks
+    child children choose city claim claimed claims clear close code come comes coming company complain
+    complaint confirm contact continue copy correct cost costs could country couple cover credit current daily
+    date daughter days dead deal dear death debit december decide decision deny denial denied denies department
+    describe detail details didn different dispute disputed disputes doing done down drive during each early
+    easy either else email employer ending enough enroll enrolled enter error even evening event ever every
+    everyone everything example explain fact family father february feel fill filed filing final find fine
+    first five form forms found four free friday friend from full fund funds gave give given glad going gone
+    good great group guess half hand happen happened hard have help here high hold holiday home hope hour hours
+    house husband idea important incorrect information instead into issue issues itself january july june just
+    keep kind knew know known last late later least leave left less letter letters like limit line list
+    little live long look looking lost made mail mailed make many march mark matter mean meet member members
+    message might mind mine miss missing monday money month monthly months more morning most mother move much
+    must name near need needed needs never news next nice night none note nothing notice november number
+    numbers october office often okay once online only open order other otherwise over owed owes page paid
+    paper part pass past payment payments people person phone pill pills place please point portal post
+    price print probably problem problems process proof provide pull question questions quick quite rate
+    rather read ready real really reason receipt receive received recent record refund refunds remember
+    reply report request require reset rest result return right said same saturday saying school second
+    seen self send sending sent september service services shall short should show sign since single sister
+    some someone something soon sorry sound speak start state statement status still stop such sunday sure
+    take taken talk tell than thank thanks that their them then there these they thing things think this
+    those though three through thursday till time times today told tomorrow took total tuesday turn under
+    until update upon used user using very wait want wanted warning week weekly weeks well went were what
+    when where whether which while whole whom whose wife will wish with within without word work would
+    write wrong year years yesterday your yours
+""".split())
+
+
+def words(text):
+    """Lowercase alphabetic words of a text"""
+    return _WORD.findall(text.lower())
+
+
+class SpellingCorrector:
+    """Corrects query words against a vocabulary, leaving words known to be spelled right alone"""
+
+    def __init__(self, vocabulary, known_words=()):
+        # Correction targets, with how many topics use each word
+        self.index = DeletionIndex(max_distance=2)
+        for word, count in vocabulary.items():
+            self.index.add(word, count)
+        # Words never corrected: the vocabulary plus other correctly spelled
+        # words ("physician" is not a typo of "physical")
+        self.known = set(known_words)
+        self.known.update(vocabulary)
+
+    @classmethod
+    def from_index(cls, index, known):
+        """Wrap a prebuilt deletion index and known-word set (e.g. views of a compiled index)
+
+        known only needs `in` and len().
+        """
+        corrector = cls.__new__(cls)
+        corrector.index = index
+        corrector.known = known
+        return corrector
+
+    @classmethod
+    def from_knowledge(cls, knowledge):
+        """Vocabulary from every topic's keywords, known words from their responses"""
+        vocabulary = {}
+        known = set()
+        for topic in knowledge.values():
+            for word in set(word for keyword in topic["keywords"] for word in words(keyword)):
+                vocabulary[word] = vocabulary.get(word, 0) + 1
+            known.update(words(topic["response"]))
+        return cls(vocabulary, known)
+
+    def correct_word(self, word):
+        """Closest, most common vocabulary word within the allowed edits, else word itself"""
+        if len(word) < MIN_LENGTH or word in self.known or word in COMMON_WORDS:
+            return word
+        max_distance = 2 if len(word) >= LONG_WORD_LENGTH else 1
+        # Most typos are one edit; only look further when that finds nothing
+        for distance in range(1, max_distance + 1):
+            found = self.index.lookup(word, distance, limit=1)
+            if found:
+                return found[0][0]
+        return word
+
+    def correct(self, text):
+        """text with every misspelled word replaced by its correction"""
+        return _WORD.sub(lambda match: self.correct_word(match.group().lower()), text)
+
+    def stats(self):
+        return {**self.index.stats(), "known_words": len(self.known)}
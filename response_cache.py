@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Response Cache for the RAG Server
+Bounded LRU cache with a TTL, keyed on a normalized form of the query.
+"""
+
+from collections import OrderedDict
+import re
+import threading
+import time
+
+# Same filler words the original matcher stripped from queries
+FILLER_WORDS = re.compile(r'\b(what|how|is|are|my|the|a|an|about|tell|me|coverage|for|much)\b')
+# Keep '%' and '-' because knowledge base keywords use them ("100%", "out-of-pocket")
+PUNCTUATION = re.compile(r"[^\w\s%-]+")
+# "what's" -> "what", "member's" -> "member"
+POSSESSIVE = re.compile(r"'s\b")
+WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(query):
+    """Lowercase, drop punctuation and filler words, collapse whitespace"""
+    text = PUNCTUATION.sub(' ', POSSESSIVE.sub('', query.lower()).replace("'", ""))
+    stripped = WHITESPACE.sub(' ', FILLER_WORDS.sub(' ', text)).strip()
+    # A query made only of filler words keeps them rather than becoming empty
+    return stripped or WHITESPACE.sub(' ', text).strip()
+
+
+class ResponseCache:
+    """Thread-safe LRU cache whose entries expire after ttl seconds"""
+
+    def __init__(self, max_size=1024, ttl=300.0, clock=time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        """Return the cached value or None, refreshing its LRU position"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at <= self._clock():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """Store a value, evicting the least recently used entries when full"""
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (self._clock() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Drop every entry, e.g. after the knowledge base changed"""
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+
+    def stats(self):
+        """Counters for the health endpoint"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations
+            }
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Record Storage for the Hospital and Insurance Servers
+Dict-like collections backed by process memory (default) or by a shared
+SQLite database in WAL mode, selected with STORAGE_BACKEND.
+"""
+
+from bisect import insort
+import json
+import os
+import sqlite3
+import threading
+
+from pagination import decode_cursor, encode_cursor, iter_records, paginate
+
+# "memory" keeps records in per-process dicts, "sqlite" shares them across workers
+STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'memory').lower()
+STORAGE_PATH = os.environ.get('STORAGE_PATH', 'healthguard.db')
+
+# Record fields copied into their own indexed SQLite columns
+INDEXED_FIELDS = ('patient_id', 'policy_number', 'status')
+# High-cardinality fields the in-memory backend keeps hash indexes for;
+# low-cardinality filters like status find a page quickly by scanning
+MEMORY_INDEXED_FIELDS = ('patient_id', 'policy_number')
+# Rows fetched per query while streaming a SQLite collection
+STREAM_BATCH_ROWS = 500
+
+
+class MemoryCollection:
+    """Thread-safe dict of records that remembers insertion order"""
+
+    def __init__(self, name):
+        self.name = name
+        self._records = {}
+        # Append-only ids in insertion order, used by cursors to seek in O(1)
+        self._ids = []
+        # id -> its position in _ids
+        self._positions = {}
+        # field -> value -> ids in insertion order
+        self._indexes = {field: {} for field in MEMORY_INDEXED_FIELDS}
+        self._lock = threading.Lock()
+
+    def __setitem__(self, record_id, record):
+        with self._lock:
+            previous = self._records.get(record_id)
+            if previous is None:
+                self._positions[record_id] = len(self._ids)
+                self._ids.append(record_id)
+            for field, index in self._indexes.items():
+                old_value = previous.get(field) if previous is not None else None
+                new_value = record.get(field)
+                if previous is not None and old_value == new_value:
+                    continue
+                if old_value is not None and record_id in index.get(str(old_value), ()):
+                    index[str(old_value)].remove(record_id)
+                if new_value is not None:
+                    # A rewritten record keeps its original place, as it does in SQLite
+                    insort(index.setdefault(str(new_value), []), record_id, key=self._positions.__getitem__)
+            self._records[record_id] = record
+
+    def update(self, records):
+        """Store every (record_id, record) pair of a mapping"""
+        for record_id, record in records.items():
+            self[record_id] = record
+
+    def _scan_ids(self, filters):
+        """Smallest id list that can contain every match"""
+        for field in MEMORY_INDEXED_FIELDS:
+            if filters and field in filters:
+                return self._indexes[field].get(filters[field], [])
+        return self._ids
+
+    def __getitem__(self, record_id):
+        return self._records[record_id]
+
+    def __contains__(self, record_id):
+        return record_id in self._records
+
+    def __len__(self):
+        return len(self._records)
+
+    def get(self, record_id, default=None):
+        return self._records.get(record_id, default)
+
+    def values(self):
+        return self.iter_records()
+
+    def page(self, limit, cursor=None, filters=None):
+        """Return (records, next_cursor) for one page"""
+        return paginate(self._scan_ids(filters), self._records, limit, cursor, filters)
+
+    def iter_records(self, filters=None, cursor=None):
+        """Iterate matching records without copying the collection"""
+        return iter_records(self._scan_ids(filters), self._records, filters, cursor)
+
+
+class SQLiteCollection:
+    """Records stored as JSON in a SQLite table with indexed lookup columns"""
+
+    def __init__(self, name, path=STORAGE_PATH):
+        self.name = name
+        self.path = path
+        self._local = threading.local()
+
+        # Statement text is built once so sqlite3's per-connection
+        # statement cache reuses the prepared statements
+        columns = ', '.join(INDEXED_FIELDS)
+        self._upsert_sql = (
+            f"INSERT INTO {name} (id, {columns}, data) VALUES (?, {', '.join('?' * len(INDEXED_FIELDS))}, ?) "
+            f"ON CONFLICT(id) DO UPDATE SET "
+            + ', '.join(f"{field} = excluded.{field}" for field in INDEXED_FIELDS)
+            + ", data = excluded.data"
+        )
+        self._get_sql = f"SELECT data FROM {name} WHERE id = ?"
+        self._exists_sql = f"SELECT 1 FROM {name} WHERE id = ?"
+        self._count_sql = f"SELECT COUNT(*) FROM {name}"
+
+        connection = self._connection()
+        connection.execute(
+            f"CREATE TABLE IF NOT EXISTS {name} ("
+            f"seq INTEGER PRIMARY KEY AUTOINCREMENT, id TEXT NOT NULL UNIQUE, "
+            + ', '.join(f"{field} TEXT" for field in INDEXED_FIELDS)
+            + ", data TEXT NOT NULL)"
+        )
+        for field in INDEXED_FIELDS:
+            connection.execute(f"CREATE INDEX IF NOT EXISTS idx_{name}_{field} ON {name} ({field}, seq)")
+
+    def _connection(self):
+        """One connection per worker thread, reopened after a fork"""
+        local = self._local
+        if getattr(local, 'connection', None) is None or local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, isolation_level=None, cached_statements=256)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute("PRAGMA busy_timeout=5000")
+            local.connection = connection
+            local.pid = os.getpid()
+        return local.connection
+
+    def __setitem__(self, record_id, record):
+        values = [record.get(field) for field in INDEXED_FIELDS]
+        self._connection().execute(self._upsert_sql, [record_id, *values, json.dumps(record)])
+
+    def update(self, records):
+        """Store every (record_id, record) pair of a mapping in one transaction"""
+        rows = [[record_id, *(record.get(field) for field in INDEXED_FIELDS), json.dumps(record)]
+                for record_id, record in records.items()]
+        if not rows:
+            return
+        connection = self._connection()
+        connection.execute("BEGIN")
+        try:
+            connection.executemany(self._upsert_sql, rows)
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+
+    def __getitem__(self, record_id):
+        row = self._connection().execute(self._get_sql, (record_id,)).fetchone()
+        if row is None:
+            raise KeyError(record_id)
+        return json.loads(row[0])
+
+    def __contains__(self, record_id):
+        return self._connection().execute(self._exists_sql, (record_id,)).fetchone() is not None
+
+    def __len__(self):
+        return self._connection().execute(self._count_sql).fetchone()[0]
+
+    def get(self, record_id, default=None):
+        try:
+            return self[record_id]
+        except KeyError:
+            return default
+
+    def values(self):
+        return self.iter_records()
+
+    def _select(self, after_seq, limit, filters):
+        """Rows with seq > after_seq matching the filters, oldest first"""
+        clauses = ["seq > ?"]
+        params = [after_seq]
+        for field, value in (filters or {}).items():
+            if field in INDEXED_FIELDS:
+                clauses.append(f"{field} = ?")
+            else:
+                clauses.append(f"CAST(json_extract(data, '$.{field}') AS TEXT) = ?")
+            params.append(value)
+        params.append(limit)
+        sql = f"SELECT seq, data FROM {self.name} WHERE {' AND '.join(clauses)} ORDER BY seq LIMIT ?"
+        return self._connection().execute(sql, params).fetchall()
+
+    def page(self, limit, cursor=None, filters=None):
+        """Return (records, next_cursor) for one page"""
+        rows = self._select(decode_cursor(cursor), limit + 1, filters)
+        records = [json.loads(data) for _, data in rows[:limit]]
+        next_cursor = encode_cursor(rows[limit - 1][0]) if len(rows) > limit else None
+        return records, next_cursor
+
+    def iter_records(self, filters=None, cursor=None):
+        """Iterate matching records in batches so memory stays flat"""
+        after_seq = decode_cursor(cursor)
+
+        def generate(after_seq):
+            while True:
+                rows = self._select(after_seq, STREAM_BATCH_ROWS, filters)
+                for _, data in rows:
+                    yield json.loads(data)
+                if len(rows) < STREAM_BATCH_ROWS:
+                    return
+                after_seq = rows[-1][0]
+
+        return generate(after_seq)
+
+
+def open_collection(namespace, name, backend=None, path=None):
+    """Open the '<namespace>_<name>' collection on the configured backend"""
+    backend = (backend or STORAGE_BACKEND).lower()
+    table = f"{namespace}_{name}"
+    if backend == 'memory':
+        return MemoryCollection(table)
+    if backend == 'sqlite':
+        return SQLiteCollection(table, path or STORAGE_PATH)
+    raise ValueError(f"STORAGE_BACKEND must be 'memory' or 'sqlite', got {backend!r}")
@@ -0,0 +1,100 @@
+"""Deductible, out-of-pocket and exclusion arithmetic of the adjudication engine"""
+
+import random
+
+import pytest
+
+from adjudication import AdjudicationEngine
+from storage import open_collection
+
+POLICY = {
+    "policy_id": "POL-1", "policy_number": "PN-1", "patient_id": "PAT-1",
+    "deductible": 1000, "out_of_pocket_max": 3000,
+    "coverage_details": {"preventive_care": 100, "emergency": 80, "specialist": 70, "dental": 0},
+}
+
+# Fields that differ between two assessments of the same claim
+VOLATILE = ("assessment_id", "assessed_at")
+
+
+def engine_with(*policies, store=None):
+    engine = AdjudicationEngine(accumulator_store=store)
+    for policy in policies:
+        engine.register_policy(policy)
+    return engine
+
+
+def claim(amount, service="emergency", policy_number="PN-1", patient_id="PAT-1"):
+    return {"policy_number": policy_number, "patient_id": patient_id, "service": service, "total_amount": amount}
+
+
+def money(assessment):
+    return (assessment["deductible_applied"], assessment["covered_amount"], assessment["patient_responsibility"])
+
+
+def test_deductible_is_met_across_claims():
+    engine = engine_with(POLICY)
+    assert money(engine.assess(claim(600))) == (600, 0, 600)
+    # 400 of the deductible left, then 80% of the remaining 600
+    assert money(engine.assess(claim(1000))) == (400, 480, 520)
+    assert money(engine.assess(claim(100))) == (0, 80, 20)
+    assert engine.coverage("emergency", "PN-1")["deductible_remaining"] == 0
+
+
+def test_preventive_care_skips_the_deductible():
+    engine = engine_with(POLICY)
+    assert money(engine.assess(claim(250, "preventive"))) == (0, 250, 0)
+    assert engine.coverage("emergency", "PN-1")["deductible_remaining"] == 1000
+
+
+def test_out_of_pocket_maximum_caps_responsibility():
+    engine = engine_with(POLICY)
+    # 1000 deductible + 20% of 15000 = 4000, capped at 3000
+    assert money(engine.assess(claim(16000))) == (1000, 13000, 3000)
+    assert money(engine.assess(claim(500))) == (0, 500, 0)
+    assert engine.coverage("emergency", "PN-1")["out_of_pocket_remaining"] == 0
+
+
+def test_excluded_services_are_denied_and_count_toward_nothing():
+    engine = engine_with(POLICY)
+    assessment = engine.assess(claim(800, "dental"))
+    assert assessment["status"] == "denied"
+    assert money(assessment) == (0, 0, 800)
+    coverage = engine.coverage("emergency", "PN-1")
+    assert (coverage["deductible_remaining"], coverage["out_of_pocket_remaining"]) == (1000, 3000)
+
+
+def test_unknown_policy_is_denied():
+    assessment = engine_with(POLICY).assess(claim(100, policy_number="PN-404"))
+    assert assessment["status"] == "denied"
+    assert assessment["reason"] == "Policy not found"
+
+
+def test_members_sharing_a_policy_have_their_own_totals():
+    engine = engine_with(POLICY)
+    engine.assess(claim(1000, patient_id="PAT-1"))
+    assert money(engine.assess(claim(1000, patient_id="PAT-2"))) == (1000, 0, 1000)
+
+
+def test_batch_matches_one_claim_at_a_time():
+    rng = random.Random(10)
+    policies = [dict(POLICY, policy_id=f"POL-{i}", policy_number=f"PN-{i}", deductible=rng.choice([0, 500, 1500]),
+                     out_of_pocket_max=rng.choice([1000, 2500, None])) for i in range(3)]
+    claims = [claim(round(rng.uniform(0, 5000), 2), rng.choice(["emergency", "specialist", "dental", "preventive",
+                                                                "surgery"]),
+                    f"PN-{rng.randrange(4)}", f"PAT-{rng.randrange(2)}")
+              for _ in range(300)]
+    batch = engine_with(*policies).assess_batch(claims)
+    single = engine_with(*policies)
+    for together, alone in zip(batch, (single.assess(c) for c in claims)):
+        assert {k: v for k, v in together.items() if k not in VOLATILE} == \
+            pytest.approx({k: v for k, v in alone.items() if k not in VOLATILE})
+
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_accumulators_survive_a_restart(backend, tmp_path):
+    store = open_collection("insurance", "accumulators", backend, str(tmp_path / "accumulators.db"))
+    engine_with(POLICY, store=store).assess(claim(600))
+    restarted = engine_with(POLICY, store=store)
+    assert money(restarted.assess(claim(1000))) == (400, 480, 520)
+    assert len(store) == 1
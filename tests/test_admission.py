@@ -0,0 +1,176 @@
+"""Token buckets, the admission controller, and how requests are timed from arrival"""
+
+import time
+from types import SimpleNamespace
+
+from flask import Flask
+from gunicorn.workers.gthread import ThreadWorker
+import pytest
+
+from admission import AdmissionController, MemoryBucketStore, RateLimiter, install_admission_control, \
+    request_queue_wait
+from gunicorn_workers import QueueTimedThreadWorker
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_rate_limiter_allows_a_burst_then_asks_to_wait():
+    clock = FakeClock()
+    limiter = RateLimiter(2, burst=3, store=MemoryBucketStore(clock=clock))
+    assert [limiter.check("a") for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert limiter.check("a") == pytest.approx(0.5)
+    # Other clients have their own bucket
+    assert limiter.check("b") == 0.0
+    clock.now += 0.5
+    assert limiter.check("a") == 0.0
+    assert limiter.stats()["allowed"] == 5
+    assert limiter.stats()["limited"] == 1
+
+
+def test_rate_limiter_refills_no_further_than_the_burst():
+    clock = FakeClock()
+    limiter = RateLimiter(1, burst=2, store=MemoryBucketStore(clock=clock))
+    limiter.check("a", cost=2)
+    clock.now += 60
+    assert limiter.check("a", cost=2) == 0.0
+    assert limiter.check("a") == pytest.approx(1.0)
+
+
+def test_rate_limiter_caps_the_cost_at_a_full_bucket():
+    limiter = RateLimiter(1, burst=5, store=MemoryBucketStore(clock=FakeClock()))
+    # A 50-query batch still passes on a full bucket, and empties it
+    assert limiter.check("a", cost=50) == 0.0
+    assert limiter.check("a") > 0
+
+
+def test_disabled_rate_limiter_never_limits():
+    limiter = RateLimiter(0)
+    assert not limiter.enabled
+    assert all(limiter.check("a", cost=1000) == 0.0 for _ in range(100))
+    assert len(limiter.store) == 0
+
+
+def test_memory_store_forgets_the_least_recently_seen_client():
+    store = MemoryBucketStore(max_clients=2, clock=FakeClock())
+    for client in ("a", "b", "a", "c"):
+        store.take(client, 1, 1)
+    assert len(store) == 2
+    # "b" was dropped, so it starts again with a full bucket
+    assert store.take("b", 1, 1) == 0.0
+
+
+def test_controller_limits_requests_in_flight():
+    controller = AdmissionController(max_in_flight=2, clock=FakeClock())
+    assert controller.admit() is None
+    assert controller.admit() is None
+    assert controller.admit() == "concurrency"
+    controller.release(0.01)
+    assert controller.admit() is None
+    stats = controller.stats()
+    assert stats["in_flight"] == 2
+    assert stats["admitted"] == 3
+    assert stats["rejected"] == {"concurrency": 1}
+
+
+def test_controller_drops_to_a_quarter_while_p99_is_over_the_limit():
+    clock = FakeClock()
+    controller = AdmissionController(max_in_flight=8, p99_limit=1.0, window=10, min_samples=20, clock=clock)
+    for _ in range(20):
+        assert controller.admit() is None
+        controller.release(2.0)
+    # The p99 is recomputed at most every 100 ms
+    clock.now += 0.1
+    assert controller.limit() == 2
+    assert controller.admit() is None
+    assert controller.admit() is None
+    assert controller.admit() == "latency"
+    assert controller.stats()["p99_ms"] == 2000.0
+    # Once the slow samples leave the window the full limit is back
+    clock.now += 11
+    assert controller.limit() == 8
+
+
+def test_controller_needs_enough_samples_before_tightening():
+    clock = FakeClock()
+    controller = AdmissionController(max_in_flight=8, p99_limit=1.0, min_samples=20, clock=clock)
+    for _ in range(19):
+        controller.admit()
+        controller.release(5.0)
+    clock.now += 0.1
+    assert controller.limit() == 8
+
+
+def test_controller_drops_requests_that_queued_too_long():
+    controller = AdmissionController(max_queue_wait=0.5, clock=FakeClock())
+    assert controller.admit(queue_wait=0.6) == "queue_wait"
+    assert controller.admit(queue_wait=0.4) is None
+    assert controller.admit(queue_wait=None) is None
+    assert controller.in_flight == 2
+    assert controller.stats()["rejected"] == {"queue_wait": 1}
+
+
+@pytest.mark.parametrize("header", ["t=1600000000.5", "1600000000.5", "t=1600000000500", "1600000000500000"])
+def test_request_queue_wait_reads_seconds_milliseconds_and_microseconds(header):
+    assert request_queue_wait(header, now=1600000000.75) == pytest.approx(0.25)
+
+
+def test_request_queue_wait_ignores_missing_or_garbled_headers():
+    assert request_queue_wait(None) is None
+    assert request_queue_wait("") is None
+    assert request_queue_wait("t=soon") is None
+    # A clock ahead of ours is not a negative wait
+    assert request_queue_wait("t=2000", now=1000.0) == 0.0
+
+
+def admitted_app(controller):
+    app = Flask(__name__)
+
+    @app.route("/query")
+    def query():
+        return "ok"
+
+    install_admission_control(app, "test_admission", ["query"], RateLimiter(0), controller)
+    return app
+
+
+def test_latency_samples_include_the_queue_wait():
+    controller = AdmissionController(max_queue_wait=5.0)
+    client = admitted_app(controller).test_client()
+    response = client.get("/query", headers={"X-Request-Start": f"t={time.time() - 0.3:.6f}"})
+    assert response.status_code == 200
+    assert controller.in_flight == 0
+    (_, seconds), = controller._samples
+    assert seconds >= 0.3
+
+
+def test_requests_that_queued_too_long_get_503():
+    controller = AdmissionController(max_queue_wait=0.5)
+    client = admitted_app(controller).test_client()
+    response = client.get("/query", headers={"X-Request-Start": f"t={time.time() - 2:.6f}"})
+    assert response.status_code == 503
+    assert response.json["reason"] == "queue_wait"
+    assert response.headers["Retry-After"] == "1"
+    assert controller.in_flight == 0
+
+
+def test_worker_stamps_requests_with_the_time_they_were_queued(monkeypatch):
+    handled = []
+    monkeypatch.setattr(ThreadWorker, "enqueue_req", lambda self, conn: None)
+    monkeypatch.setattr(ThreadWorker, "handle_request", lambda self, req, conn: handled.append(req.headers))
+    worker = object.__new__(QueueTimedThreadWorker)
+    conn = SimpleNamespace()
+    before = time.time()
+    worker.enqueue_req(conn)
+    worker.handle_request(SimpleNamespace(headers=[("HOST", "x")]), conn)
+    (name, value), = [header for header in handled[0] if header[0] == "X-REQUEST-START"]
+    assert before <= float(value.removeprefix("t=")) <= time.time()
+
+    # A proxy's stamp covers more of the wait, so it is kept
+    worker.handle_request(SimpleNamespace(headers=[("X-REQUEST-START", "t=1.0")]), conn)
+    assert handled[1] == [("X-REQUEST-START", "t=1.0")]
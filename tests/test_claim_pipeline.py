@@ -0,0 +1,86 @@
+"""ClaimPipeline always gives a claim a final status, whatever the assessor does"""
+
+import pytest
+
+from claim_pipeline import (APPROVED, FAILED, PROCESSING, REJECTED, SUBMITTED, AssessmentError,
+                            ClaimPipeline, LocalAssessor)
+from storage import open_collection
+
+
+def make_pipeline(assess, max_attempts=1):
+    claims = open_collection("test", "claims", backend="memory")
+    records = open_collection("test", "records", backend="memory")
+    records["REC-1"] = {"record_id": "REC-1", "patient_id": "PAT-1"}
+    claims["CLM-1"] = {"claim_id": "CLM-1", "patient_id": "PAT-1", "policy_number": "POL-1",
+                       "claim_type": "emergency", "total_amount": 100.0, "medical_record_ids": ["REC-1"],
+                       "status": SUBMITTED}
+    return ClaimPipeline(claims, records, assessor=assess, workers=1, max_attempts=max_attempts,
+                         retry_delay=0.01)
+
+
+def assessment(index=0, **fields):
+    return {"index": index, "status": APPROVED, "covered_amount": 80.0, "patient_responsibility": 20.0,
+            **fields}
+
+
+def run_once(pipeline):
+    pipeline.process_batch([("CLM-1", 0.0)])
+    return pipeline.claims["CLM-1"]
+
+
+def test_approved():
+    claim = run_once(make_pipeline(LocalAssessor(lambda claims: [assessment()])))
+    assert claim["status"] == APPROVED and claim["covered_amount"] == 80.0
+
+
+def test_error_result_rejects():
+    claim = run_once(make_pipeline(LocalAssessor(lambda claims: [{"index": 0, "error": "Unknown policy"}])))
+    assert claim["status"] == REJECTED and claim["validation_errors"] == ["Unknown policy"]
+
+
+def raises(error):
+    def assess(claims):
+        raise error
+    return assess
+
+
+@pytest.mark.parametrize("assessor", [
+    raises(AssessmentError("Insurance server unavailable")),
+    # A response line that isn't JSON
+    raises(ValueError("Expecting value: line 1 column 1")),
+    # Results indexed past the batch, or without an index
+    LocalAssessor(lambda claims: [assessment(index=5)]),
+    LocalAssessor(lambda claims: [{"status": APPROVED}]),
+    # Fewer results than claims
+    LocalAssessor(lambda claims: []),
+])
+def test_assessor_failures_end_failed(assessor):
+    claim = run_once(make_pipeline(assessor))
+    assert claim["status"] == FAILED
+    assert claim["assessment_attempts"] == 1
+
+
+@pytest.mark.parametrize("result", [
+    {"index": 0, "covered_amount": 1.0},
+    {"index": 0, "status": APPROVED},
+])
+def test_malformed_results_end_failed(result):
+    claim = run_once(make_pipeline(LocalAssessor(lambda claims: [dict(result)])))
+    assert claim["status"] == FAILED and claim["error"].startswith("Malformed assessment")
+
+
+def test_unexpected_failure_is_retried():
+    calls = []
+
+    def flaky(claims):
+        calls.append(len(claims))
+        if len(calls) == 1:
+            raise KeyError("status")
+        return [assessment()]
+
+    pipeline = make_pipeline(LocalAssessor(flaky), max_attempts=3)
+    claim = run_once(pipeline)
+    assert claim["status"] == PROCESSING and claim["assessment_attempts"] == 1
+    # The retry comes back through the queue after the backoff
+    assert pipeline._queue.get(timeout=2)[0] == "CLM-1"
+    assert run_once(pipeline)["status"] == APPROVED
@@ -0,0 +1,51 @@
+"""A compiled index must answer like the indexes built from its JSON source"""
+
+import os
+import random
+
+import pytest
+
+from compiled_index import CompiledIndex, compile_knowledge
+from knowledge_base import load_knowledge_file
+from query_spelling import SpellingCorrector, words
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope="module")
+def knowledge():
+    return load_knowledge_file(os.path.join(ROOT, "knowledge_base.json"))
+
+
+@pytest.fixture(scope="module")
+def compiled(knowledge, tmp_path_factory):
+    path = tmp_path_factory.mktemp("index") / "knowledge_base.hgidx"
+    compile_knowledge(knowledge, str(path))
+    return CompiledIndex(str(path))
+
+
+def typos(word, rng):
+    """The word with one random deletion, substitution and transposition"""
+    i = rng.randrange(len(word))
+    j = min(i + 1, len(word) - 1)
+    swapped = list(word)
+    swapped[i], swapped[j] = swapped[j], swapped[i]
+    return [word[:i] + word[i + 1:], word[:i] + rng.choice("aeiost") + word[i + 1:], "".join(swapped)]
+
+
+def test_compiled_speller_corrects_like_the_built_one(knowledge, compiled):
+    built = SpellingCorrector.from_knowledge(knowledge)
+    assert compiled.speller is not None
+    rng = random.Random(23)
+    vocabulary = sorted({word for topic in knowledge.values() for keyword in topic["keywords"]
+                         for word in words(keyword)})
+    queries = vocabulary + [typo for word in vocabulary for typo in typos(word, rng)]
+    queries += ["deductable", "physican", "xyzzy", ""]
+    for query in queries:
+        assert compiled.speller.correct_word(query) == built.correct_word(query), query
+    assert compiled.speller.correct("whats my deductable") == built.correct("whats my deductable")
+
+
+def test_mapped_deletion_index_is_read_only(compiled):
+    with pytest.raises(TypeError):
+        compiled.speller.index.add("newword")
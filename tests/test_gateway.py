@@ -0,0 +1,170 @@
+"""Gateway fan-out against stub backends on local ports"""
+
+import asyncio
+import time
+
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+
+import gateway
+
+PATIENT = {"patient_id": "PAT-1", "first_name": "Ana", "insurance_policy_number": "POL-7"}
+
+
+def stub_backends(seen, delays=None, fail=()):
+    """One stub app per backend; records every request path and body in seen"""
+    delays = delays or {}
+
+    def handler(name, respond):
+        async def handle(request):
+            seen.setdefault(name, []).append((request.raw_path, await request.text()))
+            await asyncio.sleep(delays.get(name, 0))
+            if name in fail:
+                return web.json_response({"status": "error", "message": f"{name} is down"}, status=500)
+            return await respond(request)
+        return handle
+
+    async def patient(request):
+        if request.match_info["patient_id"] != PATIENT["patient_id"]:
+            return web.json_response({"status": "error", "message": "Patient not found"}, status=404)
+        return web.json_response({"status": "success", "data": PATIENT})
+
+    async def coverage(request):
+        body = await request.json()
+        return web.json_response({"status": "success", "policy_number": body["policy_number"],
+                                  "coverage_percentage": 80})
+
+    async def answer(request):
+        body = await request.json()
+        return web.json_response({"response": f"About {body['query']}", "matched": True})
+
+    async def health(request):
+        return web.json_response({"status": "healthy"})
+
+    apps = {}
+    for name, routes in {
+        "hospital": [web.get("/api/v1/patients/{patient_id}", handler("hospital", patient))],
+        "insurance": [web.post("/api/v1/coverage", handler("insurance", coverage))],
+        "rag": [web.post("/api/v1/rag/query", handler("rag", answer))],
+    }.items():
+        apps[name] = web.Application()
+        apps[name].add_routes(routes + [web.get("/health", handler(name, health))])
+    return apps
+
+
+def run(test, monkeypatch, delays=None, fail=(), timeouts=None, down=()):
+    """Start the stubs, point the gateway at them and run test(client, seen)"""
+    async def main():
+        seen = {}
+        servers = {name: TestServer(app) for name, app in stub_backends(seen, delays, fail).items()}
+        for server in servers.values():
+            await server.start_server()
+        try:
+            for name, server in servers.items():
+                monkeypatch.setitem(gateway.BACKENDS, name, str(server.make_url("")).rstrip("/"))
+                monkeypatch.setitem(gateway.BACKEND_TIMEOUTS, name, (timeouts or {}).get(name, 2.0))
+            for name in down:
+                # Nothing listens on port 9 (discard) here
+                monkeypatch.setitem(gateway.BACKENDS, name, "http://127.0.0.1:9")
+            async with TestClient(TestServer(gateway.create_app())) as client:
+                await test(client, seen)
+        finally:
+            for server in servers.values():
+                await server.close()
+    asyncio.run(main())
+
+
+def summary(client, **body):
+    return client.post("/api/v1/member/summary", json=body)
+
+
+def test_fans_out_to_every_backend(monkeypatch):
+    async def test(client, seen):
+        response = await summary(client, patient_id="PAT-1", service="emergency", question="copay")
+        assert response.status == 200
+        data = await response.json()
+        assert data["status"] == "success" and data["errors"] == {}
+        assert data["patient"] == PATIENT
+        # Coverage used the policy number from the patient record
+        assert data["coverage"]["policy_number"] == "POL-7"
+        assert data["answer"]["response"] == "About copay"
+        assert set(data["timings_ms"]) == {"patient", "coverage", "answer"}
+    run(test, monkeypatch)
+
+
+def test_backends_are_called_concurrently(monkeypatch):
+    async def test(client, seen):
+        started = time.perf_counter()
+        response = await summary(client, patient_id="PAT-1", service="vision", policy_number="POL-1",
+                                 question="glasses")
+        assert (await response.json())["status"] == "success"
+        assert time.perf_counter() - started < 0.5
+    run(test, monkeypatch, delays={"hospital": 0.3, "insurance": 0.3, "rag": 0.3})
+
+
+def test_slow_backend_times_out(monkeypatch):
+    async def test(client, seen):
+        started = time.perf_counter()
+        response = await summary(client, patient_id="PAT-1", question="copay")
+        elapsed = time.perf_counter() - started
+        assert response.status == 200
+        data = await response.json()
+        assert data["status"] == "partial"
+        assert data["patient"] == PATIENT
+        assert data["answer"] is None
+        assert data["errors"] == {"answer": "Timed out after 0.2s"}
+        assert elapsed < 1.0
+    run(test, monkeypatch, delays={"rag": 2.0}, timeouts={"rag": 0.2})
+
+
+def test_failed_backends_give_partial_result(monkeypatch):
+    async def test(client, seen):
+        data = await (await summary(client, patient_id="PAT-404", service="dental", question="copay")).json()
+        assert data["status"] == "partial"
+        assert data["errors"]["patient"] == "HTTP 404: Patient not found"
+        assert data["errors"]["coverage"].startswith("ClientConnectorError")
+        assert data["answer"]["matched"] is True
+    run(test, monkeypatch, down=("insurance",))
+
+
+def test_every_backend_failing_is_502(monkeypatch):
+    async def test(client, seen):
+        response = await summary(client, patient_id="PAT-1", question="copay")
+        assert response.status == 502
+        data = await response.json()
+        assert data["status"] == "error"
+        assert data["errors"] == {"patient": "HTTP 500: hospital is down", "answer": "HTTP 500: rag is down"}
+    run(test, monkeypatch, fail=("hospital", "rag"))
+
+
+def test_patient_id_is_escaped_in_backend_path(monkeypatch):
+    async def test(client, seen):
+        for patient_id in ("../../health", "PAT-1?admin=1", "a/b"):
+            data = await (await summary(client, patient_id=patient_id)).json()
+            assert data["errors"]["patient"] == "HTTP 404: Patient not found"
+        assert [path for path, _ in seen["hospital"]] == [
+            "/api/v1/patients/..%2F..%2Fhealth",
+            "/api/v1/patients/PAT-1%3Fadmin=1",
+            "/api/v1/patients/a%2Fb",
+        ]
+        for patient_id in (".", ".."):
+            response = await summary(client, patient_id=patient_id)
+            assert response.status == 400
+        assert len(seen["hospital"]) == 3
+    run(test, monkeypatch)
+
+
+def test_bad_requests(monkeypatch):
+    async def test(client, seen):
+        assert (await client.post("/api/v1/member/summary", data="{nope")).status == 400
+        assert (await summary(client)).status == 400
+        assert seen == {}
+    run(test, monkeypatch)
+
+
+def test_health_reports_each_backend(monkeypatch):
+    async def test(client, seen):
+        data = await (await client.get("/health")).json()
+        assert {name: backend["status"] for name, backend in data["backends"].items()} == {
+            "rag": "healthy", "hospital": "healthy", "insurance": "unhealthy"}
+    run(test, monkeypatch, down=("insurance",))
@@ -0,0 +1,97 @@
+"""Policy and claim endpoints of the insurance server"""
+
+import itertools
+import json
+
+import pytest
+
+from claim_pipeline import APPROVED, REJECTED, SUBMITTED, ClaimPipeline, LocalAssessor
+import insurance_server_actual as server
+from storage import open_collection
+
+_numbers = itertools.count()
+
+
+@pytest.fixture
+def client():
+    return server.app.test_client()
+
+
+def new_number():
+    return f"PN-TEST-{next(_numbers):05d}"
+
+
+def test_duplicate_policy_numbers_are_rejected(client):
+    number = new_number()
+    created = client.post('/api/v1/policies', json={"policy_number": number, "patient_id": "PAT-1"})
+    assert created.status_code == 200
+    duplicate = client.post('/api/v1/policies', json={"policy_number": number, "patient_id": "PAT-2"})
+    assert duplicate.status_code == 409
+    assert duplicate.get_json()["status"] == "error"
+    found, _ = server.policies.page(10, filters={"policy_number": number})
+    assert [policy["patient_id"] for policy in found] == ["PAT-1"]
+
+
+def test_invalid_amounts_are_rejected_before_storing(client):
+    number = new_number()
+    response = client.post('/api/v1/policies', json={"policy_number": number, "deductible": "lots"})
+    assert response.status_code == 400
+    assert server.find_policy_by_number(number) is None
+    assert server.ENGINE.table_for(number) is None
+
+
+def test_claims_use_the_policy_deductible(client):
+    number = new_number()
+    client.post('/api/v1/policies', json={"policy_number": number, "patient_id": "PAT-1", "deductible": 500})
+    first = client.post('/api/v1/claims/assess', json={"policy_number": number, "service": "emergency",
+                                                       "total_amount": 300}).get_json()["data"]
+    second = client.post('/api/v1/claims/assess', json={"policy_number": number, "service": "emergency",
+                                                        "total_amount": 300}).get_json()["data"]
+    assert (first["deductible_applied"], second["deductible_applied"]) == (300, 200)
+    assert second["covered_amount"] == 80
+
+
+@pytest.mark.parametrize("policy_number", [["x"], {"n": 1}, 12345, ""])
+def test_policy_numbers_must_be_strings(client, policy_number):
+    response = client.post('/api/v1/policies', json={"policy_number": policy_number})
+    assert response.status_code == 400
+    assert "policy_number" in response.get_json()["message"]
+
+
+BAD_REFERENCES = [{"policy_number": ["PN-1"]}, {"policy_number": {"n": 1}}, {"patient_id": ["PAT-1"]}]
+
+
+@pytest.mark.parametrize("fields", BAD_REFERENCES)
+def test_assess_rejects_unhashable_references(client, fields):
+    response = client.post('/api/v1/claims/assess', json={"policy_number": "PN-1", "service": "emergency",
+                                                           "total_amount": 100, **fields})
+    assert response.status_code == 400
+    assert "must be a string" in response.get_json()["message"]
+
+
+def test_bulk_assess_reports_bad_references_per_item(client):
+    claims = [{"policy_number": "PN-1", "service": "emergency", "total_amount": 100, **fields}
+              for fields in [{}] + BAD_REFERENCES + [{}]]
+    response = client.post('/api/v1/claims/assess/bulk', json={"claims": claims})
+    assert response.status_code == 200
+    lines = [line for line in response.get_data(as_text=True).splitlines() if line]
+    results = [json.loads(line) for line in lines]
+    items = [result for result in results if "index" in result]
+    assert [item["index"] for item in items] == list(range(len(claims)))
+    assert ["error" in item for item in items] == [False, True, True, True, False]
+
+
+def test_pipeline_assesses_the_valid_claims_of_a_batch_with_a_bad_one(client):
+    number = new_number()
+    client.post('/api/v1/policies', json={"policy_number": number, "patient_id": "PAT-1"})
+    claims = open_collection("test", "claims", backend="memory")
+    records = open_collection("test", "records", backend="memory")
+    records["REC-1"] = {"record_id": "REC-1", "patient_id": "PAT-1"}
+    for i, policy_number in enumerate([number, [number], number]):
+        claims[f"CLM-{i}"] = {"claim_id": f"CLM-{i}", "patient_id": "PAT-1", "policy_number": policy_number,
+                              "claim_type": "emergency", "total_amount": 100.0, "medical_record_ids": ["REC-1"],
+                              "status": SUBMITTED}
+    pipeline = ClaimPipeline(claims, records, assessor=LocalAssessor(server.assess_and_store), workers=1,
+                             max_attempts=1, retry_delay=0.01)
+    pipeline.process_batch([(f"CLM-{i}", 0.0) for i in range(3)])
+    assert [claims[f"CLM-{i}"]["status"] for i in range(3)] == [APPROVED, REJECTED, APPROVED]
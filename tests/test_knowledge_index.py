@@ -0,0 +1,160 @@
+"""KeywordIndex must score exactly like the linear keyword scan it replaced"""
+
+import os
+import random
+
+import pytest
+
+from knowledge_base import KnowledgeBase, load_knowledge_file
+from knowledge_index import KeywordIndex
+from response_cache import normalize_query
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TEMPLATES = (
+    "{}",
+    "  {}  ",
+    "What is my {} coverage?",
+    "tell me about {} and {}",
+    "{}{}",
+    "IS {} COVERED",
+)
+
+
+def linear_scores(knowledge, query):
+    """{topic position: score} the way the original find_best_match scored it"""
+    query_lower = query.lower()
+    scores = {}
+    for position, topic in enumerate(knowledge.values()):
+        score = 0
+        for keyword in topic["keywords"]:
+            if keyword in query_lower:
+                score += 10 if keyword == query_lower.strip() else 5
+        if score:
+            scores[position] = score
+    return scores
+
+
+def linear_best(knowledge, query):
+    """(topic_key, score) of the first topic with the highest score, or None"""
+    best_key, best_score = None, 0
+    for topic_key, score in zip(knowledge, (linear_scores(knowledge, query).get(position, 0)
+                                            for position in range(len(knowledge)))):
+        if score > best_score:
+            best_key, best_score = topic_key, score
+    return (best_key, best_score) if best_key else None
+
+
+def queries_for(knowledge, rng, count):
+    keywords = [keyword for topic in knowledge.values() for keyword in topic["keywords"]] or ["x"]
+    queries = ["", "   ", "nothing relevant here at all"]
+    for _ in range(count):
+        template = rng.choice(TEMPLATES)
+        words = [rng.choice(keywords) for _ in range(template.count("{}"))]
+        query = template.format(*words)
+        if rng.random() < 0.3:
+            # A fragment of a keyword, or one with a letter dropped
+            cut = rng.randrange(len(query) + 1)
+            query = query[:cut] + query[cut + 1:]
+        queries.append(query)
+    return queries
+
+
+def assert_parity(knowledge, queries):
+    index = KeywordIndex(knowledge)
+    for query in queries:
+        assert index.score(query) == linear_scores(knowledge, query), query
+        best = linear_best(knowledge, query)
+        assert index.top_matches(query, 1) == ([best] if best else []), query
+
+
+def synthetic_knowledge(rng, topics=40):
+    """Short, overlapping keywords drawn from a tiny alphabet so substrings collide"""
+    knowledge = {}
+    for i in range(topics):
+        keywords = ["".join(rng.choice("abc ") for _ in range(rng.randint(1, 6))) for _ in range(rng.randint(1, 5))]
+        if rng.random() < 0.3:
+            keywords.append(keywords[0])
+        knowledge[f"topic_{i}"] = {"keywords": keywords, "response": "r", "confidence": 0.9, "category": "c"}
+    return knowledge
+
+
+def test_shipped_knowledge_base():
+    knowledge = load_knowledge_file(os.path.join(ROOT, "knowledge_base.json"))
+    assert_parity(knowledge, queries_for(knowledge, random.Random(1), 3000))
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_synthetic_overlapping_keywords(seed):
+    rng = random.Random(seed)
+    knowledge = synthetic_knowledge(rng)
+    queries = queries_for(knowledge, rng, 1000)
+    queries += ["".join(rng.choice("abc ") for _ in range(rng.randint(0, 12))) for _ in range(1000)]
+    assert_parity(knowledge, queries)
+
+
+def test_nested_and_duplicate_keywords():
+    knowledge = {
+        "er": {"keywords": ["er", "emergency room", "er"]},
+        "emergency": {"keywords": ["emergency", "emergency room", "urgent care"]},
+        "care": {"keywords": ["care", "are"]},
+    }
+    assert_parity(knowledge, ["emergency room", "er", "urgent care", "careful", "ER visit for urgent care"])
+    assert KeywordIndex(knowledge).score("ER visit") == {0: 10}
+
+
+def test_empty_keyword_matches_every_query():
+    knowledge = {
+        "blank": {"keywords": [""]},
+        "dental": {"keywords": ["dental", ""]},
+    }
+    assert_parity(knowledge, ["", " ", "dental", "vision"])
+    assert KeywordIndex(knowledge).score("vision") == {0: 5, 1: 5}
+
+
+def test_topic_without_keywords():
+    knowledge = {"empty": {"keywords": []}, "vision": {"keywords": ["vision"]}}
+    assert_parity(knowledge, ["vision", "eye exam", ""])
+
+
+def test_runners_up_never_change_the_best_topic():
+    knowledge = load_knowledge_file(os.path.join(ROOT, "knowledge_base.json"))
+    index = KeywordIndex(knowledge)
+    for query in queries_for(knowledge, random.Random(2), 2000):
+        best = linear_best(knowledge, query)
+        ranked = index.top_matches(query, 3, whole_word_runners_up=True)
+        assert ranked[:1] == ([best] if best else []), query
+
+
+def test_runners_up_need_whole_word_matches():
+    knowledge = {
+        "prescription": {"keywords": ["prescription", "drug"]},
+        "rehabilitation": {"keywords": ["pt", "physical therapy"]},
+    }
+    index = KeywordIndex(knowledge)
+    # "pt" is inside "prescription"
+    assert index.top_matches("prescription coverage", 3) == [("prescription", 5), ("rehabilitation", 5)]
+    assert index.top_matches("prescription coverage", 3, whole_word_runners_up=True) == [("prescription", 5)]
+    assert index.top_matches("prescription or pt", 3, whole_word_runners_up=True) == [
+        ("prescription", 5), ("rehabilitation", 5)]
+    assert index.rank("prescription or pt", 3, whole_word_runners_up=True)[1] == 5
+    assert index.rank("prescription or pt", 3)[1] is None
+    # Plurals still count as whole words
+    assert index.top_matches("physical therapy drugs", 3, whole_word_runners_up=True) == [
+        ("prescription", 5), ("rehabilitation", 5)]
+
+
+@pytest.mark.parametrize("query, topics", [
+    ("What is my prescription coverage?", ["prescription"]),
+    ("Tell me about maternity coverage", ["maternity"]),
+    ("mental health therapy", ["mental_health"]),
+    ("dental and vision coverage", ["dental", "vision"]),
+    ("emergency room and prescription drugs", ["emergency", "prescription"]),
+    # "er" inside "emergency" doubles emergency's score, but not its whole-word one
+    ("emergency prescription costs", ["emergency", "prescription"]),
+])
+def test_shipped_knowledge_base_topics(query, topics):
+    knowledge_base = KnowledgeBase.open(os.path.join(ROOT, "knowledge_base.json"))
+    # Queries are normalized the way the server does before matching
+    matches = knowledge_base.top_matches(normalize_query(query), "keyword", top_k=3, min_score=0.5)
+    assert [topic_key for topic_key, _, _ in matches] == topics
@@ -0,0 +1,73 @@
+"""NearDuplicateCache reuses answers only between near-identical questions scored on the same terms"""
+
+import pytest
+
+import enhanced_rag_server as server
+from near_duplicate_cache import NearDuplicateCache
+
+SCOPE = (1, "keyword", 1, 0.0)
+QUESTION = "i would like to know whether insurance plan pays for my new glasses"
+# One character added: a Jaccard similarity of about 0.97
+VARIANT = "i would like to know whether insurance plan pays for my new glasses?"
+
+
+def test_variant_with_the_same_terms_hits():
+    cache = NearDuplicateCache()
+    cache.put(SCOPE, QUESTION, "vision", terms=frozenset({"glasses"}))
+    assert cache.get(SCOPE, VARIANT, frozenset({"glasses"})) == "vision"
+    assert cache.stats()["hits"] == 1
+
+
+def test_same_text_with_different_terms_misses():
+    cache = NearDuplicateCache()
+    cache.put(SCOPE, QUESTION, "vision", terms=frozenset({"glasses"}))
+    assert cache.get(SCOPE, QUESTION, frozenset({"massage"})) is None
+    assert cache.get(SCOPE, QUESTION) is None
+    assert cache.stats()["term_mismatches"] == 2
+
+
+def test_other_scopes_and_unrelated_text_miss():
+    cache = NearDuplicateCache()
+    cache.put(SCOPE, QUESTION, "vision")
+    assert cache.get((2, "keyword", 1, 0.0), QUESTION) is None
+    assert cache.get(SCOPE, "how do i reset my password") is None
+
+
+def test_expired_entries_miss():
+    now = [0.0]
+    cache = NearDuplicateCache(ttl=10, clock=lambda: now[0])
+    cache.put(SCOPE, QUESTION, "vision")
+    now[0] = 11
+    assert cache.get(SCOPE, VARIANT) is None
+    assert cache.stats()["expirations"] == 1
+
+
+@pytest.fixture
+def answer(monkeypatch):
+    """answer_query with empty caches; the low threshold leaves only the terms to tell questions apart"""
+    monkeypatch.setattr(server, "RAG_SPELL_CORRECTION", False)
+    monkeypatch.setattr(server, "NEAR_DUPLICATE_CACHE", NearDuplicateCache(threshold=0.5))
+    server.RESPONSE_CACHE.clear()
+    yield server.answer_query
+    server.RESPONSE_CACHE.clear()
+
+
+def topics(result):
+    return [topic["topic"] for topic in result["topics"]]
+
+
+@pytest.mark.parametrize("backend", ["keyword", "vector"])
+def test_a_different_service_is_scored_not_reused(answer, backend):
+    glasses = answer("i would like to know whether my insurance plan pays for glasses", backend)
+    massages = answer("i would like to know whether my insurance plan pays for massages", backend)
+    assert "vision" in topics(glasses)
+    assert "vision" not in topics(massages)
+    assert server.NEAR_DUPLICATE_CACHE.stats()["hits"] == 0
+
+
+@pytest.mark.parametrize("backend", ["keyword", "vector"])
+def test_a_trivial_variant_reuses_the_answer(answer, backend):
+    first = answer("i would like to know whether my insurance plan pays for my new glasses", backend)
+    second = answer("i woud like to know whether my insurance plan pays for my new glasses", backend)
+    assert topics(second) == topics(first)
+    assert server.NEAR_DUPLICATE_CACHE.stats()["hits"] == 1
@@ -0,0 +1,109 @@
+"""PatientIndex finds patients by name prefix, with typos, and by exact field values"""
+
+import pytest
+
+from patient_index import PatientIndex, name_tokens, normalize_date
+
+PATIENTS = [
+    {"patient_id": "PAT-1", "first_name": "Maria", "last_name": "García-López", "date_of_birth": "1985-03-14",
+     "email": "maria.garcia@example.com", "insurance_policy_number": "POL-100"},
+    {"patient_id": "PAT-2", "first_name": "Mario", "last_name": "Rossi", "date_of_birth": "1990-07-01",
+     "email": "mario@example.com", "insurance_policy_number": "POL-200"},
+    {"patient_id": "PAT-3", "first_name": "Marianne", "last_name": "Smith", "date_of_birth": "1985-03-14",
+     "email": "msmith@example.com", "insurance_policy_number": "POL-100"},
+    {"patient_id": "PAT-4", "first_name": "John", "last_name": "Smith", "date_of_birth": "1972-11-30",
+     "email": "john.smith@example.com", "insurance_policy_number": "POL-300"},
+    {"patient_id": "PAT-5", "first_name": "Jonathan", "last_name": "Smyth", "date_of_birth": "2001-01-05",
+     "email": "jsmyth@example.com", "insurance_policy_number": None},
+]
+
+
+@pytest.fixture
+def index():
+    patient_index = PatientIndex()
+    patient_index.update(PATIENTS)
+    return patient_index
+
+
+def test_names_are_tokenized_without_case_or_accents():
+    assert name_tokens("García-López") == ["garcia", "lopez"]
+    assert name_tokens("  O'Brien ") == ["o", "brien"]
+    assert name_tokens(None) == []
+
+
+@pytest.mark.parametrize("value", ["1985-03-14", "03/14/1985", "14.03.1985", "19850314", " 1985-03-14 "])
+def test_dates_are_normalized(value):
+    assert normalize_date(value) == "1985-03-14"
+
+
+def test_exact_names_rank_before_prefixes(index):
+    assert index.search("mari") == (["PAT-1", "PAT-3", "PAT-2"], False)
+    assert index.search("maria")[0] == ["PAT-1", "PAT-3"]
+    # Typos rank after both: "marian" is one edit from "maria"
+    assert index.search("marian")[0] == ["PAT-3", "PAT-1"]
+
+
+def test_every_query_word_must_match(index):
+    assert index.search("smith")[0] == ["PAT-3", "PAT-4"]
+    assert index.search("jo smith")[0] == ["PAT-4"]
+    assert index.search("maria lopez")[0] == ["PAT-1"]
+    assert index.search("garcia smith") == ([], False)
+
+
+def test_accents_and_case_are_ignored_in_queries(index):
+    assert index.search("GARCÍA")[0] == ["PAT-1"]
+
+
+def test_typos_match_within_two_edits(index):
+    # Transpositions, a missing letter, both, and two substitutions
+    assert index.search("rosis")[0] == ["PAT-2"]
+    assert index.search("jonh")[0] == ["PAT-4"]
+    assert index.search("smth")[0] == ["PAT-3", "PAT-4", "PAT-5"]
+    assert index.search("jonathn smyht")[0] == ["PAT-5"]
+    assert index.search("rassy") == (["PAT-2"], False)
+
+
+def test_known_names_and_one_edit_typos_hide_further_typos(index):
+    # "smyth" is one edit from "smith" but itself a name, so only exact matches count
+    assert index.search("smyth")[0] == ["PAT-5"]
+    # "smitt" is one edit from "smith" and two from "smyth"
+    assert index.search("smitt")[0] == ["PAT-3", "PAT-4"]
+
+
+def test_typos_can_be_turned_off(index):
+    assert index.search("rosis", fuzzy=False) == ([], False)
+    # Short fragments are only matched by prefix
+    assert index.search("jin") == ([], False)
+
+
+def test_field_filters_match_normalized_values(index):
+    assert index.search(filters={"date_of_birth": "03/14/1985"})[0] == ["PAT-1", "PAT-3"]
+    assert index.search(filters={"email": " JOHN.SMITH@example.com"})[0] == ["PAT-4"]
+    assert index.search(filters={"insurance_policy_number": "pol-100"})[0] == ["PAT-1", "PAT-3"]
+    assert index.search(filters={"insurance_policy_number": "POL-999"}) == ([], False)
+
+
+def test_field_filters_combine_with_names_and_each_other(index):
+    assert index.search("smith", {"date_of_birth": "1985-03-14"})[0] == ["PAT-3"]
+    assert index.search("mari", {"insurance_policy_number": "POL-100"})[0] == ["PAT-1", "PAT-3"]
+    assert index.search(filters={"date_of_birth": "1985-03-14", "email": "msmith@example.com"})[0] == ["PAT-3"]
+    assert index.search(filters={"last_name": "smith", "first_name": "jo"})[0] == ["PAT-4"]
+    assert index.search("rossi", {"date_of_birth": "1985-03-14"}) == ([], False)
+
+
+def test_results_stop_at_the_limit(index):
+    assert index.search("smith", limit=1) == (["PAT-3"], True)
+    assert index.search(filters={"insurance_policy_number": "POL-100"}, limit=1) == (["PAT-1"], True)
+    assert index.search("") == ([], False)
+
+
+def test_readding_a_patient_replaces_the_old_entry(index):
+    index.add({**PATIENTS[1], "last_name": "Bianchi", "insurance_policy_number": "POL-400"})
+    assert index.search("rossi", fuzzy=False) == ([], False)
+    assert index.search("bianchi")[0] == ["PAT-2"]
+    assert index.search(filters={"insurance_policy_number": "POL-200"}) == ([], False)
+    assert len(index) == 5
+
+    index.remove("PAT-2")
+    assert index.search("bianchi") == ([], False)
+    assert index.stats()["patients"] == 4
@@ -0,0 +1,28 @@
+"""QueryAnalytics counts answered queries by their normalized text"""
+
+from query_analytics import QueryAnalytics
+
+
+def answer(matched=True, confidence=0.9, topic="deductible"):
+    topics = [{"topic": topic}] if matched else []
+    return {"matched": matched, "confidence": confidence, "topics": topics}
+
+
+def test_counts_unmatched_low_confidence_and_topics():
+    analytics = QueryAnalytics(clock=lambda: 0.0)
+    analytics.record(["what is my deductible", "reset password", "copay"],
+                     [answer(), answer(matched=False), answer(confidence=0.2, topic="copay")])
+    report = analytics.report()
+    assert (report["queries"], report["unmatched"], report["low_confidence"]) == (3, 1, 1)
+    assert [entry["query"] for entry in report["top_unmatched"]] == ["reset password"]
+    assert [entry["query"] for entry in report["top_low_confidence"]] == ["copay"]
+    assert {entry["topic"] for entry in report["top_topics"]} == {"deductible", "copay"}
+
+
+def test_empty_normalized_queries_are_not_counted():
+    analytics = QueryAnalytics(clock=lambda: 0.0)
+    analytics.record(["", "", "reset password"], [answer(matched=False)] * 3)
+    report = analytics.report()
+    assert (report["queries"], report["unmatched"], report["low_confidence"]) == (1, 1, 0)
+    assert analytics.stats()["queries"] == 1
+    assert report["top_unmatched"] == [{"query": "reset password", "count": 1, "error": 0}]
@@ -0,0 +1,69 @@
+"""Spelling correction must fix typos of keywords without rewriting ordinary words"""
+
+import os
+
+import pytest
+
+import enhanced_rag_server as server
+from knowledge_base import load_knowledge_file
+from query_spelling import COMMON_WORDS, SpellingCorrector
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope="module")
+def speller():
+    return SpellingCorrector.from_knowledge(load_knowledge_file(os.path.join(ROOT, "knowledge_base.json")))
+
+
+@pytest.fixture
+def correcting(monkeypatch):
+    """answer_query with correction on and empty caches"""
+    monkeypatch.setattr(server, "RAG_SPELL_CORRECTION", True)
+    server.RESPONSE_CACHE.clear()
+    server.NEAR_DUPLICATE_CACHE.clear()
+    yield server.answer_query
+    server.RESPONSE_CACHE.clear()
+    server.NEAR_DUPLICATE_CACHE.clear()
+
+
+@pytest.mark.parametrize("typo, word", [
+    ("deductable", "deductible"),
+    ("perscription", "prescription"),
+    ("ambulence", "ambulance"),
+    ("pregnacy", "pregnancy"),
+])
+def test_keyword_typos_are_corrected(speller, typo, word):
+    assert speller.correct_word(typo) == word
+
+
+@pytest.mark.parametrize("word", ["bills", "bill", "denial", "pill", "dispute", "appeal", "refund"])
+def test_common_words_are_never_corrected(speller, word):
+    assert word in COMMON_WORDS
+    assert speller.correct_word(word) == word
+
+
+def test_correct_only_rewrites_misspelled_words(speller):
+    assert speller.correct("how do i pay my medical bills") == "how do i pay my medical bills"
+    assert speller.correct("what is my deductable") == "what is my deductible"
+
+
+@pytest.mark.parametrize("query", ["how do i pay my medical bills", "can I dispute a denial"])
+def test_off_topic_questions_still_fall_back(correcting, query):
+    result = correcting(query)
+    assert not result["matched"]
+    assert "corrected_query" not in result
+
+
+def test_questions_that_match_as_asked_are_not_corrected(correcting):
+    result = correcting("how do I appeal a denial of my prescription")
+    assert [topic["topic"] for topic in result["topics"]] == ["prescription"]
+    assert "corrected_query" not in result
+
+
+def test_questions_that_fall_back_are_corrected(correcting):
+    result = correcting("what is my deductable")
+    assert result["matched"]
+    assert result["topics"][0]["topic"] == "deductible"
+    assert result["corrected_query"] == "deductible"
+
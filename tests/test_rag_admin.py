@@ -0,0 +1,36 @@
+"""RAG admin endpoints answer only requests carrying the configured RAG_ADMIN_TOKEN"""
+
+import pytest
+
+import enhanced_rag_server as server
+
+ENDPOINTS = [("GET", "/api/v1/rag/admin/analytics"), ("POST", "/api/v1/rag/admin/reload")]
+
+
+@pytest.fixture
+def client():
+    return server.app.test_client()
+
+
+@pytest.mark.parametrize("method, path", ENDPOINTS)
+def test_admin_endpoints_are_disabled_without_a_token(client, monkeypatch, method, path):
+    monkeypatch.setattr(server, "RAG_ADMIN_TOKEN", None)
+    for headers in ({}, {"X-Admin-Token": ""}, {"X-Admin-Token": "anything"}):
+        response = client.open(path, method=method, headers=headers)
+        assert response.status_code == 403
+        assert "RAG_ADMIN_TOKEN" in response.json["error"]
+
+
+@pytest.mark.parametrize("method, path", ENDPOINTS)
+def test_admin_endpoints_need_the_matching_token(client, monkeypatch, method, path):
+    monkeypatch.setattr(server, "RAG_ADMIN_TOKEN", "s3cret")
+    for headers in ({}, {"X-Admin-Token": "wrong"}, {"X-Admin-Token": "s3cret "}):
+        assert client.open(path, method=method, headers=headers).status_code == 403
+    assert client.open(path, method=method, headers={"X-Admin-Token": "s3cret"}).status_code == 200
+
+
+def test_analytics_with_the_token_lists_questions(client, monkeypatch):
+    monkeypatch.setattr(server, "RAG_ADMIN_TOKEN", "s3cret")
+    client.post("/api/v1/rag/query", json={"query": "how do i reset my password"})
+    response = client.get("/api/v1/rag/admin/analytics", headers={"X-Admin-Token": "s3cret"})
+    assert "do i reset password" in [entry["query"] for entry in response.json["top_unmatched"]]
@@ -0,0 +1,113 @@
+"""Memory and SQLite collections page, filter and stream the same records in the same order"""
+
+import pytest
+
+import storage
+from storage import open_collection
+
+PLANS = ("basic", "premium", "family")
+
+
+@pytest.fixture
+def collections(tmp_path):
+    """The same 60 records, with a few rewritten afterwards, on both backends"""
+    opened = {backend: open_collection("test", "policies", backend, str(tmp_path / "storage.db"))
+              for backend in ("memory", "sqlite")}
+    records = {f"POL-{n:03d}": {"policy_number": f"POL-{n:03d}", "patient_id": f"PAT-{n % 7}",
+                                "status": "active" if n % 3 else "cancelled", "plan_type": PLANS[n % 3],
+                                "premium": 100 + n}
+               for n in range(60)}
+    for collection in opened.values():
+        for record_id, record in list(records.items())[:40]:
+            collection[record_id] = record
+        collection.update(dict(list(records.items())[40:]))
+        # A rewrite keeps the record's place but moves it between index entries
+        collection["POL-005"] = {**records["POL-005"], "patient_id": "PAT-0", "status": "active"}
+        collection["POL-006"] = {**records["POL-006"], "status": "suspended"}
+    return opened
+
+
+def all_pages(collection, limit, filters=None):
+    records = []
+    cursor = None
+    while True:
+        page, cursor = collection.page(limit, cursor, filters)
+        assert len(page) <= limit
+        records.extend(page)
+        if cursor is None:
+            return records
+
+
+def ids(records):
+    return [record["policy_number"] for record in records]
+
+
+@pytest.mark.parametrize("filters", [
+    None,
+    {"patient_id": "PAT-0"},
+    {"patient_id": "PAT-5"},
+    {"status": "cancelled"},
+    {"status": "suspended"},
+    {"plan_type": "family"},
+    {"patient_id": "PAT-3", "status": "active"},
+    {"policy_number": "POL-059"},
+    {"premium": "150"},
+    {"patient_id": "PAT-404"},
+])
+@pytest.mark.parametrize("limit", [1, 7, 100])
+def test_backends_page_and_stream_the_same_records(collections, filters, limit):
+    memory, sqlite = collections["memory"], collections["sqlite"]
+    expected = [record for record in memory.iter_records()
+                if all(str(record[field]) == value for field, value in (filters or {}).items())]
+    assert ids(all_pages(memory, limit, filters)) == ids(expected)
+    assert ids(all_pages(sqlite, limit, filters)) == ids(expected)
+    assert list(sqlite.iter_records(filters)) == list(memory.iter_records(filters)) == expected
+
+
+def test_rewritten_records_keep_their_place_and_leave_old_index_entries(collections):
+    for collection in collections.values():
+        moved = ids(collection.iter_records({"patient_id": "PAT-0"}))
+        assert moved == ["POL-000", "POL-005", "POL-007", "POL-014", "POL-021", "POL-028",
+                         "POL-035", "POL-042", "POL-049", "POL-056"]
+        assert "POL-005" not in ids(collection.iter_records({"patient_id": "PAT-5"}))
+        assert ids(collection.iter_records({"status": "suspended"})) == ["POL-006"]
+        assert ids(collection.iter_records())[:8] == [f"POL-{n:03d}" for n in range(8)]
+
+
+def test_cursor_resumes_streaming_after_the_page(collections):
+    for collection in collections.values():
+        filters = {"status": "active"}
+        page, cursor = collection.page(10, None, filters)
+        rest = list(collection.iter_records(filters, cursor))
+        assert ids(page + rest) == ids(collection.iter_records(filters))
+
+
+def test_sqlite_streams_across_batches(collections, monkeypatch):
+    monkeypatch.setattr(storage, "STREAM_BATCH_ROWS", 4)
+    assert list(collections["sqlite"].iter_records()) == list(collections["memory"].iter_records())
+    assert len(list(collections["sqlite"].iter_records({"plan_type": "basic"}))) == 20
+
+
+def test_backends_agree_on_lookups(collections):
+    memory, sqlite = collections["memory"], collections["sqlite"]
+    assert len(memory) == len(sqlite) == 60
+    assert sqlite["POL-005"] == memory["POL-005"]
+    assert sqlite.get("POL-999", "missing") == memory.get("POL-999", "missing") == "missing"
+    assert ("POL-010" in sqlite, "POL-999" in sqlite) == ("POL-010" in memory, "POL-999" in memory) == (True, False)
+    for collection in (memory, sqlite):
+        with pytest.raises(KeyError):
+            collection["POL-999"]
+
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", "cG9zOi0x", "eHl6OjE"])
+def test_backends_reject_the_same_bad_cursors(collections, cursor):
+    for collection in collections.values():
+        with pytest.raises(ValueError):
+            collection.page(10, cursor)
+        with pytest.raises(ValueError):
+            collection.iter_records(None, cursor)
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError):
+        open_collection("test", "policies", "redis")
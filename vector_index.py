@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Vector Retrieval Index for the RAG Server
+TF-IDF cosine similarity over each topic's response text and keywords,
+stored as a sparse term -> topic postings matrix in NumPy arrays.
+"""
+
+import math
+import re
+
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9%]+")
+
+# Words that carry no topic signal in member questions
+STOP_WORDS = frozenset("""
+    a about all an and any are as at be before but by can do does for from get
+    have how i if in insurance is it its me much my of on or our plan please
+    so tell that the this to what when where which who why will with you your
+    coverage covered cover
+""".split())
+
+# Keyword tokens count this many times in a topic's term frequencies
+KEYWORD_WEIGHT = 3
+
+# Cosine similarity needed to treat the best topic as a match
+MIN_SIMILARITY = 0.12
+# Similarity at which the topic's own confidence is reported in full
+FULL_CONFIDENCE_SIMILARITY = 0.35
+
+# Most (query, topic) scores search_many holds at once (8 bytes each), so a
+# large batch against a large knowledge base is scored a slice at a time
+MAX_SCORE_CELLS = 1 << 20
+
+
+def _stem(token):
+    """Very light plural folding so 'copays' matches 'copay'"""
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def tokenize(text):
+    """Lowercase, split into word tokens and drop stop words"""
+    return [_stem(token) for token in TOKEN_PATTERN.findall(text.lower())
+            if token not in STOP_WORDS]
+
+
+class VectorIndex:
+    """Sparse TF-IDF matrix with vectorized cosine scoring"""
+
+    def __init__(self, knowledge):
+        self.topics = list(knowledge.keys())
+        self.confidences = np.array([knowledge[key]["confidence"] for key in self.topics],
+                                    dtype=np.float32)
+
+        # Term frequencies per topic
+        topic_terms = []
+        for key in self.topics:
+            data = knowledge[key]
+            counts = {}
+            for token in tokenize(data["response"]):
+                counts[token] = counts.get(token, 0) + 1
+            for token in tokenize(" ".join(data["keywords"])):
+                counts[token] = counts.get(token, 0) + KEYWORD_WEIGHT
+            topic_terms.append(counts)
+
+        self.vocabulary = {}
+        document_frequency = []
+        for counts in topic_terms:
+            for token in counts:
+                term_id = self.vocabulary.get(token)
+                if term_id is None:
+                    self.vocabulary[token] = len(document_frequency)
+                    document_frequency.append(1)
+                else:
+                    document_frequency[term_id] += 1
+
+        n_topics = len(self.topics)
+        self.idf = np.log((1 + n_topics) / (1 + np.array(document_frequency, dtype=np.float64))) + 1.0
+        self.idf = self.idf.astype(np.float32)
+
+        # Build postings (CSC layout: term -> topics) with L2-normalized rows
+        postings = [[] for _ in document_frequency]
+        for position, counts in enumerate(topic_terms):
+            weights = {self.vocabulary[token]: (1.0 + math.log(tf)) * self.idf[self.vocabulary[token]]
+                       for token, tf in counts.items()}
+            norm = math.sqrt(sum(w * w for w in weights.values())) or 1.0
+            for term_id, weight in weights.items():
+                postings[term_id].append((position, weight / norm))
+
+        self.term_offsets = np.zeros(len(postings) + 1, dtype=np.int64)
+        self.term_offsets[1:] = np.cumsum([len(p) for p in postings])
+        self.posting_topics = np.array([pos for p in postings for pos, _ in p], dtype=np.int32)
+        self.posting_weights = np.array([w for p in postings for _, w in p], dtype=np.float32)
+
+    @classmethod
+    def from_arrays(cls, topics, confidences, vocabulary, idf, term_offsets, posting_topics, posting_weights):
+        """Wrap prebuilt arrays (e.g. views of a compiled index) without rebuilding
+
+        topics only needs indexing and len(); vocabulary only needs .get().
+        """
+        index = cls.__new__(cls)
+        index.topics = topics
+        index.confidences = confidences
+        index.vocabulary = vocabulary
+        index.idf = idf
+        index.term_offsets = term_offsets
+        index.posting_topics = posting_topics
+        index.posting_weights = posting_weights
+        return index
+
+    def query_vector(self, query):
+        """Return (term ids, L2-normalized TF-IDF weights) for a query"""
+        counts = {}
+        for token in tokenize(query):
+            term_id = self.vocabulary.get(token)
+            if term_id is not None:
+                counts[term_id] = counts.get(term_id, 0) + 1
+
+        if not counts:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        term_ids = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+        tf = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+        weights = (1.0 + np.log(tf)) * self.idf[term_ids]
+        return term_ids, weights / np.linalg.norm(weights)
+
+    def similarities(self, query):
+        """Cosine similarity of the query against every topic"""
+        term_ids, weights = self.query_vector(query)
+        if not len(term_ids):
+            return np.zeros(len(self.topics), dtype=np.float32)
+
+        # Sparse matrix-vector product: gather the query terms' postings
+        starts = self.term_offsets[term_ids]
+        lengths = self.term_offsets[term_ids + 1] - starts
+        gather = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+        return np.bincount(self.posting_topics[gather],
+                           weights=self.posting_weights[gather] * np.repeat(weights, lengths),
+                           minlength=len(self.topics))
+
+    def similarities_many(self, queries):
+        """Cosine similarity matrix (queries x topics) from one sparse product"""
+        n_topics = len(self.topics)
+        rows, starts, lengths, weights = [], [], [], []
+        for row, query in enumerate(queries):
+            term_ids, term_weights = self.query_vector(query)
+            rows.append(np.full(len(term_ids), row, dtype=np.int64))
+            starts.append(self.term_offsets[term_ids])
+            lengths.append(self.term_offsets[term_ids + 1] - self.term_offsets[term_ids])
+            weights.append(term_weights)
+
+        if not queries:
+            return np.zeros((0, n_topics), dtype=np.float64)
+        rows = np.concatenate(rows)
+        starts = np.concatenate(starts)
+        lengths = np.concatenate(lengths)
+        weights = np.concatenate(weights)
+
+        gather = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+        cells = np.repeat(rows, lengths) * n_topics + self.posting_topics[gather]
+        scores = np.bincount(cells, weights=self.posting_weights[gather] * np.repeat(weights, lengths),
+                             minlength=len(queries) * n_topics)
+        return scores.reshape(len(queries), n_topics)
+
+    def search(self, query, top_k=2):
+        """Return the top_k (topic position, similarity) pairs, best first"""
+        scores = self.similarities(query)
+        top_k = min(top_k, len(scores))
+        if top_k <= 0:
+            return []
+        top = np.argpartition(-scores, top_k - 1)[:top_k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(int(position), float(scores[position])) for position in top]
+
+    def search_many(self, queries, top_k=2):
+        """search for many queries, scoring up to MAX_SCORE_CELLS // topics queries per pass"""
+        n_topics = len(self.topics)
+        top_k = min(top_k, n_topics)
+        if top_k <= 0:
+            return [[] for _ in queries]
+        chunk = max(1, MAX_SCORE_CELLS // n_topics)
+        results = []
+        for first in range(0, len(queries), chunk):
+            scores = self.similarities_many(queries[first:first + chunk])
+            top = np.argpartition(-scores, top_k - 1, axis=1)[:, :top_k]
+            top_scores = np.take_along_axis(scores, top, axis=1)
+            order = np.argsort(-top_scores, axis=1, kind="stable")
+            top = np.take_along_axis(top, order, axis=1).tolist()
+            top_scores = np.take_along_axis(top_scores, order, axis=1).tolist()
+            results.extend(list(zip(positions, similarities)) for positions, similarities in zip(top, top_scores))
+        return results
+
+    def calibrate(self, position, best, runner_up):
+        """Confidence from the topic's own confidence, similarity and margin"""
+        margin = (best - runner_up) / best if best > 0 else 0.0
+        strength = min(1.0, best / FULL_CONFIDENCE_SIMILARITY)
+        return round(float(self.confidences[position]) * strength * (0.5 + 0.5 * margin), 2)